@@ -1,8 +1,15 @@
 """IsolationForest による異常検知."""
 
+from dataclasses import dataclass
+
 import numpy as np
 from sklearn.ensemble import IsolationForest
 
+from backend.analysis.forest import ForestArtifact
+
+FOREST_SEED = 42
+"""IsolationForest の乱数シードの既定値."""
+
 _DEFAULTS: dict = {
     "n_estimators": 100,
     "contamination": 0.01,
@@ -10,10 +17,58 @@ _DEFAULTS: dict = {
 }
 
 
+def forest_params(anomaly_params: dict | None = None) -> dict:
+    """デフォルト値を補った IsolationForest パラメータを返す."""
+    return {**_DEFAULTS, **(anomaly_params or {})}
+
+
+def tree_params(params: dict) -> dict:
+    """木の構造を決めるパラメータだけを返す（contamination を除く）.
+
+    contamination は学習後の offset と正規化の基準しか変えないため、
+    保存済みモデルの再利用判定（definition_hash）には含めない。
+    """
+    return {k: v for k, v in params.items() if k != "contamination"}
+
+
+def fit_forest(
+    train_selected_data: np.ndarray,
+    anomaly_params: dict | None = None,
+    n_jobs: int = 1,
+    random_state: int = FOREST_SEED,
+) -> ForestArtifact:
+    """ベースラインで学習し、スケーリング基準込みの推論モデルを返す.
+
+    スケーリング基準はベースライン(学習データ)の decision_function から
+    算出して固定する。ベースラインの score_samples もモデルに含めるので、
+    後から with_contamination() で contamination だけを変更できる。
+
+    Args:
+        train_selected_data: ベースライン特徴量 (n_baseline, d).
+        anomaly_params: IsolationForest パラメータ（省略時はデフォルト値）.
+        n_jobs: ツリー学習に使うスレッド数（CpuBudget から借りた値）.
+            random_state 固定のため、スレッド数によらず結果は同一.
+        random_state: 乱数シード（エンジンはカテゴリごとの値を渡す）.
+    """
+    params = forest_params(anomaly_params)
+    model = IsolationForest(
+        n_estimators=params["n_estimators"],
+        max_samples=params["max_samples"],
+        contamination=params["contamination"],
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+    model.fit(train_selected_data)
+    return ForestArtifact.from_sklearn(
+        model, model.score_samples(train_selected_data)
+    )
+
+
 def train_and_score(
     train_selected_data: np.ndarray,
     all_period_data: np.ndarray,
     anomaly_params: dict | None = None,
+    n_jobs: int = 1,
 ) -> np.ndarray:
     """ベースラインで学習し全データのスコアを返す.
 
@@ -24,29 +79,69 @@ def train_and_score(
         train_selected_data: ベースライン特徴量 (n_baseline, d).
         all_period_data: 全期間特徴量 (n_all, d).
         anomaly_params: IsolationForest パラメータ（省略時はデフォルト値）.
+        n_jobs: 学習・スコアリングに使うスレッド数.
 
     Returns:
         正規化異常スコア (n_all,). 0〜1, 0.5 = contamination 境界, 1 = 最異常.
     """
-    params = {**_DEFAULTS, **(anomaly_params or {})}
-    model = IsolationForest(
-        n_estimators=params["n_estimators"],
-        max_samples=params["max_samples"],
-        contamination=params["contamination"],
-        random_state=42,
-    )
-    model.fit(train_selected_data)
+    forest = fit_forest(train_selected_data, anomaly_params, n_jobs)
+    return forest.normalized_scores(all_period_data, n_jobs)
+
 
-    # スケーリング基準をベースライン(学習データ)から算出（固定）
-    baseline_raw = -model.decision_function(train_selected_data)
-    pos_max = baseline_raw.max() if baseline_raw.max() > 0 else 1.0
-    neg_min = abs(baseline_raw.min()) if baseline_raw.min() < 0 else 1.0
-
-    # 全データをスコアリング
-    raw = -model.decision_function(all_period_data)
-    scores = np.where(
-        raw >= 0,
-        0.5 + 0.5 * raw / pos_max,
-        0.5 - 0.5 * np.abs(raw) / neg_min,
+@dataclass(frozen=True)
+class ContaminationSweep:
+    """contamination ごとの判定の試算結果.
+
+    Attributes:
+        contaminations: 試算した contamination (k,).
+        thresholds: 各 contamination で異常と判定される
+            raw_scores の境界 (k,). sklearn の -offset_ に相当.
+        raw_scores: 全期間の原論文スコア -score_samples (n,).
+            学習は contamination に依存しないため共通.
+        scores: train_and_score と同じ正規化スコア (k, n).
+        flags: 異常判定 (k, n). raw_scores > thresholds（= スコア > 0.5）.
+    """
+
+    contaminations: np.ndarray
+    thresholds: np.ndarray
+    raw_scores: np.ndarray
+    scores: np.ndarray
+    flags: np.ndarray
+
+
+def sweep_contamination(
+    forest: ForestArtifact,
+    all_period_data: np.ndarray,
+    contaminations: list[float],
+    n_jobs: int = 1,
+) -> ContaminationSweep:
+    """1回の学習結果から、複数の contamination の判定をまとめて求める.
+
+    IsolationForest の木は contamination に依存せず、contamination は
+    ベースラインの score_samples の分位点（offset_）と、それに基づく
+    正規化の基準だけを決める。そのため全期間の score_samples を1回
+    計算すれば、各 contamination は保存済みの値の正規化だけで求まる。
+    各行は train_and_score(..., {"contamination": c}) と一致する.
+
+    Args:
+        forest: fit_forest() の結果（contamination は問わない）.
+        all_period_data: 全期間特徴量.
+        contaminations: 試算する contamination（各 0 < c <= 0.5）.
+        n_jobs: スコアリングに使うスレッド数.
+
+    Raises:
+        ValueError: contamination が範囲外または空の場合.
+    """
+    c = np.asarray(contaminations, dtype=np.float64)
+    if c.ndim != 1 or len(c) == 0 or np.any((c <= 0) | (c > 0.5)):
+        raise ValueError("contaminations must be a list of values in (0, 0.5]")
+    raw_scores = -forest.score_samples(all_period_data, n_jobs)
+    calibrated = [forest.with_contamination(float(v)) for v in c]
+    offsets = np.array([f.offset for f in calibrated])
+    return ContaminationSweep(
+        contaminations=c,
+        thresholds=-offsets,
+        raw_scores=raw_scores,
+        scores=np.array([f.normalize(raw_scores) for f in calibrated]),
+        flags=raw_scores[None, :] > -offsets[:, None],
     )
-    return np.clip(scores, 0.0, 1.0)
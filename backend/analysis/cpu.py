@@ -0,0 +1,101 @@
+"""分析に使う CPU 予算.
+
+コンテナでは os.cpu_count() がホストのコア数を返すため、cgroup の
+CPU クォータ（v2: cpu.max, v1: cpu.cfs_quota_us / cpu.cfs_period_us）と
+CPU アフィニティから実際に使えるコア数を求める。
+
+CpuBudget はその予算をプロセス内で分け合う。ジョブキューの各ワーカーは
+1カテゴリの分析中に少なくとも1コア（自スレッド）を使い、モデル内の
+並列化（IsolationForest の n_jobs、スコアリングの分割）は予算の空き分
+だけ追加スレッドを借りる。これによりカテゴリ間とモデル内の並列が
+重なってもコア数を超えて過剰にスレッドを起こさない。
+"""
+
+import math
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _cgroup_quota(root: Path = _CGROUP_ROOT) -> float | None:
+    """cgroup の CPU クォータ（コア数換算）を返す。無制限・不明なら None."""
+    try:
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota_us = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period_us = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    if quota_us <= 0 or period_us <= 0:
+        return None
+    return quota_us / period_us
+
+
+def available_cpus(root: Path = _CGROUP_ROOT) -> int:
+    """このプロセスが使えるコア数（1以上）を返す.
+
+    cgroup クォータは端数を切り上げる（1.5 コアなら 2 スレッドまで
+    並列にしても、スロットリングされるだけで遊ぶコアは出ない）。
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_quota(root)
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+class CpuBudget:
+    """プロセス内で分け合う CPU スレッド予算.
+
+    Args:
+        total: 予算の総スレッド数。省略時は available_cpus()
+    """
+
+    def __init__(self, total: int | None = None) -> None:
+        if total is None:
+            total = available_cpus()
+        if total < 1:
+            raise ValueError("total must be >= 1")
+        self.total = total
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_use(self) -> int:
+        """貸し出し中のスレッド数."""
+        with self._lock:
+            return self._in_use
+
+    @contextmanager
+    def lease(self, want: int | None = None) -> Iterator[int]:
+        """呼び出しスレッドを含めて最大 want スレッドを借りる.
+
+        空きがなくても呼び出しスレッド分の 1 は必ず返す（待たない）。
+        呼び出し側はすでに実行中のため、ここで待たせても
+        コアは空かない。
+
+        Yields:
+            使ってよいスレッド数（1 以上）
+        """
+        if want is None:
+            want = self.total
+        with self._lock:
+            granted = max(1, min(want, self.total - self._in_use))
+            self._in_use += granted
+        try:
+            yield granted
+        finally:
+            with self._lock:
+                self._in_use -= granted
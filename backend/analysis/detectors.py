@@ -0,0 +1,365 @@
+"""ストリーミング検知器の実装.
+
+いずれも作業時間（生値）を1系列として扱う。統計量 s と管理限界 h から
+``clip(0.5 * s / h, 0, 1)`` でスコア化するため、s = h のとき
+IsolationForest の contamination 境界と同じ 0.5 になる。
+ウォームアップ中（統計量が定まらない間）のスコアは 0。
+
+ストリーミング検知器はモデル定義のベースライン期間（baseline_start /
+baseline_end）と特徴量設定を使わない。系列の先頭から逐次学習し、
+最初の warmup 点で基準を定める。除外点（excluded_points）は
+採点するが学習には使わない。ベースライン期間で基準を固定したい
+場合は IsolationForest を使う。
+"""
+
+import hashlib
+import json
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+
+from backend.analysis.feature import validate_params
+from backend.interfaces.detector import StreamingDetector
+
+_MAD_TO_SIGMA = 1.4826
+"""正規分布で MAD を標準偏差に換算する係数."""
+
+
+def _normalize(statistic: float, limit: float) -> float:
+    """統計量を管理限界で 0〜1 に正規化する（限界 = 0.5）."""
+    return min(max(0.5 * statistic / limit, 0.0), 1.0)
+
+
+def _kth_deviation(values: list[float], center: float, k: int) -> float:
+    """整列済み values の |v - center| のうち k 番目（0 始まり）に小さい値.
+
+    center より左の点の偏差は左へ、右の点の偏差は右へ行くほど増える。
+    この2つの整列済み列から k + 1 個を小さい順に取るとき、左から取る
+    個数を二分探索で決める（O(log n)）。
+    """
+    split = bisect_left(values, center)
+
+    def left(j: int) -> float:
+        return center - values[split - 1 - j]
+
+    def right(j: int) -> float:
+        return values[split + j] - center
+
+    lo = max(0, k + 1 - (len(values) - split))
+    hi = min(k + 1, split)
+    # 左から i 個取るとき、左の次の点が右で取った最後の点以上になる
+    # 最小の i を探す
+    while lo < hi:
+        i = (lo + hi) // 2
+        if left(i) >= right(k - i):
+            hi = i
+        else:
+            lo = i + 1
+    taken = []
+    if lo > 0:
+        taken.append(left(lo - 1))
+    if k + 1 - lo > 0:
+        taken.append(right(k - lo))
+    return max(taken)
+
+
+class EwmaDetector(StreamingDetector):
+    """EWMA 管理図.
+
+    指数加重移動平均・分散で水準とばらつきを追跡し、
+    新しい点の偏差 |x - 平均| / 標準偏差 を管理限界 limit と比べる。
+
+    Args:
+        alpha: 平滑化係数（0 < alpha <= 1）。大きいほど直近重視
+        limit: 管理限界（標準偏差の倍数）
+        warmup: 採点を始めるまでの学習点数
+    """
+
+    def __init__(
+        self, alpha: float = 0.1, limit: float = 3.0, warmup: int = 10
+    ) -> None:
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        if limit <= 0:
+            raise ValueError("limit must be > 0")
+        self._alpha = alpha
+        self._limit = limit
+        self._warmup = max(1, warmup)
+        self._count = 0
+        self._mean = 0.0
+        self._var = 0.0
+
+    def update(self, value: float, learn: bool = True) -> float:
+        score = 0.0
+        if self._count >= self._warmup and self._var > 0:
+            statistic = abs(value - self._mean) / math.sqrt(self._var)
+            score = _normalize(statistic, self._limit)
+        if learn:
+            if self._count == 0:
+                self._mean = value
+            else:
+                diff = value - self._mean
+                self._mean += self._alpha * diff
+                self._var = (1 - self._alpha) * (
+                    self._var + self._alpha * diff * diff
+                )
+            self._count += 1
+        return score
+
+    def get_state(self) -> dict:
+        return {"count": self._count, "mean": self._mean, "var": self._var}
+
+    def set_state(self, state: dict) -> None:
+        self._count = state["count"]
+        self._mean = state["mean"]
+        self._var = state["var"]
+
+
+class RobustZDetector(StreamingDetector):
+    """中央値・MAD によるロバスト z スコア.
+
+    直近 window 点の中央値と MAD（中央絶対偏差）で外れ度を測るため、
+    過去の外れ値に基準が引きずられにくい。窓は整列済みリストで保持し、
+    更新は二分探索による挿入・削除で済む。MAD も整列済みの窓から
+    二分探索で求める（_kth_deviation()）ため、1点あたり窓を並べ直さない。
+
+    Args:
+        window: 基準に使う直近の点数
+        limit: 管理限界（ロバスト z の閾値）
+        warmup: 採点を始めるまでの学習点数（window 以下）
+    """
+
+    def __init__(
+        self, window: int = 50, limit: float = 3.5, warmup: int = 10
+    ) -> None:
+        if window < 3:
+            raise ValueError("window must be >= 3")
+        if limit <= 0:
+            raise ValueError("limit must be > 0")
+        self._window = window
+        self._limit = limit
+        self._warmup = min(max(3, warmup), window)
+        self._recent: deque[float] = deque()
+        self._sorted: list[float] = []
+
+    def update(self, value: float, learn: bool = True) -> float:
+        score = 0.0
+        if len(self._sorted) >= self._warmup:
+            median = self._median(self._sorted)
+            mad = self._mad(self._sorted, median)
+            if mad > 0:
+                statistic = abs(value - median) / (_MAD_TO_SIGMA * mad)
+                score = _normalize(statistic, self._limit)
+        if learn:
+            self._recent.append(value)
+            insort(self._sorted, value)
+            if len(self._recent) > self._window:
+                oldest = self._recent.popleft()
+                del self._sorted[bisect_left(self._sorted, oldest)]
+        return score
+
+    @staticmethod
+    def _median(values: list[float]) -> float:
+        mid = len(values) // 2
+        if len(values) % 2:
+            return values[mid]
+        return (values[mid - 1] + values[mid]) / 2
+
+    @staticmethod
+    def _mad(values: list[float], median: float) -> float:
+        """整列済み values の median からの絶対偏差の中央値."""
+        mid = len(values) // 2
+        upper = _kth_deviation(values, median, mid)
+        if len(values) % 2:
+            return upper
+        return (_kth_deviation(values, median, mid - 1) + upper) / 2
+
+    def get_state(self) -> dict:
+        return {"recent": list(self._recent)}
+
+    def set_state(self, state: dict) -> None:
+        self._recent = deque(state["recent"])
+        self._sorted = sorted(self._recent)
+
+
+class CusumDetector(StreamingDetector):
+    """両側 CUSUM（累積和管理図）.
+
+    ウォームアップ区間で目標平均と標準偏差を推定して固定し、
+    標準化した偏差から許容量 k を引いた累積和を上下それぞれ追跡する。
+    小さく持続的な水準変化を検出する。累積和が管理限界 h を
+    超えたら検知として 0 に戻す。
+
+    Args:
+        k: 許容量（標準偏差の倍数）。検出したい変化量の半分が目安
+        h: 管理限界（標準偏差の倍数）
+        warmup: 目標平均・標準偏差の推定に使う点数
+    """
+
+    def __init__(self, k: float = 0.5, h: float = 5.0, warmup: int = 20):
+        if k < 0:
+            raise ValueError("k must be >= 0")
+        if h <= 0:
+            raise ValueError("h must be > 0")
+        self._k = k
+        self._h = h
+        self._warmup = max(2, warmup)
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._upper = 0.0
+        self._lower = 0.0
+
+    def update(self, value: float, learn: bool = True) -> float:
+        if self._count < self._warmup:
+            if learn:
+                # Welford 法で目標平均・分散を推定する
+                self._count += 1
+                diff = value - self._mean
+                self._mean += diff / self._count
+                self._m2 += diff * (value - self._mean)
+            return 0.0
+        sigma = math.sqrt(self._m2 / (self._count - 1))
+        if sigma == 0:
+            return 0.0
+        z = (value - self._mean) / sigma
+        upper = max(0.0, self._upper + z - self._k)
+        lower = max(0.0, self._lower - z - self._k)
+        score = _normalize(max(upper, lower), self._h)
+        if learn:
+            if max(upper, lower) > self._h:
+                upper = lower = 0.0
+            self._upper, self._lower = upper, lower
+        return score
+
+    def get_state(self) -> dict:
+        return {
+            "count": self._count,
+            "mean": self._mean,
+            "m2": self._m2,
+            "upper": self._upper,
+            "lower": self._lower,
+        }
+
+    def set_state(self, state: dict) -> None:
+        self._count = state["count"]
+        self._mean = state["mean"]
+        self._m2 = state["m2"]
+        self._upper = state["upper"]
+        self._lower = state["lower"]
+
+
+DETECTOR_REGISTRY: dict[str, dict] = {
+    "ewma": {
+        "detector": EwmaDetector,
+        "label": "EWMA 管理図",
+        "description": (
+            "指数加重移動平均からの逸脱を検出する。水準が緩やかに"
+            "変わる系列に追従する"
+        ),
+        "params_schema": {
+            "alpha": {
+                "type": "number",
+                "default": 0.1,
+                "exclusive_min": 0,
+                "max": 1,
+            },
+            "limit": {"type": "number", "default": 3.0, "exclusive_min": 0},
+            "warmup": {"type": "integer", "default": 10, "min": 1},
+        },
+    },
+    "robust_z": {
+        "detector": RobustZDetector,
+        "label": "ロバスト z スコア",
+        "description": (
+            "直近window件の中央値・MADからの逸脱を検出する。"
+            "外れ値が混じっても基準がぶれにくい"
+        ),
+        "params_schema": {
+            "window": {"type": "integer", "default": 50, "min": 3},
+            "limit": {"type": "number", "default": 3.5, "exclusive_min": 0},
+            "warmup": {"type": "integer", "default": 10, "min": 3},
+        },
+    },
+    "cusum": {
+        "detector": CusumDetector,
+        "label": "CUSUM",
+        "description": (
+            "累積和で小さく持続的な水準変化を検出する。"
+            "単発の外れ値より傾向の変化向き"
+        ),
+        "params_schema": {
+            "k": {"type": "number", "default": 0.5, "min": 0},
+            "h": {"type": "number", "default": 5.0, "exclusive_min": 0},
+            "warmup": {"type": "integer", "default": 20, "min": 2},
+        },
+    },
+}
+"""利用可能なストリーミング検知器のレジストリ。
+
+キーは anomaly_params["detector"] に指定する文字列。
+各エントリ: detector, label, description, params_schema。
+params_schema の書式は FEATURE_REGISTRY と同じ（validate_params()）。
+anomaly_params に "detector" がない場合は IsolationForest を使う。
+"""
+
+DETECTOR_KEY = "detector"
+"""anomaly_params で検知器を選ぶキー。"""
+
+
+def detector_name(anomaly_params: dict | None) -> str | None:
+    """anomaly_params が指定するストリーミング検知器名を返す.
+
+    IsolationForest（既定）なら None。
+
+    Raises:
+        ValueError: 未知の検知器名が指定された場合
+    """
+    name = (anomaly_params or {}).get(DETECTOR_KEY)
+    if name is None or name == "isolation_forest":
+        return None
+    if name not in DETECTOR_REGISTRY:
+        raise ValueError(f"Unknown detector: {name}")
+    return name
+
+
+def create_detector(anomaly_params: dict) -> StreamingDetector:
+    """anomaly_params からストリーミング検知器を構築する.
+
+    "detector" 以外のキーは params_schema で検証した上で、
+    検知器のコンストラクタ引数になる。
+
+    Raises:
+        ValueError: 未知の検知器名・不正なパラメータの場合
+    """
+    name = detector_name(anomaly_params)
+    if name is None:
+        raise ValueError("anomaly_params does not select a streaming detector")
+    entry = DETECTOR_REGISTRY[name]
+    params = {k: v for k, v in anomaly_params.items() if k != DETECTOR_KEY}
+    try:
+        validate_params(entry["params_schema"], params, name)
+        return entry["detector"](**params)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid parameters for {name}: {e}") from e
+
+
+def state_fingerprint(
+    anomaly_params: dict, excluded_points: list[datetime]
+) -> str:
+    """検知器の状態が前提とする設定のハッシュ.
+
+    検知器・パラメータ・学習から除外する点が変われば、保存済みの
+    状態は使えず先頭から再計算する。
+    """
+    payload = json.dumps(
+        {
+            "params": anomaly_params,
+            "excluded": sorted(
+                dt.replace(tzinfo=None).isoformat() for dt in excluded_points
+            ),
+        },
+        sort_keys=True,
+    )
+    return "stream:" + hashlib.sha256(payload.encode()).hexdigest()
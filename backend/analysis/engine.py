@@ -1,30 +1,79 @@
 """分析エンジン — トレンド分析と異常検知のオーケストレーター."""
 
+import hashlib
+import logging
+from datetime import datetime
+
 import numpy as np
+from numpy.typing import DTypeLike
 
-from backend.analysis.anomaly import train_and_score
+from backend.analysis.anomaly import (
+    ContaminationSweep,
+    fit_forest,
+    forest_params,
+    sweep_contamination,
+    tree_params,
+)
+from backend.analysis.cpu import CpuBudget
+from backend.analysis.detectors import (
+    create_detector,
+    detector_name,
+    state_fingerprint,
+)
 from backend.analysis.feature import (
     RawWorkTimeFeatureBuilder,
     create_feature_builder,
 )
+from backend.analysis.feature_cache import FeatureCache, feature_config_hash
+from backend.analysis.forest import ForestArtifact, definition_hash
+from backend.analysis.training import ProcessForestTrainer, category_seed
 from backend.analysis.trend import compute_trend
 from backend.interfaces.data_store import (
     CategoryNode,
     DataStoreInterface,
+    WorkRecord,
 )
 from backend.interfaces.feature import FeatureBuilder
 from backend.interfaces.result_store import (
     AnomalyResult,
+    ModelArtifact,
+    ModelDefinition,
     ResultStoreInterface,
     TrendResult,
 )
 
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCancelledError(Exception):
+    """実行中にモデル定義が更新され、分析が古くなったことを示す."""
+
 
 class AnalysisEngine:
     """分析エンジン.
 
     DataStore からデータを取得し、トレンド分析・異常検知を実行し、
     結果を ResultStore に保存する。
+
+    cpu_budget を渡すと、学習・スコアリングはその空き分だけ
+    スレッド並列になる（省略時は単一スレッド）。ジョブキューの
+    ワーカー間で同じ予算を共有すること。
+
+    trainer を渡すと、IsolationForest の学習をそのワーカープロセスで
+    行う（省略時は呼び出しスレッドで学習する）。乱数シードは
+    カテゴリごとに決まるため、どちらでも同じモデルになる。
+
+    feature_cache を渡すと、全期間の特徴量行列をデータバージョンと
+    feature_config ごとにキャッシュし、同じデータの再分析・試算で
+    再構築しない。
+
+    dtype は特徴量行列の dtype（float64 か float32）。IsolationForest は
+    入力を float32 に丸めて評価するため、各特徴量を float64 で計算して
+    から float32 の行列に格納してもスコアは変わらず、行列のメモリは
+    半分になり、学習・採点時の変換コピーもなくなる。
+    float32 になるのはキャッシュ・学習・採点で保持する行列で、構築中は
+    ビルダーの float64 出力が一時的に並存する（単一ビルダーでは出力を
+    丸ごと変換し、複数ビルダーでは結合時に変換する）。
     """
 
     def __init__(
@@ -32,9 +81,20 @@ class AnalysisEngine:
         data_store: DataStoreInterface,
         result_store: ResultStoreInterface,
         feature_builder: FeatureBuilder | None = None,
+        cpu_budget: CpuBudget | None = None,
+        trainer: ProcessForestTrainer | None = None,
+        feature_cache: FeatureCache | None = None,
+        dtype: DTypeLike = np.float64,
     ) -> None:
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError("dtype must be float32 or float64")
+        self._dtype = dtype
         self._data_store = data_store
         self._result_store = result_store
+        self._cpu_budget = cpu_budget or CpuBudget(1)
+        self._trainer = trainer
+        self._feature_cache = feature_cache
         if feature_builder is None:
             feature_builder = RawWorkTimeFeatureBuilder()
         self._feature_builder = feature_builder
@@ -45,10 +105,44 @@ class AnalysisEngine:
         1. Store から全期間データを取得
         2. トレンド分析を実行し結果保存
         3. モデル定義があれば IsolationForest で異常検知
+           （学習入力が前回と同じなら保存済みモデルを再利用し、
+           全期間のデータも同じなら保存済みの raw_score を正規化し直す
+           だけで済ませる。contamination は学習入力に含まない）。
+           anomaly_params でストリーミング検知器が選ばれていれば、
+           保存済みの状態から追記分だけを逐次採点する
+        4. 分析したデータバージョンをウォーターマークとして保存
+
+        バージョンはデータ取得前に読むため、分析中に追記があれば
+        ウォーターマークは古いまま残り、次回の増分分析で拾われる。
+
+        実行は開始時点のモデル定義 version に紐づく。段階の合間に
+        定義が更新されていれば協調的に中断し、異常スコアは
+        version が一致する場合にのみ保存される。中断した実行は
+        ウォーターマークを更新しない（更新を起こした側の実行が担う）。
+        """
+        versions = self._data_store.get_data_versions([category_id])
+        data_version = versions.get(category_id)
+        try:
+            self._analyze(category_id, data_version)
+        except AnalysisCancelledError:
+            logger.info("analysis superseded: category %s", category_id)
+            return
+        if data_version is not None:
+            self._result_store.save_analyzed_version(category_id, data_version)
+
+    def _analyze(
+        self, category_id: int, data_version: int | None = None
+    ) -> None:
+        """トレンド分析と異常検知を実行し結果を保存する.
+
+        data_version は records を読む前に取得したデータバージョン。
         """
+        # 実行を開始時点のモデル定義 version に紐づける
+        model_def = self._result_store.get_model_definition(category_id)
         records = self._data_store.get_records(category_id)
         if not records:
             return
+        cache_version = self._stable_version(category_id, data_version)
 
         records = sorted(records, key=lambda r: r.recorded_at)
         n_values = np.arange(1, len(records) + 1)
@@ -64,65 +158,409 @@ class AnalysisEngine:
             )
         )
 
+        if model_def is not None and detector_name(model_def.anomaly_params):
+            self._analyze_streaming(category_id, records, model_def)
+            return
+
         # 異常検知（IsolationForest）
-        model_def = self._result_store.get_model_definition(category_id)
         if model_def is not None:
-            bl_start = model_def.baseline_start.replace(tzinfo=None)
-            bl_end = model_def.baseline_end.replace(tzinfo=None)
-            baseline_records = [
-                r
-                for r in records
-                if bl_start <= r.recorded_at.replace(tzinfo=None) <= bl_end
-            ]
-            excluded = {
-                dt.replace(tzinfo=None) for dt in model_def.excluded_points
-            }
-            baseline_records = [
-                r
-                for r in baseline_records
-                if r.recorded_at.replace(tzinfo=None) not in excluded
-            ]
-            if not baseline_records:
+            self._ensure_current(model_def)
+            if self._score_appended(category_id, records, model_def):
                 return
+            features = self._build_features(records, model_def, cache_version)
+            if features is None:
+                return
+            all_feat, baseline_feat, feature_state = features
 
-            # feature_config で動的ビルダー生成
-            if model_def.feature_config is not None:
-                feature_builder = create_feature_builder(
-                    model_def.feature_config
-                )
-            else:
-                feature_builder = self._feature_builder
-
-            all_wt = [r.work_time for r in records]
-            all_ts = [r.recorded_at for r in records]
-            all_feat = feature_builder.build(all_wt, all_ts)
-
-            # ベースラインをインデックスで抽出（時系列特徴量の一貫性を保証）
-            baseline_set = {
-                r.recorded_at.replace(tzinfo=None) for r in baseline_records
-            }
-            baseline_indices = [
-                i
-                for i, r in enumerate(records)
-                if r.recorded_at.replace(tzinfo=None) in baseline_set
-            ]
-            baseline_feat = all_feat[baseline_indices]
-
-            scores = train_and_score(
-                baseline_feat,
-                all_feat,
-                anomaly_params=model_def.anomaly_params,
-            )
+            params = forest_params(model_def.anomaly_params)
+            seed = category_seed(category_id)
+            tree = {**tree_params(params), "random_state": seed}
+            fingerprint = definition_hash(baseline_feat, tree)
+            # 全期間の特徴量と木が前回と同じなら保存済みの raw_score が使える
+            scored = definition_hash(all_feat, tree)
+            artifact = self._result_store.get_model_artifact(category_id)
+            forest = self._load_forest(artifact, fingerprint)
+            fitted = forest is None
+            raw_scores = None
+            if not fitted and artifact.meta.get("scored") == scored:
+                raw_scores = self._stored_raw_scores(category_id, records)
+            if raw_scores is None:
+                with self._cpu_budget.lease() as n_jobs:
+                    if forest is None:
+                        self._ensure_current(model_def)
+                        forest = self._fit(baseline_feat, params, n_jobs, seed)
+                    raw_scores = -forest.score_samples(all_feat, n_jobs)
+            # contamination だけの変更は再学習せず、正規化をやり直す
+            forest = forest.with_contamination(params["contamination"])
+            scores = forest.normalize(raw_scores)
 
             anomaly_results = [
                 AnomalyResult(
                     category_id=category_id,
                     recorded_at=records[i].recorded_at,
                     anomaly_score=float(scores[i]),
+                    raw_score=float(raw_scores[i]),
                 )
                 for i in range(len(records))
             ]
-            self._result_store.save_anomaly_results(anomaly_results)
+            # 学習中に更新された場合に備え、比較と書き込みは不可分に行う
+            if not self._result_store.save_anomaly_results(
+                anomaly_results, model_version=model_def.version
+            ):
+                raise AnalysisCancelledError(category_id)
+            arrays, meta = forest.to_arrays()
+            meta["scored"] = scored
+            if feature_state is not None:
+                meta["features"] = _feature_meta(
+                    records, model_def.version, feature_state
+                )
+            if fitted or meta != artifact.meta:
+                # 同じハッシュなら配列は書き直さず、メタ情報だけ更新される
+                self._result_store.save_model_artifact(
+                    ModelArtifact(category_id, fingerprint, arrays, meta)
+                )
+
+    def _score_appended(
+        self,
+        category_id: int,
+        records: list[WorkRecord],
+        model_def: ModelDefinition,
+    ) -> bool:
+        """末尾への追記だけなら、追記分の特徴量を増分構築して採点する.
+
+        保存済みモデルに同じモデル定義 version の特徴量の状態があり、
+        既存の点が変わらず、追記がすべてベースライン期間より後なら、
+        ベースライン（＝学習済みモデル）と既存の点の特徴量・スコアは
+        変わらない。このとき追記分だけを構築・採点して保存する。
+
+        Returns:
+            採点を済ませたら True。全体の再計算が必要なら False。
+        """
+        artifact = self._result_store.get_model_artifact(category_id)
+        cached = artifact.meta.get("features") if artifact else None
+        if cached is None or cached["model_version"] != model_def.version:
+            return False
+        seen = cached["seen"]
+        new_records = records[seen:]
+        if not new_records or not _prefix_matches(records, cached):
+            return False
+        if _naive(new_records[0].recorded_at) <= _naive(
+            model_def.baseline_end
+        ):
+            return False
+        try:
+            rows, state = self._feature_builder_for(
+                model_def
+            ).build_incremental(
+                _work_times(new_records),
+                [r.recorded_at for r in new_records],
+                cached["state"],
+            )
+            rows = self._as_compute(rows)
+            forest = ForestArtifact.from_arrays(artifact.arrays, artifact.meta)
+        except (NotImplementedError, KeyError, ValueError):
+            return False
+
+        self._ensure_current(model_def)
+        with self._cpu_budget.lease() as n_jobs:
+            raw_scores = -forest.score_samples(rows, n_jobs)
+        scores = forest.normalize(raw_scores)
+        anomaly_results = [
+            AnomalyResult(
+                category_id=category_id,
+                recorded_at=r.recorded_at,
+                anomaly_score=float(score),
+                raw_score=float(raw),
+            )
+            for r, score, raw in zip(
+                new_records, scores, raw_scores, strict=True
+            )
+        ]
+        if not self._result_store.save_anomaly_results(
+            anomaly_results, model_version=model_def.version
+        ):
+            raise AnalysisCancelledError(category_id)
+        # 全期間の特徴量のハッシュは求めていないため、scored は無効にする
+        # （次に全体を再計算するときは保存済みの raw_score を使わない）
+        meta = {
+            **artifact.meta,
+            "scored": None,
+            "features": _feature_meta(records, model_def.version, state),
+        }
+        self._result_store.save_model_artifact(
+            ModelArtifact(
+                category_id, artifact.definition_hash, artifact.arrays, meta
+            )
+        )
+        return True
+
+    def _stored_raw_scores(
+        self, category_id: int, records: list[WorkRecord]
+    ) -> np.ndarray | None:
+        """保存済みの raw_score を records の順に返す。欠けていれば None."""
+        stored = {
+            _naive(r.recorded_at): r.raw_score
+            for r in self._result_store.get_anomaly_results(category_id)
+        }
+        values = [stored.get(_naive(r.recorded_at)) for r in records]
+        if any(v is None for v in values):
+            return None
+        return np.array(values, dtype=np.float64)
+
+    def _stable_version(
+        self, category_id: int, data_version: int | None
+    ) -> int | None:
+        """records を読む前後でデータバージョンが変わっていなければ返す.
+
+        読んだ records がそのバージョンのデータだと確かめられたときだけ
+        特徴量をキャッシュできる。キャッシュがなければ確かめない。
+        """
+        if self._feature_cache is None or data_version is None:
+            return None
+        versions = self._data_store.get_data_versions([category_id])
+        if versions.get(category_id) != data_version:
+            return None
+        return data_version
+
+    def _build_features(
+        self,
+        records: list[WorkRecord],
+        model_def: ModelDefinition,
+        data_version: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, dict | None] | None:
+        """全期間とベースラインの特徴量を返す。ベースラインが空なら None.
+
+        3つ目の要素は続きを増分構築するための状態（ビルダーが増分構築に
+        対応していなければ None）。records は記録日時の昇順であること。
+        data_version を渡すと、全期間の特徴量をキャッシュから引く。
+        """
+        bl_start = model_def.baseline_start.replace(tzinfo=None)
+        bl_end = model_def.baseline_end.replace(tzinfo=None)
+        baseline_records = [
+            r
+            for r in records
+            if bl_start <= r.recorded_at.replace(tzinfo=None) <= bl_end
+        ]
+        excluded = {
+            dt.replace(tzinfo=None) for dt in model_def.excluded_points
+        }
+        baseline_records = [
+            r
+            for r in baseline_records
+            if r.recorded_at.replace(tzinfo=None) not in excluded
+        ]
+        if not baseline_records:
+            return None
+
+        all_feat, state = self._all_features(records, model_def, data_version)
+
+        # ベースラインをインデックスで抽出（時系列特徴量の一貫性を保証）
+        baseline_set = {
+            r.recorded_at.replace(tzinfo=None) for r in baseline_records
+        }
+        baseline_indices = [
+            i
+            for i, r in enumerate(records)
+            if r.recorded_at.replace(tzinfo=None) in baseline_set
+        ]
+        return all_feat, all_feat[baseline_indices], state
+
+    def _all_features(
+        self,
+        records: list[WorkRecord],
+        model_def: ModelDefinition,
+        data_version: int | None,
+    ) -> tuple[np.ndarray, dict | None]:
+        """全期間の特徴量と増分構築の状態を、キャッシュを引いて返す."""
+        cache = self._feature_cache if data_version is not None else None
+        config_hash = feature_config_hash(model_def.feature_config)
+        if cache is not None:
+            cached = cache.get(
+                model_def.category_id, data_version, config_hash
+            )
+            if cached is not None:
+                return cached
+
+        feature_builder = self._feature_builder_for(model_def)
+        all_wt = _work_times(records)
+        all_ts = [r.recorded_at for r in records]
+        try:
+            # 結果は build() と同じで、続きの増分構築用の状態も得られる
+            all_feat, state = feature_builder.build_incremental(all_wt, all_ts)
+        except NotImplementedError:
+            all_feat, state = feature_builder.build(all_wt, all_ts), None
+        all_feat = self._as_compute(all_feat)
+        if cache is not None:
+            cache.put(
+                model_def.category_id,
+                data_version,
+                config_hash,
+                all_feat,
+                state,
+            )
+        return all_feat, state
+
+    def _feature_builder_for(
+        self, model_def: ModelDefinition
+    ) -> FeatureBuilder:
+        """モデル定義の feature_config に従うビルダーを返す."""
+        if model_def.feature_config is not None:
+            return create_feature_builder(
+                model_def.feature_config, self._dtype
+            )
+        return self._feature_builder
+
+    def _as_compute(self, features: np.ndarray) -> np.ndarray:
+        """特徴量行列を dtype の C 連続配列にする（一致すればコピーしない）."""
+        return np.ascontiguousarray(features, dtype=self._dtype)
+
+    def preview_contamination(
+        self,
+        model_def: ModelDefinition,
+        contaminations: list[float],
+    ) -> tuple[list[WorkRecord], ContaminationSweep] | None:
+        """未保存のモデル定義で、複数の contamination の判定を試算する.
+
+        学習は1回だけ行い（保存済みモデルが同じ入力なら再利用）、
+        結果は保存しない。ストリーミング検知器には使えない。
+
+        Returns:
+            (記録日時昇順のレコード, 試算結果)。
+            データまたはベースラインが空なら None。
+
+        Raises:
+            ValueError: ストリーミング検知器の定義、または不正な
+                contamination が指定された場合
+        """
+        if detector_name(model_def.anomaly_params) is not None:
+            raise ValueError("preview is only available for IsolationForest")
+        category_id = model_def.category_id
+        data_version = self._data_store.get_data_versions([category_id]).get(
+            category_id
+        )
+        records = sorted(
+            self._data_store.get_records(category_id),
+            key=lambda r: r.recorded_at,
+        )
+        if not records:
+            return None
+        features = self._build_features(
+            records,
+            model_def,
+            self._stable_version(category_id, data_version),
+        )
+        if features is None:
+            return None
+        all_feat, baseline_feat, _ = features
+        params = forest_params(model_def.anomaly_params)
+        seed = category_seed(category_id)
+        forest = self._load_forest(
+            self._result_store.get_model_artifact(category_id),
+            definition_hash(
+                baseline_feat, {**tree_params(params), "random_state": seed}
+            ),
+        )
+        with self._cpu_budget.lease() as n_jobs:
+            if forest is None:
+                forest = self._fit(baseline_feat, params, n_jobs, seed)
+            sweep = sweep_contamination(
+                forest, all_feat, contaminations, n_jobs
+            )
+        return records, sweep
+
+    def _analyze_streaming(
+        self,
+        category_id: int,
+        records: list[WorkRecord],
+        model_def: ModelDefinition,
+    ) -> None:
+        """ストリーミング検知器で追記分を採点し、状態を保存する.
+
+        保存済みの状態が同じ設定で作られ、既存の点が変わらず
+        末尾に追記されただけなら、続きの点だけを採点する。
+        それ以外（初回・設定変更・過去点の挿入や値の変更）は
+        先頭から再計算する。除外点は採点するが学習には使わない。
+        ベースライン期間は使わない（detectors モジュール参照）。
+        """
+        params = model_def.anomaly_params or {}
+        fingerprint = state_fingerprint(params, model_def.excluded_points)
+        detector = create_detector(params)
+        start = 0
+        artifact = self._result_store.get_model_artifact(category_id)
+        if (
+            artifact is not None
+            and artifact.definition_hash == fingerprint
+            and _prefix_matches(records, artifact.meta)
+        ):
+            detector.set_state(artifact.meta["state"])
+            start = artifact.meta["seen"]
+        new_records = records[start:]
+        if not new_records:
+            return
+
+        self._ensure_current(model_def)
+        excluded = {_naive(dt) for dt in model_def.excluded_points}
+        scores = detector.update_many(
+            [r.work_time for r in new_records],
+            learn=[_naive(r.recorded_at) not in excluded for r in new_records],
+        )
+        anomaly_results = [
+            AnomalyResult(
+                category_id=category_id,
+                recorded_at=r.recorded_at,
+                anomaly_score=float(score),
+            )
+            for r, score in zip(new_records, scores, strict=True)
+        ]
+        if not self._result_store.save_anomaly_results(
+            anomaly_results, model_version=model_def.version
+        ):
+            raise AnalysisCancelledError(category_id)
+        self._result_store.save_model_artifact(
+            ModelArtifact(
+                category_id,
+                fingerprint,
+                arrays={},
+                meta={
+                    "state": detector.get_state(),
+                    "seen": len(records),
+                    "digest": _records_digest(records),
+                },
+            )
+        )
+
+    def _fit(
+        self,
+        baseline_feat: np.ndarray,
+        params: dict,
+        n_jobs: int,
+        seed: int,
+    ) -> ForestArtifact:
+        """トレーナーがあればワーカープロセスで、なければ直接学習する."""
+        if self._trainer is not None:
+            return self._trainer.fit(baseline_feat, params, n_jobs, seed)
+        return fit_forest(baseline_feat, params, n_jobs, random_state=seed)
+
+    @staticmethod
+    def _load_forest(
+        artifact: ModelArtifact | None, fingerprint: str
+    ) -> ForestArtifact | None:
+        """学習入力のハッシュが一致すれば保存済みモデルを復元する."""
+        if artifact is None or artifact.definition_hash != fingerprint:
+            return None
+        try:
+            return ForestArtifact.from_arrays(artifact.arrays, artifact.meta)
+        except (KeyError, ValueError):
+            logger.warning(
+                "discarding unreadable model: %s", artifact.category_id
+            )
+            return None
+
+    def _ensure_current(self, model_def: ModelDefinition) -> None:
+        """モデル定義が開始時点から更新されていれば中断する."""
+        current = self._result_store.get_model_version(model_def.category_id)
+        if current != model_def.version:
+            raise AnalysisCancelledError(model_def.category_id)
 
     def run_all(self) -> int:
         """全末端カテゴリに対してトレンド分析を実行する.
@@ -130,11 +568,15 @@ class AnalysisEngine:
         Returns:
             処理した末端カテゴリ数。
         """
+        leaf_ids = self.leaf_category_ids()
+        for category_id in leaf_ids:
+            self.run(category_id)
+        return len(leaf_ids)
+
+    def leaf_category_ids(self) -> list[int]:
+        """分析対象となる全末端カテゴリのIDを返す."""
         tree = self._data_store.get_category_tree()
-        leaves = self._collect_leaves(tree)
-        for leaf in leaves:
-            self.run(leaf.id)
-        return len(leaves)
+        return [leaf.id for leaf in self._collect_leaves(tree)]
 
     @staticmethod
     def _collect_leaves(nodes: list[CategoryNode]) -> list[CategoryNode]:
@@ -146,3 +588,56 @@ class AnalysisEngine:
             else:
                 leaves.extend(AnalysisEngine._collect_leaves(node.children))
         return leaves
+
+
+def _prefix_matches(records: list[WorkRecord], meta: dict) -> bool:
+    """保存時の先頭 seen 件が変わっていないかを確かめる.
+
+    meta には保存時の件数 seen と、その範囲の digest（_records_digest()）
+    を持つ（検知器・特徴量の増分状態と一緒に保存する）。digest のない
+    古い状態は一致しない扱いにする（全体を再計算する）。
+    """
+    seen = meta["seen"]
+    return (
+        seen > 0
+        and len(records) >= seen
+        and meta.get("digest") == _records_digest(records[:seen])
+    )
+
+
+def _records_digest(records: list[WorkRecord]) -> str:
+    """(記録日時, 作業時間) の列全体のダイジェスト.
+
+    件数・合計・最後の日時だけでは、値の入れ替えや打ち消し合う修正を
+    見逃すため、全件をそのままハッシュする。
+    """
+    packed = np.empty(len(records), dtype=[("t", "<i8"), ("w", "<f8")])
+    packed["t"] = np.array(
+        [_naive(r.recorded_at) for r in records], dtype="datetime64[us]"
+    ).astype(np.int64)
+    packed["w"] = _work_times(records)
+    return hashlib.blake2b(packed.tobytes(), digest_size=16).hexdigest()
+
+
+def _feature_meta(
+    records: list[WorkRecord], model_version: int | None, state: dict
+) -> dict:
+    """特徴量の増分構築の状態を、作られた記録の範囲と一緒にまとめる."""
+    return {
+        "model_version": model_version,
+        "state": state,
+        "seen": len(records),
+        "digest": _records_digest(records),
+    }
+
+
+def _work_times(records: list[WorkRecord]) -> np.ndarray:
+    """作業時間の配列（ビルダーはこれをコピーせずに読む）."""
+    return np.fromiter(
+        (r.work_time for r in records), dtype=np.float64, count=len(records)
+    )
+
+
+def _naive(dt: datetime) -> datetime:
+    """タイムゾーンを除いた壁時計時刻を返す."""
+    return dt.replace(tzinfo=None)
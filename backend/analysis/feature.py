@@ -1,9 +1,15 @@
 """FeatureBuilder の実装."""
 
-from collections.abc import Sequence
+import heapq
+import math
+import re
+from abc import abstractmethod
+from collections.abc import Callable, Sequence
 from datetime import datetime
+from typing import ClassVar
 
 import numpy as np
+from numpy.typing import DTypeLike
 
 from backend.interfaces.feature import FeatureBuilder, FeatureConfig
 
@@ -16,10 +22,19 @@ class RawWorkTimeFeatureBuilder(FeatureBuilder):
 
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
-        return np.array(list(work_times)).reshape(-1, 1)
+        # 入力のビューを返す（コピーしない）
+        return work_times.reshape(-1, 1)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        return self._build_impl(work_times), {}
 
 
 class DiffFeatureBuilder(FeatureBuilder):
@@ -31,15 +46,57 @@ class DiffFeatureBuilder(FeatureBuilder):
 
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
-        arr = np.array(list(work_times))
+        arr = work_times
         if len(arr) == 0:
-            return arr.reshape(-1, 1)
+            return np.zeros((0, 1))
         diff = np.diff(arr, prepend=arr[0])
         return diff.reshape(-1, 1)
 
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        last = (state or {}).get("last")
+        arr = work_times
+        if len(arr) == 0:
+            return np.zeros((0, 1)), {"last": last}
+        diff = np.diff(arr, prepend=arr[0] if last is None else last)
+        return diff.reshape(-1, 1), {"last": float(arr[-1])}
+
+
+def _trailing_incremental(
+    work_times: np.ndarray,
+    window: int,
+    reduce: Callable[[np.ndarray], float],
+    state: dict | None,
+) -> tuple[np.ndarray, dict]:
+    """件数の窓（移動平均・移動標準偏差）の増分構築.
+
+    状態には直近 window - 1 件の値と、それまでの件数を持つ。
+    window 件に満たない位置は batch と同じく 0 とする。
+    """
+    recent = (state or {}).get("recent", [])
+    seen = (state or {}).get("seen", 0)
+    new = work_times
+    combined = np.concatenate([np.asarray(recent, dtype=np.float64), new])
+    # combined[0] の系列全体での位置
+    base = seen - len(recent)
+    result = np.zeros(len(new))
+    for k in range(len(new)):
+        j = len(recent) + k
+        if base + j >= window - 1:
+            result[k] = reduce(combined[j - window + 1 : j + 1])
+    keep = combined[len(combined) - min(window - 1, len(combined)) :]
+    return result.reshape(-1, 1), {
+        "recent": [float(v) for v in keep],
+        "seen": seen + len(new),
+    }
+
 
 class MovingAvgFeatureBuilder(FeatureBuilder):
     """移動平均を特徴量にする.
@@ -53,17 +110,25 @@ class MovingAvgFeatureBuilder(FeatureBuilder):
 
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
-        arr = np.array(list(work_times))
+        arr = work_times
         if len(arr) == 0:
-            return arr.reshape(-1, 1)
+            return np.zeros((0, 1))
         result = np.zeros(len(arr))
         for i in range(self._window - 1, len(arr)):
             result[i] = np.mean(arr[i - self._window + 1 : i + 1])
         return result.reshape(-1, 1)
 
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        return _trailing_incremental(work_times, self._window, np.mean, state)
+
 
 class MovingStdFeatureBuilder(FeatureBuilder):
     """移動標準偏差（母集団 std）を特徴量にする.
@@ -77,37 +142,732 @@ class MovingStdFeatureBuilder(FeatureBuilder):
 
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
-        arr = np.array(list(work_times))
+        arr = work_times
         if len(arr) == 0:
-            return arr.reshape(-1, 1)
+            return np.zeros((0, 1))
         result = np.zeros(len(arr))
         for i in range(self._window - 1, len(arr)):
             result[i] = np.std(arr[i - self._window + 1 : i + 1])
         return result.reshape(-1, 1)
 
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        return _trailing_incremental(work_times, self._window, np.std, state)
+
+
+def _sliding_quantile(values: np.ndarray, window: int, q: float) -> np.ndarray:
+    """長さ window の各窓の q 分位点（np.quantile の linear 補間）.
+
+    窓の小さい側 k + 1 件を最大ヒープ、残りを最小ヒープに分けて持つ
+    （k = floor(q * (window - 1))）。窓から外れた点はヒープの先頭に
+    来たときに捨てる（遅延削除）。窓を1つ進めるごとにヒープ操作は
+    定数回なので O(n log w)。
+
+    Returns:
+        shape (n - window + 1,) の配列。i 番目は values[i : i + window]
+    """
+    n = len(values)
+    position = q * (window - 1)
+    k = math.floor(position)
+    frac = position - k
+    low: list[tuple[float, int]] = []  # (-値, 位置) の最大ヒープ
+    high: list[tuple[float, int]] = []  # (値, 位置) の最小ヒープ
+    in_low = np.zeros(n, dtype=bool)
+    n_low = n_high = 0  # 窓内（削除待ちを除く）の件数
+    result = np.empty(max(0, n - window + 1))
+
+    def prune(heap: list[tuple[float, int]], oldest: int) -> None:
+        while heap and heap[0][1] < oldest:
+            heapq.heappop(heap)
+
+    for i, value in enumerate(values.tolist()):
+        oldest = i - window + 1
+        prune(low, oldest)
+        if low and value <= -low[0][0]:
+            heapq.heappush(low, (-value, i))
+            in_low[i] = True
+            n_low += 1
+        else:
+            heapq.heappush(high, (value, i))
+            n_high += 1
+        if oldest > 0:
+            if in_low[oldest - 1]:
+                n_low -= 1
+            else:
+                n_high -= 1
+        target = min(k + 1, n_low + n_high)
+        while n_low > target:
+            prune(low, oldest)
+            neg, j = heapq.heappop(low)
+            heapq.heappush(high, (-neg, j))
+            in_low[j] = False
+            n_low, n_high = n_low - 1, n_high + 1
+        while n_low < target:
+            prune(high, oldest)
+            v, j = heapq.heappop(high)
+            heapq.heappush(low, (-v, j))
+            in_low[j] = True
+            n_low, n_high = n_low + 1, n_high - 1
+        if oldest >= 0:
+            prune(low, oldest)
+            lower = -low[0][0]
+            if frac:
+                prune(high, oldest)
+                lower += frac * (high[0][0] - lower)
+            result[oldest] = lower
+        if len(low) + len(high) > 2 * window + 16:
+            # 削除待ちが溜まったら作り直し、ヒープを窓の大きさに保つ
+            low = [e for e in low if e[1] >= oldest]
+            high = [e for e in high if e[1] >= oldest]
+            heapq.heapify(low)
+            heapq.heapify(high)
+    return result
+
+
+class _RollingQuantileFeatureBuilder(FeatureBuilder):
+    """直近 window 件の分位点から作る特徴量の基底クラス.
+
+    window 未満の先頭は 0 パディング（移動平均と同じ）。
+    サブクラスは quantiles と、その列から特徴量を作る _combine を定める。
+    """
+
+    quantiles: tuple[float, ...] = ()
+
+    def __init__(self, window: int = 5) -> None:
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self._window = window
+
+    def _rolling(self, values: np.ndarray) -> np.ndarray:
+        """各行の分位点 (n, len(quantiles))。window 件未満の行は 0."""
+        result = np.zeros((len(values), len(self.quantiles)))
+        for col, q in enumerate(self.quantiles):
+            result[self._window - 1 :, col] = _sliding_quantile(
+                values, self._window, q
+            )
+        return result
+
+    def _combine(self, quantiles: np.ndarray) -> np.ndarray:
+        return quantiles
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        return self._combine(self._rolling(work_times))
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        """直近 window - 1 件と新しい点を合わせて計算する."""
+        recent = (state or {}).get("recent", [])
+        seen = (state or {}).get("seen", 0)
+        combined = np.concatenate(
+            [np.asarray(recent, dtype=np.float64), work_times]
+        )
+        rows = self._rolling(combined)[len(recent) :]
+        keep = combined[len(combined) - min(self._window - 1, len(combined)) :]
+        return self._combine(rows), {
+            "recent": keep.tolist(),
+            "seen": seen + len(work_times),
+        }
+
+
+class RollingMedianFeatureBuilder(_RollingQuantileFeatureBuilder):
+    """移動中央値を特徴量にする.
+
+    単発の外れ値に引きずられない局所水準。出力次元 d = 1。
+    """
+
+    quantiles = (0.5,)
+
+
+class RollingQuantileFeatureBuilder(_RollingQuantileFeatureBuilder):
+    """移動 q 分位点（q=0.9 なら p90）を特徴量にする.
+
+    出力次元 d = 1。
+    """
+
+    def __init__(self, window: int = 5, q: float = 0.9) -> None:
+        super().__init__(window)
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        self.quantiles = (q,)
+
+
+class RollingIQRFeatureBuilder(_RollingQuantileFeatureBuilder):
+    """移動四分位範囲（p75 - p25）を特徴量にする.
+
+    外れ値に強いばらつきの指標。出力次元 d = 1。
+    """
+
+    quantiles = (0.25, 0.75)
+
+    def _combine(self, quantiles: np.ndarray) -> np.ndarray:
+        return (quantiles[:, 1] - quantiles[:, 0]).reshape(-1, 1)
+
+
+_SECONDS_PER_DAY = 86400.0
+_EPOCH_WEEKDAY = 3
+"""1970-01-01 の曜日（月曜 = 0）."""
+
+
+def _as_datetime64(
+    timestamps: Sequence[datetime] | np.ndarray | None, n: int
+) -> np.ndarray:
+    """記録日時を datetime64[us] の配列に一括変換する.
+
+    記録日時は壁時計時刻（タイムゾーンなし）として扱う。DataStore は
+    naive な datetime を返すため、通常は numpy の一括変換だけで済む。
+    変換済みの datetime64 配列はそのまま返す。
+
+    Raises:
+        ValueError: timestamps が None、または長さが n と異なる場合
+    """
+    if timestamps is None:
+        raise ValueError("timestamp features require timestamps")
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == "M":
+        ts = timestamps.astype("datetime64[us]", copy=False)
+    else:
+        values = list(timestamps)
+        if values and values[0].tzinfo is not None:
+            values = [t.replace(tzinfo=None) for t in values]
+        ts = np.array(values, dtype="datetime64[us]")
+    if len(ts) != n:
+        raise ValueError(f"expected {n} timestamps, got {len(ts)}")
+    return ts
+
+
+def _to_us(ts: np.datetime64) -> int:
+    """datetime64 を状態に保存できる整数（マイクロ秒）にする."""
+    return int(ts.astype("datetime64[us]").astype(np.int64))
+
+
+def _from_us(value: int) -> np.datetime64:
+    """_to_us() の逆変換."""
+    return np.datetime64(value, "us")
+
+
+def _cyclic(fraction: np.ndarray) -> np.ndarray:
+    """周期上の位置 (0〜1) を sin / cos の2列にする（端点が連続する）."""
+    angle = 2.0 * np.pi * fraction
+    return np.column_stack([np.sin(angle), np.cos(angle)])
+
+
+class InterArrivalFeatureBuilder(FeatureBuilder):
+    """前回の記録からの経過時間（時間単位）を特徴量にする.
+
+    先頭は 0 パディング。
+    出力次元 d = 1。
+    """
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        ts = _as_datetime64(timestamps, len(work_times))
+        if len(ts) == 0:
+            return np.zeros((0, 1))
+        gaps = np.diff(ts, prepend=ts[:1]) / np.timedelta64(1, "h")
+        return gaps.reshape(-1, 1)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        last = (state or {}).get("last_us")
+        ts = _as_datetime64(timestamps, len(work_times))
+        if len(ts) == 0:
+            return np.zeros((0, 1)), {"last_us": last}
+        prev = ts[:1] if last is None else _from_us(last)
+        gaps = np.diff(ts, prepend=prev) / np.timedelta64(1, "h")
+        return gaps.reshape(-1, 1), {"last_us": _to_us(ts[-1])}
+
+
+class TimeOfDayFeatureBuilder(FeatureBuilder):
+    """記録時刻の時刻（1日周期）を sin / cos で特徴量にする.
+
+    23:59 と 00:00 が近い値になるよう周期エンコードする。
+    出力次元 d = 2。
+    """
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        ts = _as_datetime64(timestamps, len(work_times))
+        seconds = (ts - ts.astype("datetime64[D]")) / np.timedelta64(1, "s")
+        return _cyclic(seconds / _SECONDS_PER_DAY).reshape(-1, 2)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        return self._build_impl(work_times, timestamps), {}
+
+
+class DayOfWeekFeatureBuilder(FeatureBuilder):
+    """記録日の曜日（7日周期）を sin / cos で特徴量にする.
+
+    曜日内の時刻も含めた連続値で、日曜深夜と月曜早朝が近い値になる。
+    出力次元 d = 2。
+    """
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        ts = _as_datetime64(timestamps, len(work_times))
+        days = ts.astype(np.int64) / (_SECONDS_PER_DAY * 1e6)
+        week = np.mod(days + _EPOCH_WEEKDAY, 7.0) / 7.0
+        return _cyclic(week).reshape(-1, 2)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        return self._build_impl(work_times, timestamps), {}
+
+
+class ElapsedTimeFeatureBuilder(FeatureBuilder):
+    """最初の記録からの経過日数を特徴量にする.
+
+    起点はカテゴリの最初の記録で、ベースライン期間には依存しない。
+    経過に伴う長期的な変化（劣化）を表す。
+    出力次元 d = 1。
+    """
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        ts = _as_datetime64(timestamps, len(work_times))
+        if len(ts) == 0:
+            return np.zeros((0, 1))
+        return ((ts - ts[0]) / np.timedelta64(1, "D")).reshape(-1, 1)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        origin = (state or {}).get("origin_us")
+        ts = _as_datetime64(timestamps, len(work_times))
+        if len(ts) == 0:
+            return np.zeros((0, 1)), {"origin_us": origin}
+        if origin is None:
+            origin = _to_us(ts[0])
+        elapsed = (ts - _from_us(origin)) / np.timedelta64(1, "D")
+        return elapsed.reshape(-1, 1), {"origin_us": origin}
+
+
+_DURATION_UNITS = {"s": "s", "m": "m", "h": "h", "d": "D", "w": "W"}
+
+
+def _parse_duration(text: str) -> np.timedelta64:
+    """ "24h" や "7d" のような期間指定を timedelta64 に変換する.
+
+    単位は s（秒）, m（分）, h（時間）, d（日）, w（週）。
+
+    Raises:
+        ValueError: 書式が不正、または 0 以下の場合
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([smhdw])\s*", str(text))
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window: {text!r} (e.g. '24h', '7d')")
+    amount, unit = int(match.group(1)), _DURATION_UNITS[match.group(2)]
+    return np.timedelta64(amount, unit).astype("timedelta64[us]")
+
+
+def _window_sums(
+    values: np.ndarray, start: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """各行で終わる窓 [start, i] の合計と件数を累積和から求める."""
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    end = np.arange(1, len(values) + 1)
+    return cumsum[end] - cumsum[start], end - start
+
+
+def _window_extreme(
+    values: np.ndarray, start: np.ndarray, reduce: np.ufunc
+) -> np.ndarray:
+    """各行で終わる窓 [start, i] の最小値・最大値を sparse table で求める.
+
+    level[j][i] は values[i : i + 2**j] の集計値。長さ L の窓は
+    2**k <= L を満たす最大の k の区間2つで覆える（重なってよい）。
+    構築は窓の最大長までの段数だけ行い、O(n log L) で済ませる。
+    """
+    n = len(values)
+    end = np.arange(n)
+    k = np.log2(end - start + 1).astype(np.intp)
+    levels = [values]
+    for j in range(1, int(k.max()) + 1):
+        half = 1 << (j - 1)
+        prev = levels[-1]
+        levels.append(reduce(prev[:-half], prev[half:]))
+    result = np.empty(n)
+    for j, level in enumerate(levels):
+        rows = np.flatnonzero(k == j)
+        result[rows] = reduce(
+            level[start[rows]], level[end[rows] - (1 << j) + 1]
+        )
+    return result
+
+
+class _TimeWindowFeatureBuilder(FeatureBuilder):
+    """直近 window 時間 (t - window, t] の記録を集計する特徴量の基底.
+
+    窓の開始位置は記録日時の二分探索で求めるため、記録の間隔が
+    不規則でも窓は常に同じ時間幅になる。窓の終端は自分自身で
+    （同時刻の後続の記録は含まない）、件数は 1 以上。
+    timestamps は昇順であること。
+    出力次元 d = 1。
+    """
+
+    def __init__(self, window: str = "24h") -> None:
+        self._window = _parse_duration(window)
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        values = work_times
+        ts = _as_datetime64(timestamps, len(values))
+        if len(values) == 0:
+            return np.zeros((0, 1))
+        if np.any(ts[1:] < ts[:-1]):
+            raise ValueError("timestamps must be sorted in ascending order")
+        start = np.searchsorted(ts, ts - self._window, side="right")
+        return self._aggregate(values, start).reshape(-1, 1)
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        """直近の記録と新しい点を合わせて集計する.
+
+        状態には今後の窓に入りうる記録（最後の記録から window 以内）
+        だけを持つ。
+        """
+        recent_values = (state or {}).get("values", [])
+        recent_us = (state or {}).get("times_us", [])
+        new_values = work_times
+        new_ts = _as_datetime64(timestamps, len(new_values))
+        values = np.concatenate([recent_values, new_values])
+        ts = np.concatenate(
+            [np.array(recent_us, dtype="datetime64[us]"), new_ts]
+        )
+        if len(new_values) == 0:
+            return np.zeros((0, 1)), dict(state or {})
+        rows = self._build_impl(values, ts)[len(recent_values) :]
+        keep = np.searchsorted(ts, ts[-1] - self._window, side="right")
+        return rows, {
+            "values": values[keep:].tolist(),
+            "times_us": ts[keep:].astype(np.int64).tolist(),
+        }
+
+    @abstractmethod
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        """各行 i について values[start[i] : i + 1] を集計する."""
+
+
+class TimeWindowMeanFeatureBuilder(_TimeWindowFeatureBuilder):
+    """直近 window 時間の平均を特徴量にする."""
+
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        sums, counts = _window_sums(values, start)
+        return sums / counts
+
+
+class TimeWindowStdFeatureBuilder(_TimeWindowFeatureBuilder):
+    """直近 window 時間の標準偏差（母集団 std）を特徴量にする."""
+
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        # 二乗和の桁落ちを抑えるため全体平均を引いてから累積する
+        centered = values - values.mean()
+        sums, counts = _window_sums(centered, start)
+        squares, _ = _window_sums(centered**2, start)
+        mean = sums / counts
+        var = squares / counts - mean**2
+        # 累積和の差の丸め誤差（累積値に比例）以下は 0 とみなす。
+        # 同じ値が続く窓で sqrt により誤差が増幅されるのを防ぐ
+        noise = 16 * np.finfo(np.float64).eps * np.cumsum(centered**2)
+        var[var <= noise / counts] = 0.0
+        return np.sqrt(var)
+
+
+class TimeWindowMinFeatureBuilder(_TimeWindowFeatureBuilder):
+    """直近 window 時間の最小値を特徴量にする."""
+
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        return _window_extreme(values, start, np.minimum)
+
+
+class TimeWindowMaxFeatureBuilder(_TimeWindowFeatureBuilder):
+    """直近 window 時間の最大値を特徴量にする."""
+
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        return _window_extreme(values, start, np.maximum)
+
+
+class TimeWindowCountFeatureBuilder(_TimeWindowFeatureBuilder):
+    """直近 window 時間の記録件数を特徴量にする."""
+
+    def _aggregate(self, values: np.ndarray, start: np.ndarray) -> np.ndarray:
+        return (np.arange(1, len(values) + 1) - start).astype(np.float64)
+
+
+_SCAN_CHUNK = 128
+"""_linear_scan() で1段目の走査をまとめて行う区間の長さ."""
+
+
+def _prefix_scan(a: np.ndarray, b: np.ndarray) -> None:
+    """最後の軸に沿って (a, b) の合成の累積をその場で求める.
+
+    y = a * y_prev + b の写像 (a, b) の合成は
+    (a2, b2) ∘ (a1, b1) = (a1 * a2, a2 * b1 + b2)。これを Hillis-Steele
+    の並列プレフィックスで log2(長さ) 回のベクトル演算にする。
+    終了後の b[..., j] は先頭から j までを合成した写像に y_prev = 0 を
+    与えた値、a[..., j] はその係数。積だけで割り算がないため、a が
+    0（初期化）や非常に小さくても溢れない。
+    """
+    d = 1
+    while d < a.shape[-1]:
+        b[..., d:] += a[..., d:] * b[..., :-d]
+        a[..., d:] *= a[..., :-d]
+        d *= 2
+
+
+def _linear_scan(a: np.ndarray, b: np.ndarray, y0: float) -> np.ndarray:
+    """y[i] = a[i] * y[i-1] + b[i]（y[-1] = y0）を解く.
+
+    _SCAN_CHUNK 件ずつの区間を2次元配列にまとめて区間内を走査し、
+    区間の末尾どうしをもう一度走査して区間をまたぐ値を渡す。
+    Python のループは合成の段数（対数）だけで、要素数や減衰の速さに
+    よらない。
+    """
+    n = len(b)
+    if n == 0:
+        return np.zeros(0)
+    rows = -(-n // _SCAN_CHUNK)
+    # 末尾の詰め物は恒等写像 (1, 0)
+    coef = np.ones(rows * _SCAN_CHUNK)
+    acc = np.zeros(rows * _SCAN_CHUNK)
+    coef[:n] = a
+    acc[:n] = b
+    acc[0] += a[0] * y0
+    coef = coef.reshape(rows, _SCAN_CHUNK)
+    acc = acc.reshape(rows, _SCAN_CHUNK)
+    _prefix_scan(coef, acc)
+    # 各区間の直前の値（区間の末尾を通した累積）
+    carry_a = coef[:, -1].copy()
+    carry_b = acc[:, -1].copy()
+    _prefix_scan(carry_a, carry_b)
+    incoming = np.concatenate([[0.0], carry_b[:-1]])
+    y = acc + coef * incoming[:, None]
+    return y.reshape(-1)[:n]
+
+
+class _EwmaFeatureBuilder(FeatureBuilder):
+    """指数加重移動平均（EWMA）系の特徴量の基底.
+
+    half_life は "20" のような件数か、"24h" や "7d" のような期間で
+    指定する。1件ごとの平滑化係数は alpha = 1 - 0.5 ** (Δ / half_life)
+    で、Δ は件数指定なら 1、期間指定なら前の記録からの経過時間
+    （同時刻の記録は重み 0 になる）。先頭の記録で水準を初期化する。
+
+    水準と分散（West の逐次更新式）はどちらも y = a * y_prev + b の
+    1次の漸化式なので、_linear_scan() で要素ごとのループなしに解く。
+    期間指定のとき timestamps は昇順であること。出力次元 d = 1。
+    """
+
+    with_variance: ClassVar[bool] = False
+
+    def __init__(self, half_life: str = "10") -> None:
+        text = str(half_life).strip()
+        self._half_life_records = None
+        self._half_life_us = None
+        if text.isdigit():
+            if int(text) == 0:
+                raise ValueError("half_life must be positive")
+            self._half_life_records = int(text)
+        else:
+            window = _parse_duration(text)
+            self._half_life_us = int(window.astype(np.int64))
+
+    def _log_decay(
+        self,
+        n: int,
+        timestamps: Sequence[datetime] | None,
+        last_us: int | None,
+    ) -> tuple[np.ndarray, int | None]:
+        """各記録の減衰 a = 1 - alpha の対数と最後の記録日時を返す."""
+        if self._half_life_records is not None:
+            log_a = np.full(n, -math.log(2.0) / self._half_life_records)
+            return log_a, None
+        ts = _as_datetime64(timestamps, n).astype(np.int64)
+        if n == 0:
+            return np.zeros(0), last_us
+        prev = np.concatenate([[ts[0] if last_us is None else last_us], ts])
+        gaps = np.diff(prev)
+        if np.any(gaps < 0):
+            raise ValueError("timestamps must be sorted in ascending order")
+        return -math.log(2.0) * gaps / self._half_life_us, int(ts[-1])
+
+    def _smooth(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        """水準（with_variance なら分散）の系列と次の状態を返す."""
+        state = state or {}
+        level = state.get("level")
+        log_a, last_us = self._log_decay(
+            len(work_times), timestamps, state.get("last_us")
+        )
+        if level is None and len(work_times):
+            # 先頭は alpha = 1 として自分自身で初期化する
+            log_a[0] = -np.inf
+        a = np.exp(log_a)
+        alpha = -np.expm1(log_a)
+        levels = _linear_scan(a, alpha * work_times, level or 0.0)
+        result = levels
+        new_state = {"level": level, "last_us": last_us}
+        if len(work_times):
+            new_state["level"] = float(levels[-1])
+        if self.with_variance:
+            prev = np.concatenate([[level or 0.0], levels[:-1]])
+            diff = work_times - prev
+            result = _linear_scan(
+                a, a * alpha * diff**2, state.get("var", 0.0)
+            )
+            new_state["var"] = (
+                float(result[-1]) if len(result) else state.get("var", 0.0)
+            )
+        return result.reshape(-1, 1), new_state
+
+    def _build_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None = None,
+    ) -> np.ndarray:
+        return self._smooth(work_times, timestamps, None)[0]
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        """直前の水準・分散（と最後の記録日時）から漸化式を続ける."""
+        return self._smooth(work_times, timestamps, state)
+
+
+class EwmaLevelFeatureBuilder(_EwmaFeatureBuilder):
+    """指数加重移動平均（水準）を特徴量にする."""
+
+
+class EwmaVarianceFeatureBuilder(_EwmaFeatureBuilder):
+    """指数加重移動分散を特徴量にする.
+
+    前の水準からの偏差 diff について
+    var = (1 - alpha) * (var_prev + alpha * diff ** 2) で更新する。
+    """
+
+    with_variance = True
+
+
+_TIME_WINDOW_SCHEMA = {
+    "window": {
+        "type": "string",
+        "default": "24h",
+        "pattern": "^[1-9]\\d*[smhdw]$",
+    },
+}
+
+_EWMA_SCHEMA = {
+    "half_life": {
+        "type": "string",
+        "default": "10",
+        "pattern": "^[1-9]\\d*[smhdw]?$",
+    },
+}
+
 
 class CompositeFeatureBuilder(FeatureBuilder):
     """複数の FeatureBuilder を結合する.
 
-    各ビルダーの出力を np.hstack で水平結合し、
+    各ビルダーの出力を水平結合し、
     ユーザーが自由に特徴量を組み合わせ可能にする。
+
+    結合結果は dtype の C 連続配列になる。各ビルダーの計算は float64 の
+    まま行い、結合時に dtype へ丸めるため、float32 を指定しても
+    float64 の結合行列は作らない。
     """
 
-    def __init__(self, builders: list[FeatureBuilder]) -> None:
+    def __init__(
+        self, builders: list[FeatureBuilder], dtype: DTypeLike = np.float64
+    ) -> None:
         if not builders:
             raise ValueError("At least one builder is required")
         self._builders = builders
+        self._dtype = np.dtype(dtype)
+
+    def _concat(self, arrays: list[np.ndarray]) -> np.ndarray:
+        # 結合しながら dtype に変換する（変換用の中間配列を作らない）
+        return np.concatenate(arrays, axis=1, dtype=self._dtype)
 
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
-        arrays = [b.build(work_times, timestamps) for b in self._builders]
-        return np.hstack(arrays)
+        return self._concat(
+            [b.build(work_times, timestamps) for b in self._builders]
+        )
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        parts = (state or {}).get("parts") or [None] * len(self._builders)
+        if len(parts) != len(self._builders):
+            raise ValueError("state does not match the builders")
+        results = [
+            b.build_incremental(work_times, timestamps, part)
+            for b, part in zip(self._builders, parts, strict=True)
+        ]
+        return self._concat([r[0] for r in results]), {
+            "parts": [r[1] for r in results]
+        }
 
 
 FEATURE_REGISTRY: dict[str, dict] = {
@@ -141,6 +901,118 @@ FEATURE_REGISTRY: dict[str, dict] = {
             "window": {"type": "integer", "default": 5, "min": 2},
         },
     },
+    "rolling_median": {
+        "builder": RollingMedianFeatureBuilder,
+        "label": "移動中央値",
+        "description": (
+            "直近window件の中央値。単発の外れ値に引きずられない局所水準"
+        ),
+        "params_schema": {
+            "window": {"type": "integer", "default": 5, "min": 2},
+        },
+    },
+    "rolling_quantile": {
+        "builder": RollingQuantileFeatureBuilder,
+        "label": "移動分位点",
+        "description": "直近window件のq分位点（例: q=0.9 で p90）",
+        "params_schema": {
+            "window": {"type": "integer", "default": 5, "min": 2},
+            "q": {"type": "number", "default": 0.9, "min": 0, "max": 1},
+        },
+    },
+    "rolling_iqr": {
+        "builder": RollingIQRFeatureBuilder,
+        "label": "移動四分位範囲",
+        "description": (
+            "直近window件の四分位範囲（p75 - p25）。外れ値に強いばらつきの指標"
+        ),
+        "params_schema": {
+            "window": {"type": "integer", "default": 5, "min": 2},
+        },
+    },
+    "inter_arrival": {
+        "builder": InterArrivalFeatureBuilder,
+        "label": "記録間隔",
+        "description": (
+            "前回の記録からの経過時間（時間）。記録の滞りを検出する"
+        ),
+        "params_schema": {},
+    },
+    "time_of_day": {
+        "builder": TimeOfDayFeatureBuilder,
+        "label": "時刻",
+        "description": "記録時刻（1日周期）。普段と違う時間帯の作業を検出する",
+        "params_schema": {},
+    },
+    "day_of_week": {
+        "builder": DayOfWeekFeatureBuilder,
+        "label": "曜日",
+        "description": (
+            "記録の曜日（7日周期）。曜日ごとの傾向からの逸脱を検出する"
+        ),
+        "params_schema": {},
+    },
+    "elapsed": {
+        "builder": ElapsedTimeFeatureBuilder,
+        "label": "経過日数",
+        "description": (
+            "カテゴリの最初の記録からの経過日数"
+            "（ベースライン期間とは無関係）。長期的な劣化を検出する"
+        ),
+        "params_schema": {},
+    },
+    "window_mean": {
+        "builder": TimeWindowMeanFeatureBuilder,
+        "label": "期間平均",
+        "description": (
+            "直近window（例: 24h, 7d）の平均値。記録間隔によらない局所トレンド"
+        ),
+        "params_schema": _TIME_WINDOW_SCHEMA,
+    },
+    "window_std": {
+        "builder": TimeWindowStdFeatureBuilder,
+        "label": "期間標準偏差",
+        "description": (
+            "直近windowの標準偏差。期間内のばらつきの変化を検出する"
+        ),
+        "params_schema": _TIME_WINDOW_SCHEMA,
+    },
+    "window_min": {
+        "builder": TimeWindowMinFeatureBuilder,
+        "label": "期間最小値",
+        "description": "直近windowの最小値",
+        "params_schema": _TIME_WINDOW_SCHEMA,
+    },
+    "window_max": {
+        "builder": TimeWindowMaxFeatureBuilder,
+        "label": "期間最大値",
+        "description": "直近windowの最大値",
+        "params_schema": _TIME_WINDOW_SCHEMA,
+    },
+    "window_count": {
+        "builder": TimeWindowCountFeatureBuilder,
+        "label": "期間件数",
+        "description": "直近windowの記録件数。記録頻度の変化を検出する",
+        "params_schema": _TIME_WINDOW_SCHEMA,
+    },
+    "ewma_level": {
+        "builder": EwmaLevelFeatureBuilder,
+        "label": "指数加重移動平均",
+        "description": (
+            "半減期half_life（件数 例: 20、または期間 例: 7d）で重み付けした"
+            "水準。緩やかなドリフトを検出する"
+        ),
+        "params_schema": _EWMA_SCHEMA,
+    },
+    "ewma_var": {
+        "builder": EwmaVarianceFeatureBuilder,
+        "label": "指数加重移動分散",
+        "description": (
+            "半減期half_lifeで重み付けした分散。ばらつきの緩やかな変化を"
+            "検出する"
+        ),
+        "params_schema": _EWMA_SCHEMA,
+    },
 }
 """利用可能な特徴量ビルダーのレジストリ。
 
@@ -151,28 +1023,88 @@ API・ファクトリに自動反映される。
 """
 
 
-def create_feature_builder(config: FeatureConfig) -> FeatureBuilder:
+def validate_feature_params(feature_type: str, params: dict) -> None:
+    """params を FEATURE_REGISTRY の params_schema で検証する.
+
+    検証内容は validate_params() を参照。
+
+    Raises:
+        ValueError: 未知の feature_type、または params が不正な場合
+    """
+    entry = FEATURE_REGISTRY.get(feature_type)
+    if entry is None:
+        raise ValueError(f"Unknown feature type: {feature_type}")
+    validate_params(entry["params_schema"], params, feature_type)
+
+
+def validate_params(schema: dict, params: dict, owner: str) -> None:
+    """params を params_schema で検証する.
+
+    スキーマにないパラメータ、型（integer / number / string）の不一致、
+    min / max / exclusive_min の範囲外、pattern に合わない文字列を
+    拒否する。特徴量と検知器のレジストリで共通に使う。
+
+    Args:
+        schema: レジストリの params_schema
+        params: 検証するパラメータ
+        owner: エラーメッセージに付ける名前（feature_type 等）
+
+    Raises:
+        ValueError: params が不正な場合
+    """
+    for name, value in params.items():
+        spec = schema.get(name)
+        label = f"{owner}.{name}"
+        if spec is None:
+            raise ValueError(f"Unknown parameter: {label}")
+        expected = _PARAM_TYPES[spec["type"]]
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError(f"{label} must be {spec['type']}")
+        if "min" in spec and value < spec["min"]:
+            raise ValueError(f"{label} must be >= {spec['min']}")
+        if "exclusive_min" in spec and value <= spec["exclusive_min"]:
+            raise ValueError(f"{label} must be > {spec['exclusive_min']}")
+        if "max" in spec and value > spec["max"]:
+            raise ValueError(f"{label} must be <= {spec['max']}")
+        if "pattern" in spec and not re.search(spec["pattern"], value):
+            raise ValueError(f"{label} must match {spec['pattern']}")
+
+
+_PARAM_TYPES: dict[str, type | tuple[type, ...]] = {
+    "integer": int,
+    "number": (int, float),
+    "string": str,
+}
+"""params_schema の type に対応する Python の型。"""
+
+
+def create_feature_builder(
+    config: FeatureConfig, dtype: DTypeLike = np.float64
+) -> FeatureBuilder:
     """FeatureConfig から適切な FeatureBuilder を構築する.
 
     Args:
         config: ユーザーが選択した特徴量の組み合わせ
+        dtype: 複数の特徴量を結合した行列の dtype。特徴量が1つなら
+            ビルダーをそのまま返すため、出力は float64 のままになる
+            （dtype への変換は呼び出し側で行う）
 
     Returns:
         単一ビルダーまたは CompositeFeatureBuilder
 
     Raises:
-        ValueError: 未知の feature_type が指定された場合
+        ValueError: 未知の feature_type、または params_schema に合わない
+            パラメータが指定された場合
     """
     if not config.features:
         return RawWorkTimeFeatureBuilder()
 
     builders: list[FeatureBuilder] = []
     for spec in config.features:
-        entry = FEATURE_REGISTRY.get(spec.feature_type)
-        if entry is None:
-            raise ValueError(f"Unknown feature type: {spec.feature_type}")
+        validate_feature_params(spec.feature_type, spec.params)
+        entry = FEATURE_REGISTRY[spec.feature_type]
         builders.append(entry["builder"](**spec.params))
 
     if len(builders) == 1:
         return builders[0]
-    return CompositeFeatureBuilder(builders)
+    return CompositeFeatureBuilder(builders, dtype)
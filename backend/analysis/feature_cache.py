@@ -0,0 +1,299 @@
+"""特徴量行列のキャッシュ.
+
+プロット表示・ベースライン編集・感度の試算・定期実行は、同じカテゴリの
+同じデータに対して同じ FeatureConfig の特徴量行列を何度も構築する。
+FeatureCache はそれを (カテゴリ ID, データバージョン, FeatureConfig の
+ハッシュ) をキーに保持する。
+
+データバージョンは作業記録の書き込みごとに単調増加するため、書き込み後の
+参照が古い行列に当たることはない。古いバージョンのエントリは、同じ
+カテゴリの新しいバージョンが格納された時点か、records-appended
+イベントを受けた invalidate() で捨てる（dependencies で購読する）。
+
+メモリ上の容量はバイト数で制限し、溢れたものは最近使われていない順に
+追い出す。spill_dir を指定すると、追い出したエントリを .npy（と状態の
+.json）として書き出し、次の参照で読み戻す（ディスク側も容量で制限する）。
+API と定期実行のプロセスが同じ spill_dir を指定しても干渉しないよう、
+書き出し先はプロセスごとのサブディレクトリにし、close() か
+プロセス終了時に消す。
+
+キャッシュした行列は書き込み不可にして共有する。呼び出し側は
+変更しないこと。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from backend.interfaces.feature import FeatureConfig
+
+CacheKey = tuple[int, int, str]
+"""(カテゴリ ID, データバージョン, FeatureConfig のハッシュ)。"""
+
+
+def feature_config_hash(config: FeatureConfig | None) -> str:
+    """FeatureConfig の正規化したハッシュ.
+
+    params のキー順によらず同じ値になる。None（既定のビルダー）は
+    固定の値になる。
+    """
+    if config is None:
+        return "default"
+    canonical = json.dumps(
+        [
+            {"feature_type": spec.feature_type, "params": spec.params}
+            for spec in config.features
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class _Entry:
+    matrix: np.ndarray
+    state: dict | None
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+
+class FeatureCache:
+    """容量制限付きの特徴量行列キャッシュ（LRU）.
+
+    ジョブキューの複数ワーカーから呼ばれるため、操作はスレッドセーフ。
+
+    Args:
+        max_bytes: メモリに保持する行列の合計バイト数の上限
+        spill_dir: 追い出したエントリの書き出し先。その下の
+            feature_cache/<pid>-<乱数> ディレクトリを使う。None なら捨てる
+        max_spill_bytes: spill_dir に保持する行列の合計バイト数の上限
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        spill_dir: str | None = None,
+        max_spill_bytes: int | None = None,
+    ) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0")
+        self._max_bytes = max_bytes
+        self._spill_dir = None
+        self._finalizer = None
+        if spill_dir is not None:
+            # 他のプロセス（や別のインスタンス）のファイルには触れない
+            self._spill_dir = (
+                Path(spill_dir)
+                / "feature_cache"
+                / f"{os.getpid()}-{uuid.uuid4().hex}"
+            )
+            self._spill_dir.mkdir(parents=True)
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, self._spill_dir, ignore_errors=True
+            )
+        self._max_spill_bytes = (
+            max_spill_bytes if max_spill_bytes is not None else 4 * max_bytes
+        )
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._spilled: OrderedDict[CacheKey, int] = OrderedDict()
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._hits = 0
+        self._spill_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(
+        self, category_id: int, data_version: int, config_hash: str
+    ) -> tuple[np.ndarray, dict | None] | None:
+        """キャッシュした (特徴量行列, 増分構築の状態) か None を返す."""
+        key = (category_id, data_version, config_hash)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return entry.matrix, entry.state
+            if key in self._spilled:
+                entry = self._read_spill(key)
+                if entry is not None:
+                    self._spill_hits += 1
+                    if entry.nbytes <= self._max_bytes:
+                        self._insert(key, entry)
+                    return entry.matrix, entry.state
+            self._misses += 1
+            return None
+
+    def put(
+        self,
+        category_id: int,
+        data_version: int,
+        config_hash: str,
+        matrix: np.ndarray,
+        state: dict | None = None,
+    ) -> None:
+        """行列を格納する。同じカテゴリの古いバージョンは捨てる.
+
+        matrix は書き込み不可に設定される（コピーはしない）。
+        """
+        matrix.setflags(write=False)
+        key = (category_id, data_version, config_hash)
+        with self._lock:
+            self._drop(lambda k: k[0] == category_id and k[1] < data_version)
+            self._discard(key)
+            self._insert(key, _Entry(matrix, state))
+
+    def invalidate(
+        self,
+        category_ids: list[int],
+        versions: dict[int, int] | None = None,
+    ) -> None:
+        """指定カテゴリのエントリを捨てる（作業記録の書き込み時）.
+
+        versions（カテゴリ ID → 新しいデータバージョン）を渡すと、
+        それより古いバージョンのエントリだけを捨てる。書き込み後に
+        再分析が格納した新しい行列は残る。
+        """
+        targets = set(category_ids)
+        newest = versions or {}
+
+        def stale(key: CacheKey) -> bool:
+            if key[0] not in targets:
+                return False
+            return key[0] not in newest or key[1] < newest[key[0]]
+
+        with self._lock:
+            self._invalidations += self._drop(stale)
+
+    def clear(self) -> None:
+        """全エントリを捨てる（全データ削除時）."""
+        with self._lock:
+            self._invalidations += self._drop(lambda k: True)
+
+    def close(self) -> None:
+        """全エントリを捨て、このインスタンスの書き出し先を消す."""
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self._bytes = 0
+            self._spill_bytes = 0
+            if self._finalizer is not None:
+                self._finalizer()
+            self._spill_dir = None
+
+    def metrics(self) -> dict:
+        """ヒット・ミス数と使用量の統計を返す."""
+        with self._lock:
+            lookups = self._hits + self._spill_hits + self._misses
+            return {
+                "hits": self._hits,
+                "spill_hits": self._spill_hits,
+                "misses": self._misses,
+                "hit_ratio": (
+                    (self._hits + self._spill_hits) / lookups
+                    if lookups
+                    else 0.0
+                ),
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "spill_entries": len(self._spilled),
+                "spill_bytes": self._spill_bytes,
+                "max_spill_bytes": (
+                    self._max_spill_bytes if self._spill_dir else 0
+                ),
+            }
+
+    # 以下はロックを保持して呼ぶこと
+
+    def _insert(self, key: CacheKey, entry: _Entry) -> None:
+        """メモリ側に格納し、容量を超えた分を古い順に追い出す.
+
+        1つで max_bytes を超える行列は、他のエントリを追い出さないよう
+        メモリには置かず、直接書き出す（spill_dir がなければ捨てる）。
+        """
+        if entry.nbytes > self._max_bytes:
+            self._spill(key, entry)
+            return
+        self._memory[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self._max_bytes and self._memory:
+            old_key, old = self._memory.popitem(last=False)
+            self._bytes -= old.nbytes
+            self._evictions += 1
+            self._spill(old_key, old)
+
+    def _spill(self, key: CacheKey, entry: _Entry) -> None:
+        """追い出したエントリを書き出す。容量を超えた分は古い順に消す."""
+        if self._spill_dir is None or entry.nbytes > self._max_spill_bytes:
+            return
+        stem = self._spill_path(key)
+        np.save(stem.with_suffix(".npy"), entry.matrix)
+        stem.with_suffix(".json").write_text(json.dumps(entry.state))
+        self._spilled[key] = entry.nbytes
+        self._spill_bytes += entry.nbytes
+        while self._spill_bytes > self._max_spill_bytes:
+            old_key = next(iter(self._spilled))
+            self._remove_spill(old_key)
+
+    def _read_spill(self, key: CacheKey) -> _Entry | None:
+        """書き出したエントリを読み戻し、ディスク側から外す.
+
+        メモリに置けない大きさのものはディスク側に残す。
+        """
+        stem = self._spill_path(key)
+        try:
+            matrix = np.load(stem.with_suffix(".npy"))
+            state = json.loads(stem.with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            matrix = None
+        if matrix is None or matrix.nbytes <= self._max_bytes:
+            self._remove_spill(key)
+        else:
+            self._spilled.move_to_end(key)
+        if matrix is None:
+            return None
+        matrix.setflags(write=False)
+        return _Entry(matrix, state)
+
+    def _remove_spill(self, key: CacheKey) -> None:
+        self._spill_bytes -= self._spilled.pop(key)
+        stem = self._spill_path(key)
+        stem.with_suffix(".npy").unlink(missing_ok=True)
+        stem.with_suffix(".json").unlink(missing_ok=True)
+
+    def _spill_path(self, key: CacheKey) -> Path:
+        category_id, data_version, config_hash = key
+        digest = hashlib.sha256(config_hash.encode()).hexdigest()[:16]
+        return self._spill_dir / f"{category_id}_{data_version}_{digest}"
+
+    def _discard(self, key: CacheKey) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+        if key in self._spilled:
+            self._remove_spill(key)
+
+    def _drop(self, predicate: Callable[[CacheKey], bool]) -> int:
+        """predicate に一致するキーをメモリとディスクから捨て、件数を返す."""
+        keys = {k for k in (*self._memory, *self._spilled) if predicate(k)}
+        for key in keys:
+            self._discard(key)
+        return len(keys)
@@ -0,0 +1,373 @@
+"""学習済み IsolationForest のフラット配列表現.
+
+scikit-learn の推定器オブジェクトは pickle 以外に永続化手段がなく、
+読み込みのたびに全ツリーを復元する必要がある。ここでは推論に必要な
+ノード情報だけを全ツリー連結のフラットな配列に展開し、.npy として
+保存・メモリマップできる形にする。
+
+スコアは scikit-learn の score_samples と一致する:
+入力を float32 に丸めてから閾値（float64）と比較し、到達した葉で
+「葉の深さ + c(葉のサンプル数) - 1」を合算して正規化する。
+
+木の構造は contamination に依存しない。contamination が決めるのは
+ベースラインの score_samples の分位点（offset）と正規化の基準だけなので、
+ベースラインのスコアを一緒に保持しておけば、contamination の変更は
+再学習なしに with_contamination() で反映できる。
+
+評価は全ツリーを同時に1段ずつ進める。葉は自分自身へ戻る遷移に
+置き換えてあるため、マスクなしで最大深さ回の配列演算を繰り返すだけで
+全 (行, ツリー) が葉に到達する（_traversal 参照）。
+scikit-learn の推定器呼び出しに伴う入力検証や joblib のディスパッチが
+ないため、数点の追記時のような小さいバッチでも呼び出しごとの
+固定費が小さい。
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import cached_property
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+ARTIFACT_FORMAT = 3
+"""配列レイアウトの版。変更時は定義ハッシュも変わり、再学習される。"""
+
+CHUNK_CELLS = 1 << 16
+"""1回の走査で扱う (行 × ツリー) の上限。作業配列をキャッシュに収める。"""
+
+_ARRAY_FIELDS = (
+    "children_left",
+    "children_right",
+    "feature",
+    "threshold",
+    "leaf_value",
+    "missing_left",
+    "roots",
+    "baseline_scores",
+)
+
+
+def _average_path_length(n: np.ndarray) -> np.ndarray:
+    """n サンプルの iTree における平均パス長 c(n)（sklearn と同一式）."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    many = n > 2
+    out[many] = (
+        2.0 * (np.log(n[many] - 1.0) + np.euler_gamma)
+        - 2.0 * (n[many] - 1.0) / n[many]
+    )
+    return out
+
+
+def _scale(offset: float, baseline_scores: np.ndarray) -> tuple[float, float]:
+    """ベースラインの -decision_function から正規化の基準を求める.
+
+    Returns:
+        (異常側の最大値, 正常側の絶対値最大)。該当する点がなければ 1.0。
+    """
+    raw = offset - baseline_scores
+    upper = float(raw.max())
+    lower = float(raw.min())
+    return (upper if upper > 0 else 1.0, abs(lower) if lower < 0 else 1.0)
+
+
+@dataclass(frozen=True)
+class ForestArtifact:
+    """推論専用の IsolationForest.
+
+    ノード配列は全ツリーを連結したもので、子ノードの添字も連結後の
+    通し番号。葉は children_left == -1。
+
+    Attributes:
+        children_left: 左の子ノード (n_nodes,) int32
+        children_right: 右の子ノード (n_nodes,) int32
+        feature: 分岐に使う特徴量の列番号 (n_nodes,) int32
+        threshold: 分岐閾値 (n_nodes,) float64
+        leaf_value: 葉の深さ + c(葉のサンプル数) - 1 (n_nodes,) float64
+        missing_left: NaN 入力を左へ進めるか (n_nodes,) bool
+        roots: 各ツリーの根ノード (n_trees,) int64
+        baseline_scores: ベースラインの score_samples (n_baseline,) float64
+        offset: decision_function のオフセット（sklearn の offset_）
+        denominator: ツリー数 × c(max_samples)
+        pos_max: ベースライン異常側スコアの最大値（正規化用）
+        neg_min: ベースライン正常側スコアの絶対値最大（正規化用）
+        n_features: 特徴量の次元数
+    """
+
+    children_left: np.ndarray
+    children_right: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    leaf_value: np.ndarray
+    missing_left: np.ndarray
+    roots: np.ndarray
+    baseline_scores: np.ndarray
+    offset: float
+    denominator: float
+    pos_max: float
+    neg_min: float
+    n_features: int
+
+    @classmethod
+    def from_sklearn(
+        cls, model: IsolationForest, baseline_scores: np.ndarray
+    ) -> "ForestArtifact":
+        """学習済み IsolationForest をフラット配列に展開する.
+
+        baseline_scores は学習データに対する model.score_samples。
+        offset はモデルの offset_ をそのまま使い、正規化の基準は
+        baseline_scores から求める。
+        """
+        n_features = model.n_features_in_
+        lefts, rights, features, thresholds, leaf_values = [], [], [], [], []
+        missing_lefts, roots = [], []
+        base = 0
+        for tree, columns in zip(
+            model.estimators_, model.estimators_features_, strict=True
+        ):
+            t = tree.tree_
+            roots.append(base)
+            is_leaf = t.children_left == -1
+            lefts.append(np.where(is_leaf, -1, t.children_left + base))
+            rights.append(np.where(is_leaf, -1, t.children_right + base))
+            # 特徴量サブサンプリング時はツリー内の列番号を元の列へ戻す
+            column_map = (
+                np.asarray(columns)
+                if len(columns) != n_features
+                else np.arange(n_features)
+            )
+            features.append(
+                np.where(is_leaf, 0, column_map[np.maximum(t.feature, 0)])
+            )
+            thresholds.append(t.threshold)
+            leaf_values.append(
+                t.compute_node_depths()
+                + _average_path_length(t.n_node_samples)
+                - 1.0
+            )
+            missing_lefts.append(t.missing_go_to_left.astype(bool))
+            base += t.node_count
+        denominator = len(model.estimators_) * float(
+            _average_path_length(np.array([model.max_samples_]))[0]
+        )
+        baseline_scores = np.asarray(baseline_scores, dtype=np.float64)
+        offset = float(model.offset_)
+        pos_max, neg_min = _scale(offset, baseline_scores)
+        return cls(
+            children_left=np.concatenate(lefts).astype(np.int32),
+            children_right=np.concatenate(rights).astype(np.int32),
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            leaf_value=np.concatenate(leaf_values).astype(np.float64),
+            missing_left=np.concatenate(missing_lefts),
+            roots=np.asarray(roots, dtype=np.int64),
+            baseline_scores=baseline_scores,
+            offset=offset,
+            denominator=denominator,
+            pos_max=pos_max,
+            neg_min=neg_min,
+            n_features=n_features,
+        )
+
+    def with_contamination(
+        self, contamination: float | str
+    ) -> "ForestArtifact":
+        """contamination だけを変えたモデルを返す（ノード配列は共有）.
+
+        sklearn が学習時に行うのと同じく、offset をベースラインの
+        score_samples の 100 * contamination パーセンタイル
+        （"auto" なら -0.5）とし、正規化の基準を求め直す。
+        """
+        if contamination == "auto":
+            offset = -0.5
+        else:
+            offset = float(
+                np.percentile(self.baseline_scores, 100.0 * contamination)
+            )
+        pos_max, neg_min = _scale(offset, self.baseline_scores)
+        return replace(self, offset=offset, pos_max=pos_max, neg_min=neg_min)
+
+    @cached_property
+    def _traversal(self) -> tuple[np.ndarray, ...]:
+        """走査用に並べ替えたノード配列と最大深さ.
+
+        全ツリーの根を先頭に、以降は深さ順に並べ、各内部ノードの
+        左右の子を隣接させる。これにより遷移は
+        ``child[node] + (x > threshold[node])`` の1回の参照で済む。
+        葉は child を自分自身、閾値を +inf、NaN の行き先を左にして
+        自己ループにする。
+
+        Returns:
+            (child, feature, threshold, missing_right, leaf_value, depth)
+        """
+        is_leaf = self.children_left == -1
+        frontier = self.roots.astype(np.intp)
+        levels = [frontier]
+        while True:
+            internal = frontier[~is_leaf[frontier]]
+            if len(internal) == 0:
+                break
+            frontier = np.column_stack(
+                [self.children_left[internal], self.children_right[internal]]
+            ).ravel()
+            levels.append(frontier)
+        order = np.concatenate(levels)
+        position = np.empty(len(order), dtype=np.intp)
+        position[order] = np.arange(len(order), dtype=np.intp)
+        leaf = is_leaf[order]
+        child = np.where(
+            leaf,
+            np.arange(len(order), dtype=np.intp),
+            position[np.maximum(self.children_left[order], 0)],
+        )
+        threshold = np.where(leaf, np.inf, self.threshold[order])
+        missing_right = ~(leaf | self.missing_left[order])
+        return (
+            child,
+            self.feature[order].astype(np.intp),
+            threshold,
+            missing_right,
+            self.leaf_value[order],
+            np.asarray(len(levels) - 1),
+        )
+
+    def score_samples(self, x: np.ndarray, n_jobs: int = 1) -> np.ndarray:
+        """sklearn の IsolationForest.score_samples と同じ値を返す.
+
+        行を CHUNK_CELLS に収まる塊に分けて評価する。n_jobs > 1 なら
+        塊をスレッドで並列に評価する（numpy の配列演算は GIL を解放する）。
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError(
+                f"expected (n, {self.n_features}) features, got {x.shape}"
+            )
+        rows_per_chunk = max(1, CHUNK_CELLS // len(self.roots))
+        chunks = [
+            x[start : start + rows_per_chunk]
+            for start in range(0, len(x), rows_per_chunk)
+        ]
+        if len(chunks) <= 1:
+            depths = self._path_lengths(x)
+        elif n_jobs <= 1:
+            depths = np.concatenate([self._path_lengths(c) for c in chunks])
+        else:
+            workers = min(n_jobs, len(chunks))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                depths = np.concatenate(
+                    list(pool.map(self._path_lengths, chunks))
+                )
+        # 学習サンプル1件のとき分母・深さとも 0 になる。sklearn に合わせ
+        # 指数を -1 とする
+        exponent = np.divide(
+            depths,
+            self.denominator,
+            out=np.ones_like(depths),
+            where=self.denominator != 0,
+        )
+        return -(2**-exponent)
+
+    def _path_lengths(self, x: np.ndarray) -> np.ndarray:
+        """各行の全ツリー合計パス長を返す（x は float32 変換済み）."""
+        child, feature, threshold, missing_right, leaf_value, depth = (
+            self._traversal
+        )
+        has_missing = bool(np.isnan(x).any())
+        rows = np.arange(x.shape[0], dtype=np.intp)[:, None]
+        node = np.broadcast_to(
+            np.arange(len(self.roots), dtype=np.intp),
+            (len(x), len(self.roots)),
+        )
+        for _ in range(int(depth)):
+            # 1次元なら列の参照は不要（ブロードキャストで比較する）
+            values = x if self.n_features == 1 else x[rows, feature[node]]
+            go_right = values > threshold[node]
+            if has_missing:
+                # NaN は学習時に決まったノードごとの向きへ進む
+                go_right = np.where(
+                    np.isnan(values), missing_right[node], go_right
+                )
+            node = child[node] + go_right
+        return leaf_value[node].sum(axis=1)
+
+    def decision_function(self, x: np.ndarray, n_jobs: int = 1) -> np.ndarray:
+        """sklearn の IsolationForest.decision_function と同じ値を返す."""
+        return self.score_samples(x, n_jobs) - self.offset
+
+    def normalized_scores(self, x: np.ndarray, n_jobs: int = 1) -> np.ndarray:
+        """contamination 境界を 0.5 とする 0〜1 の異常スコアを返す."""
+        return self.normalize(-self.score_samples(x, n_jobs))
+
+    def normalize(self, raw_scores: np.ndarray) -> np.ndarray:
+        """保存済みの -score_samples を正規化スコアに変換する.
+
+        木を辿らないため、contamination だけが変わったときは
+        保存済みの値からスコアを作り直せる。
+        """
+        # -decision_function = offset - score_samples
+        raw = self.offset + np.asarray(raw_scores, dtype=np.float64)
+        scores = np.where(
+            raw >= 0,
+            0.5 + 0.5 * raw / self.pos_max,
+            0.5 - 0.5 * np.abs(raw) / self.neg_min,
+        )
+        return np.clip(scores, 0.0, 1.0)
+
+    def to_arrays(self) -> tuple[dict[str, np.ndarray], dict]:
+        """永続化用に (配列, スカラーのメタ情報) へ分解する."""
+        arrays = {name: getattr(self, name) for name in _ARRAY_FIELDS}
+        meta = {
+            "format": ARTIFACT_FORMAT,
+            "offset": self.offset,
+            "denominator": self.denominator,
+            "pos_max": self.pos_max,
+            "neg_min": self.neg_min,
+            "n_features": self.n_features,
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], meta: dict
+    ) -> "ForestArtifact":
+        """to_arrays() の出力から復元する（配列はコピーしない）."""
+        if meta.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"unsupported artifact format: {meta!r}")
+        return cls(
+            **{name: arrays[name] for name in _ARRAY_FIELDS},
+            offset=meta["offset"],
+            denominator=meta["denominator"],
+            pos_max=meta["pos_max"],
+            neg_min=meta["neg_min"],
+            n_features=meta["n_features"],
+        )
+
+
+def definition_hash(baseline_features: np.ndarray, params: dict) -> str:
+    """学習結果を一意に決める入力のハッシュ.
+
+    ベースライン特徴量のバイト列と IsolationForest パラメータ、
+    配列レイアウトの版を含む。いずれかが変われば再学習が必要になる。
+    contamination は木に影響しないため params に含めないこと
+    （anomaly.tree_params 参照）。
+
+    float32 の特徴量は変換せずにそのままハッシュする（float64 に広げた
+    コピーを作らない）。float64 と float32 の行列は別の入力として扱う。
+    """
+    features = np.ascontiguousarray(baseline_features)
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "params": params,
+        "shape": features.shape,
+    }
+    if features.dtype == np.float32:
+        header["dtype"] = "float32"
+    else:
+        features = features.astype(np.float64, copy=False)
+    digest = hashlib.sha256()
+    digest.update(json.dumps(header, sort_keys=True).encode())
+    digest.update(features.tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,445 @@
+"""分析ジョブキュー — AnalysisEngine をバックグラウンドで実行する.
+
+API ハンドラは分析をキューに投入してジョブIDを即座に返し、
+ワーカープールが engine.run() を実行する。これにより取り込みの
+レイテンシは DB 書き込みのみで決まり、IsolationForest の学習が
+イベントループをブロックしなくなる。
+
+実行単位はカテゴリ。同一カテゴリへの要求は静穏期間（quiet_period）内で
+1回の実行にまとめられ、最初の要求から max_delay 経過すると静穏を
+待たずに実行される。カテゴリごとに実行中は最大1件、その後ろに
+待機する再実行も最大1件に制限されるため、持続的な取り込みでも
+重複実行が積み上がらない。
+
+実行可能になったカテゴリは優先度レーン（interactive > ingest > bulk）に
+並び、ワーカーは優先度の高いレーンから取り出す。一部のワーカーは
+interactive 専用に予約されるため、全末端カテゴリの一括分析が
+積まれていてもモデル定義の編集は待たされない。
+
+感度の試算のようにカテゴリの分析以外で学習を伴う処理も submit_call()
+で同じレーンに並べ、ワーカー数と CpuBudget の範囲で実行する。
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Literal
+
+from backend.analysis.engine import AnalysisEngine
+
+logger = logging.getLogger(__name__)
+
+JobState = Literal["queued", "running", "succeeded", "failed"]
+Lane = Literal["interactive", "ingest", "bulk"]
+
+LANES: tuple[Lane, ...] = ("interactive", "ingest", "bulk")
+"""優先度の高い順に並べたレーン。"""
+
+
+@dataclass
+class AnalysisJob:
+    """1回の分析要求（複数カテゴリをまとめて扱う）."""
+
+    id: str
+    category_ids: list[int]
+    lane: Lane = "ingest"
+    state: JobState = "queued"
+    completed: int = 0
+    error: str | None = None
+    failed_category_ids: list[int] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: datetime | None = None
+
+    @property
+    def progress(self) -> float:
+        """完了したカテゴリの割合 (0〜1)。対象なしは 1.0."""
+        if not self.category_ids:
+            return 1.0
+        return self.completed / len(self.category_ids)
+
+    @property
+    def done(self) -> bool:
+        """終了状態（成功・失敗）に達しているか."""
+        return self.state in ("succeeded", "failed")
+
+
+@dataclass
+class _CategorySlot:
+    """カテゴリ単位の実行状態.
+
+    pending は次回実行を待つジョブ、running は実行中の回に
+    相乗りしたジョブ。実行中に届いた要求は pending に積まれ、
+    1回の再実行にまとめられる。lane は pending のうち最も優先度の
+    高いレーン、ready_lane は実行待ちとして並んでいるレーン。
+    """
+
+    pending: list[AnalysisJob] = field(default_factory=list)
+    running: list[AnalysisJob] = field(default_factory=list)
+    in_flight: bool = False
+    first_requested: float = 0.0
+    last_requested: float = 0.0
+    urgent: bool = False
+    lane: Lane = "bulk"
+    ready_lane: Lane | None = None
+
+
+@dataclass(eq=False)
+class _Task:
+    """submit_call() で投入された、カテゴリの分析以外の処理1件."""
+
+    fn: Callable[[], object]
+    future: Future
+
+
+def _snapshot(job: AnalysisJob) -> AnalysisJob:
+    """ワーカーが更新し続けるリストを切り離したジョブの複製を返す."""
+    return replace(job, failed_category_ids=list(job.failed_category_ids))
+
+
+def _higher(a: Lane, b: Lane) -> Lane:
+    """優先度の高い方のレーンを返す."""
+    return a if LANES.index(a) <= LANES.index(b) else b
+
+
+class AnalysisJobQueue:
+    """分析ジョブをワーカープールで実行するキュー.
+
+    max_workers=0 の場合は submit() 内で同期実行する（テスト・CLI用）。
+    完了したジョブは on_complete コールバックに渡される。コールバックは
+    ワーカースレッドから呼ばれるため、スレッドセーフであること。
+
+    Args:
+        engine: 分析エンジン
+        max_workers: ワーカースレッド数。0 で同期実行
+        on_complete: ジョブ終了時のコールバック
+        max_history: 保持する終了済みジョブ数の上限
+        quiet_period: 同一カテゴリへの要求をまとめる静穏期間（秒）
+        max_delay: 最初の要求から実行開始までの最大遅延（秒）
+        interactive_reserve: interactive レーン専用に予約するワーカー数。
+            共有ワーカーが最低1つ残るよう max_workers - 1 で頭打ちになる
+    """
+
+    def __init__(
+        self,
+        engine: AnalysisEngine,
+        max_workers: int = 2,
+        on_complete: Callable[[AnalysisJob], None] | None = None,
+        max_history: int = 1000,
+        quiet_period: float = 1.0,
+        max_delay: float = 5.0,
+        interactive_reserve: int = 1,
+    ) -> None:
+        if max_delay < quiet_period:
+            raise ValueError("max_delay must be >= quiet_period")
+        if interactive_reserve < 0:
+            raise ValueError("interactive_reserve must be >= 0")
+        self._engine = engine
+        self._on_complete = on_complete
+        self._max_history = max_history
+        self._quiet_period = quiet_period
+        self._max_delay = max_delay
+        self._jobs: OrderedDict[str, AnalysisJob] = OrderedDict()
+        self._slots: dict[int, _CategorySlot] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closed = False
+        self._dispatcher: threading.Thread | None = None
+        self._max_workers = max_workers
+        self._reserved = min(interactive_reserve, max(0, max_workers - 1))
+        self._workers: list[threading.Thread] = []
+        self._ready: dict[Lane, deque[int | _Task]] = {
+            lane: deque() for lane in LANES
+        }
+
+    def submit(
+        self,
+        category_ids: list[int],
+        immediate: bool = False,
+        lane: Lane = "ingest",
+    ) -> AnalysisJob:
+        """分析ジョブを投入し、投入時点のスナップショットを返す.
+
+        Args:
+            category_ids: 分析対象カテゴリ
+            immediate: True なら静穏期間を待たずに実行する
+                （モデル定義の編集など対話的な要求向け）
+            lane: 優先度レーン。同一カテゴリの要求がまとまった場合は
+                最も優先度の高いレーンで実行される
+
+        Raises:
+            RuntimeError: shutdown() 後に呼ばれた場合
+        """
+        job = AnalysisJob(
+            id=uuid.uuid4().hex,
+            category_ids=list(dict.fromkeys(category_ids)),
+            lane=lane,
+        )
+        finished: list[AnalysisJob] = []
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("job queue is shut down")
+            self._jobs[job.id] = job
+            self._evict_finished()
+            if not job.category_ids:
+                finished.append(self._finish(job))
+            now = time.monotonic()
+            for category_id in job.category_ids:
+                slot = self._slots.setdefault(category_id, _CategorySlot())
+                if not slot.pending:
+                    slot.first_requested = now
+                    slot.lane = lane
+                slot.last_requested = now
+                slot.urgent = slot.urgent or immediate
+                slot.lane = _higher(slot.lane, lane)
+                slot.pending.append(job)
+                if slot.ready_lane is not None:
+                    self._promote(category_id, slot)
+            snapshot = _snapshot(job)
+            if self._max_workers > 0:
+                self._ensure_threads()
+                self._changed.notify_all()
+        self._notify(finished)
+        if self._max_workers == 0:
+            for category_id in job.category_ids:
+                self._run_category(category_id)
+        return snapshot
+
+    def submit_call(
+        self, fn: Callable[[], object], lane: Lane = "interactive"
+    ) -> Future:
+        """fn をワーカーで実行し、その結果の Future を返す.
+
+        カテゴリの分析と同じレーンに並ぶため、試算が繰り返し要求されても
+        同時に走るのはワーカー数までになる。ジョブ履歴には残らない。
+        max_workers=0 の場合はこの呼び出しの中で実行する。
+
+        Raises:
+            RuntimeError: shutdown() 後に呼ばれた場合
+        """
+        task = _Task(fn, Future())
+        if self._max_workers == 0:
+            self._run_task(task)
+            return task.future
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("job queue is shut down")
+            self._ready[lane].append(task)
+            self._ensure_threads()
+            self._changed.notify_all()
+        return task.future
+
+    def get(self, job_id: str) -> AnalysisJob | None:
+        """ジョブの現在状態のスナップショットを返す。未知のIDは None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _snapshot(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: float | None = None) -> bool:
+        """ジョブの終了を待つ。タイムアウト前に終了すれば True."""
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].done,
+                timeout=timeout,
+            )
+
+    def lane_depths(self) -> dict[Lane, int]:
+        """レーンごとの実行待ち数（カテゴリと submit_call() の処理）を返す."""
+        with self._lock:
+            depths = dict.fromkeys(LANES, 0)
+            for slot in self._slots.values():
+                if slot.ready_lane is not None:
+                    depths[slot.ready_lane] += 1
+            for lane, queue in self._ready.items():
+                depths[lane] += sum(isinstance(i, _Task) for i in queue)
+            return depths
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ディスパッチャとワーカーを停止する.
+
+        実行待ちのカテゴリは破棄され（submit_call() の Future は
+        キャンセルされる）、実行中のものは完了を待つ。
+        """
+        with self._changed:
+            self._closed = True
+            for queue in self._ready.values():
+                for item in queue:
+                    if isinstance(item, _Task):
+                        item.future.cancel()
+            self._changed.notify_all()
+        if wait:
+            for thread in [self._dispatcher, *self._workers]:
+                if thread is not None:
+                    thread.join()
+
+    def _ensure_threads(self) -> None:
+        """ディスパッチャとワーカーを必要時に起動する（要ロック）."""
+        if self._dispatcher is not None:
+            return
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop,
+            name="analysis-dispatcher",
+            daemon=True,
+        )
+        self._dispatcher.start()
+        for index in range(self._max_workers):
+            lanes = LANES[:1] if index < self._reserved else LANES
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(lanes,),
+                name=f"analysis-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _due_at(self, slot: _CategorySlot) -> float:
+        """slot の pending 要求を実行に回してよい時刻."""
+        if slot.urgent:
+            return slot.last_requested
+        return min(
+            slot.last_requested + self._quiet_period,
+            slot.first_requested + self._max_delay,
+        )
+
+    def _dispatch_loop(self) -> None:
+        """期限に達したカテゴリをレーンの実行待ち列へ並べ続ける."""
+        with self._changed:
+            while not self._closed:
+                now = time.monotonic()
+                next_due: float | None = None
+                became_ready = False
+                for category_id, slot in self._slots.items():
+                    if (
+                        slot.in_flight
+                        or slot.ready_lane is not None
+                        or not slot.pending
+                    ):
+                        continue
+                    due = self._due_at(slot)
+                    if due <= now:
+                        slot.ready_lane = slot.lane
+                        self._ready[slot.lane].append(category_id)
+                        became_ready = True
+                    elif next_due is None or due < next_due:
+                        next_due = due
+                if became_ready:
+                    self._changed.notify_all()
+                timeout = None if next_due is None else next_due - now
+                self._changed.wait(timeout)
+
+    def _promote(self, category_id: int, slot: _CategorySlot) -> None:
+        """実行待ちのカテゴリを、より優先度の高いレーンへ並べ直す（要ロック）.
+
+        元のレーンに残ったエントリは取り出し時に読み捨てる。
+        """
+        if slot.lane != slot.ready_lane:
+            slot.ready_lane = slot.lane
+            self._ready[slot.lane].append(category_id)
+
+    def _pop_ready(self, lanes: tuple[Lane, ...]) -> int | _Task | None:
+        """担当レーンから優先度順に実行待ちのものを取り出す（要ロック）."""
+        for lane in lanes:
+            queue = self._ready[lane]
+            while queue:
+                category_id = queue.popleft()
+                if isinstance(category_id, _Task):
+                    return category_id
+                slot = self._slots.get(category_id)
+                if slot is not None and slot.ready_lane == lane:
+                    self._start(slot)
+                    return category_id
+        return None
+
+    def _worker_loop(self, lanes: tuple[Lane, ...]) -> None:
+        """担当レーンの実行待ちカテゴリ（と処理）を実行し続ける."""
+        while True:
+            with self._changed:
+                item = None
+                while item is None:
+                    if self._closed:
+                        return
+                    item = self._pop_ready(lanes)
+                    if item is None:
+                        self._changed.wait()
+            if isinstance(item, _Task):
+                self._run_task(item)
+            else:
+                self._run_category(item)
+
+    def _run_task(self, task: _Task) -> None:
+        """submit_call() の処理を実行し、結果を Future に渡す."""
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = task.fn()
+        except Exception as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+
+    def _start(self, slot: _CategorySlot) -> None:
+        """pending の要求を実行中の回へ移す（要ロック）."""
+        slot.in_flight = True
+        slot.ready_lane = None
+        slot.running, slot.pending = slot.pending, []
+        slot.urgent = False
+        for job in slot.running:
+            if job.state == "queued":
+                job.state = "running"
+
+    def _run_category(self, category_id: int) -> None:
+        """1カテゴリを分析し、相乗りしたジョブの進捗を更新する."""
+        with self._lock:
+            slot = self._slots[category_id]
+            if not slot.in_flight:
+                # 同期実行モード: ディスパッチャを介さず開始する
+                self._start(slot)
+        error: str | None = None
+        try:
+            self._engine.run(category_id)
+        except Exception as e:
+            # 1カテゴリの失敗で残りを止めない
+            logger.exception("analysis failed: category %s", category_id)
+            error = f"category {category_id}: {e}"
+        finished: list[AnalysisJob] = []
+        with self._changed:
+            for job in slot.running:
+                job.completed += 1
+                if error is not None:
+                    job.error = "; ".join(filter(None, [job.error, error]))
+                    job.failed_category_ids.append(category_id)
+                if job.completed == len(job.category_ids):
+                    finished.append(self._finish(job))
+            slot.running = []
+            slot.in_flight = False
+            if not slot.pending:
+                del self._slots[category_id]
+            self._changed.notify_all()
+        self._notify(finished)
+
+    def _finish(self, job: AnalysisJob) -> AnalysisJob:
+        """ジョブを終了状態にしてスナップショットを返す（要ロック）."""
+        job.state = "failed" if job.error else "succeeded"
+        job.finished_at = datetime.now()
+        return _snapshot(job)
+
+    def _notify(self, finished: list[AnalysisJob]) -> None:
+        """終了したジョブを on_complete に渡す（ロック外で呼ぶ）."""
+        if self._on_complete is None:
+            return
+        for job in finished:
+            self._on_complete(job)
+
+    def _evict_finished(self) -> None:
+        """履歴上限を超えた古い終了済みジョブを削除する（要ロック）."""
+        excess = len(self._jobs) - self._max_history
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done][:excess]:
+            del self._jobs[job_id]
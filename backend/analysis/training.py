@@ -0,0 +1,109 @@
+"""IsolationForest の学習をワーカープロセスで行うトレーナー.
+
+ジョブキューのワーカーはスレッドのため、学習のうち GIL を握る部分
+（ツリーごとの入力検証やディスパッチ）はカテゴリ間で直列化される。
+ProcessForestTrainer は学習だけを別プロセスへ逃がす。
+
+ベースライン特徴量は pickle せず、スクラッチディレクトリに .npy として
+書き出してワーカーがメモリマップで開く（保存済みモデルと同じ形式）。
+scratch_dir に /dev/shm のような tmpfs を指定すれば、ディスクへの
+書き込みも発生しない。ワーカーから返すのは学習済みモデルの
+ノード配列だけで、ベースラインに比べて十分小さい。
+
+乱数シードはカテゴリ ID から決まり、学習するプロセスやスレッド数に
+よらず同じモデルになる。
+"""
+
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from backend.analysis.anomaly import FOREST_SEED, fit_forest
+from backend.analysis.forest import ForestArtifact
+
+
+def category_seed(category_id: int) -> int:
+    """カテゴリごとの IsolationForest の乱数シード.
+
+    hash() と異なりプロセスや実行環境によらず同じ値になる。
+    """
+    state = np.random.SeedSequence([FOREST_SEED, category_id])
+    return int(state.generate_state(1)[0])
+
+
+def _fit_from_file(
+    path: str, anomaly_params: dict, n_jobs: int, random_state: int
+) -> tuple[dict[str, np.ndarray], dict, float]:
+    """ワーカー側: メモリマップしたベースラインで学習する.
+
+    学習に使った CPU 時間（ワーカープロセスの全スレッド分）も返す。
+    """
+    started = time.process_time()
+    baseline = np.load(path, mmap_mode="r")
+    forest = fit_forest(baseline, anomaly_params, n_jobs, random_state)
+    arrays, meta = forest.to_arrays()
+    return arrays, meta, time.process_time() - started
+
+
+class ProcessForestTrainer:
+    """学習をプロセスプールで行う fit_forest の代替.
+
+    ワーカーは spawn で起動する（分析スレッドが動いているプロセスを
+    fork しない）。
+    """
+
+    def __init__(
+        self, max_workers: int, scratch_dir: str | None = None
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        self._scratch_dir = scratch_dir
+        self._cpu_time = 0.0
+        self._cpu_lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=get_context("spawn")
+        )
+
+    def fit(
+        self,
+        train_selected_data: np.ndarray,
+        anomaly_params: dict | None = None,
+        n_jobs: int = 1,
+        random_state: int = FOREST_SEED,
+    ) -> ForestArtifact:
+        """fit_forest() と同じモデルをワーカープロセスで学習する."""
+        with tempfile.TemporaryDirectory(
+            prefix="forest_", dir=self._scratch_dir
+        ) as scratch:
+            path = Path(scratch) / "baseline.npy"
+            # float32 の特徴量はそのまま渡す（sklearn も float32 で学習する）
+            np.save(path, np.asarray(train_selected_data))
+            arrays, meta, cpu_time = self._pool.submit(
+                _fit_from_file,
+                str(path),
+                anomaly_params or {},
+                n_jobs,
+                random_state,
+            ).result()
+        with self._cpu_lock:
+            self._cpu_time += cpu_time
+        return ForestArtifact.from_arrays(arrays, meta)
+
+    @property
+    def cpu_time(self) -> float:
+        """ワーカープロセスが学習に使った CPU 時間（秒）の累計.
+
+        稼働中のワーカーは os.times() の子プロセス分に現れないため、
+        呼び出し側の CPU 使用率の計測はこれを加える。
+        """
+        with self._cpu_lock:
+            return self._cpu_time
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ワーカープロセスを停止する."""
+        self._pool.shutdown(wait=wait)
@@ -4,15 +4,49 @@ backend/ 直下に配置することで、ingestion/ から store/ への
 直接依存を避けつつ、FastAPI の Depends() で注入できる。
 """
 
+import os
+from collections.abc import Callable
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from backend.analysis.cpu import CpuBudget
 from backend.analysis.engine import AnalysisEngine
+from backend.analysis.feature_cache import FeatureCache
+from backend.analysis.jobs import AnalysisJob, AnalysisJobQueue
+from backend.analysis.training import ProcessForestTrainer
+from backend.ingestion.change_events import (
+    ANALYSIS_COMPLETED,
+    DATA_CLEARED,
+    RECORDS_APPENDED,
+    RESULTS_UPDATED,
+    ChangeBatcher,
+)
 from backend.ingestion.event_bus import EventBus
+from backend.ingestion.logged_event_bus import LoggedEventBus
 from backend.interfaces.data_store import DataStoreInterface
+from backend.interfaces.event_log import EventLogInterface
+from backend.interfaces.feature import FeatureBuilder
 from backend.interfaces.result_store import ResultStoreInterface
 
 _data_store: DataStoreInterface | None = None
 _result_store: ResultStoreInterface | None = None
 _analysis_engine: AnalysisEngine | None = None
+_cpu_budget: CpuBudget | None = None
+_forest_trainer: ProcessForestTrainer | None = None
+_feature_cache: FeatureCache | None = None
+_event_log: EventLogInterface | None = None
 _event_bus: EventBus | None = None
+_change_batcher: ChangeBatcher | None = None
+_job_queue: AnalysisJobQueue | None = None
+_db_executor: ThreadPoolExecutor | None = None
+
+DB_EXECUTOR_MAX_WORKERS = 4
+"""API ハンドラの DB 呼び出しを実行する専用スレッド数の上限。"""
+
+CHANGE_BATCH_INTERVAL_SEC = 0.25
+"""変更イベントを1件にまとめる集約ウィンドウ（秒）。"""
+
+FEATURE_CACHE_MAX_MB = 64
+"""特徴量キャッシュがメモリに保持する行列の既定の上限（MiB）。"""
 
 
 def get_data_store() -> DataStoreInterface:
@@ -35,26 +69,241 @@ def get_result_store() -> ResultStoreInterface:
     return _result_store
 
 
+def get_cpu_budget() -> CpuBudget:
+    """分析用 CPU 予算のシングルトンを返す。
+
+    cgroup の CPU クォータから総数を決め、ジョブキューの全ワーカーが
+    共有する（カテゴリ間とモデル内の並列の合計をコア数に抑える）。
+    """
+    global _cpu_budget
+    if _cpu_budget is None:
+        _cpu_budget = CpuBudget()
+    return _cpu_budget
+
+
+def get_forest_trainer() -> ProcessForestTrainer | None:
+    """学習用ワーカープロセスのシングルトンを返す。
+
+    プロセス数は環境変数 FOREST_TRAINER_PROCESSES で指定する。
+    未指定なら CPU 予算が2コア以上のときに予算と同数で有効にし、
+    1コアなら（プロセスへ逃がしても並列にならないため）None を返して
+    分析スレッド内で学習する。0 を指定すると常に無効になる。
+    ベースライン特徴量の受け渡しには FOREST_SCRATCH_DIR
+    （例: /dev/shm）を使う。
+    """
+    global _forest_trainer
+    configured = os.environ.get("FOREST_TRAINER_PROCESSES")
+    if configured is not None:
+        processes = int(configured)
+    else:
+        total = get_cpu_budget().total
+        processes = total if total > 1 else 0
+    if _forest_trainer is None and processes > 0:
+        _forest_trainer = ProcessForestTrainer(
+            processes, scratch_dir=os.environ.get("FOREST_SCRATCH_DIR")
+        )
+    return _forest_trainer
+
+
+def get_feature_cache() -> FeatureCache:
+    """特徴量行列キャッシュのシングルトンを返す。
+
+    上限は環境変数 FEATURE_CACHE_MAX_MB（0 でキャッシュしない）、
+    追い出したエントリの書き出し先は FEATURE_CACHE_SPILL_DIR
+    （未指定なら書き出さない）で指定する。
+    """
+    global _feature_cache
+    if _feature_cache is None:
+        max_mb = float(
+            os.environ.get("FEATURE_CACHE_MAX_MB", FEATURE_CACHE_MAX_MB)
+        )
+        _feature_cache = FeatureCache(
+            int(max_mb * 2**20),
+            spill_dir=os.environ.get("FEATURE_CACHE_SPILL_DIR"),
+        )
+    return _feature_cache
+
+
 def get_analysis_engine() -> AnalysisEngine:
-    """AnalysisEngineのシングルトンインスタンスを返す。"""
+    """AnalysisEngineのシングルトンインスタンスを返す。
+
+    特徴量行列の dtype は環境変数 FEATURE_DTYPE（float64 / float32）で
+    指定する。float32 にするとスコアは変わらずに行列のメモリが半分になる。
+    FEATURE_BUILDER_DEBUG=1 なら、入力を変更する特徴量ビルダーを
+    検出する（FeatureBuilder.check_input_mutation）。
+    """
     global _analysis_engine
     if _analysis_engine is None:
-        _analysis_engine = AnalysisEngine(get_data_store(), get_result_store())
+        if os.environ.get("FEATURE_BUILDER_DEBUG") == "1":
+            FeatureBuilder.check_input_mutation = True
+        _analysis_engine = AnalysisEngine(
+            get_data_store(),
+            get_result_store(),
+            cpu_budget=get_cpu_budget(),
+            trainer=get_forest_trainer(),
+            feature_cache=get_feature_cache(),
+            dtype=os.environ.get("FEATURE_DTYPE", "float64"),
+        )
     return _analysis_engine
 
 
+def get_event_log() -> EventLogInterface:
+    """プロセス間で共有する変更イベントログのシングルトンを返す。"""
+    global _event_log
+    if _event_log is None:
+        from backend.store.event_log import SqliteEventLog
+
+        _event_log = SqliteEventLog("data/events.db")
+    return _event_log
+
+
 def get_event_bus() -> EventBus:
-    """EventBusのシングルトンインスタンスを返す。"""
+    """EventBusのシングルトンインスタンスを返す。
+
+    共有イベントログ経由のため、API の複数ワーカーやスケジューラが
+    publish したイベントもどのワーカーの SSE からも配信される。
+    """
     global _event_bus
     if _event_bus is None:
-        _event_bus = EventBus()
+        _event_bus = LoggedEventBus(get_event_log())
     return _event_bus
 
 
+def get_change_batcher() -> ChangeBatcher:
+    """変更イベント集約器のシングルトンインスタンスを返す。"""
+    global _change_batcher
+    if _change_batcher is None:
+        _change_batcher = ChangeBatcher(
+            get_event_bus(), interval=CHANGE_BATCH_INTERVAL_SEC
+        )
+        watch_data_changes(
+            _change_batcher, get_feature_cache(), get_db_executor()
+        )
+    return _change_batcher
+
+
+def watch_data_changes(
+    changes: ChangeBatcher,
+    cache: FeatureCache,
+    executor: Executor | None = None,
+) -> None:
+    """データバージョンの変化に合わせて特徴量キャッシュを捨てる。
+
+    書き込み経路は必ず records-appended / data-cleared を発行するため、
+    ハンドラごとに invalidate を呼ばなくてもキャッシュが追従する。
+    書き出したファイルの削除を伴うので、executor を渡すとそこで実行し、
+    emit したスレッド（イベントループ等）を塞がない。
+    """
+
+    def run(fn: Callable[..., None], *args) -> None:
+        if executor is None:
+            fn(*args)
+        else:
+            executor.submit(fn, *args)
+
+    changes.add_listener(
+        RECORDS_APPENDED,
+        lambda ids, versions: run(cache.invalidate, ids, versions),
+    )
+    changes.add_listener(DATA_CLEARED, lambda ids, versions: run(cache.clear))
+
+
+def get_job_queue() -> AnalysisJobQueue:
+    """AnalysisJobQueueのシングルトンインスタンスを返す。"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = AnalysisJobQueue(
+            get_analysis_engine(),
+            on_complete=lambda job: publish_job_completed(
+                get_event_bus(), get_change_batcher(), get_result_store(), job
+            ),
+        )
+    return _job_queue
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """API ハンドラの DB 呼び出し専用 Executor のシングルトンを返す。
+
+    分析ワーカーや FastAPI 既定のスレッドプールと分離し、
+    DB 待ちがそれらを食い潰さないよう上限付きで確保する。
+    """
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_MAX_WORKERS, thread_name_prefix="db"
+        )
+    return _db_executor
+
+
+def publish_job_completed(
+    bus: EventBus,
+    changes: ChangeBatcher,
+    result_store: ResultStoreInterface,
+    job: AnalysisJob,
+) -> None:
+    """ジョブ終了を analysis-completed イベントとして通知する。
+
+    結果が更新されたのは分析に成功したカテゴリだけなので、
+    results-updated は失敗したカテゴリを除いて発行する。
+    """
+    bus.publish(
+        ANALYSIS_COMPLETED,
+        {
+            "job_id": job.id,
+            "state": job.state,
+            "error": job.error,
+            "category_ids": job.category_ids,
+            "failed_category_ids": job.failed_category_ids,
+        },
+    )
+    failed = set(job.failed_category_ids)
+    succeeded = [cid for cid in job.category_ids if cid not in failed]
+    if succeeded:
+        publish_results_updated(changes, result_store, succeeded)
+
+
+def publish_results_updated(
+    changes: ChangeBatcher,
+    result_store: ResultStoreInterface,
+    category_ids: list[int],
+) -> None:
+    """分析完了を results-updated イベントとして通知する。
+
+    versions には各カテゴリの分析済みデータバージョンを載せる。
+    """
+    analyzed = result_store.get_analyzed_versions()
+    changes.emit(
+        RESULTS_UPDATED,
+        category_ids,
+        {cid: analyzed[cid] for cid in category_ids if cid in analyzed},
+    )
+
+
 def _reset_all() -> None:
     """全シングルトンをリセットする（テスト用）。"""
     global _data_store, _result_store, _analysis_engine, _event_bus
+    global _event_log, _change_batcher, _job_queue, _db_executor
+    global _cpu_budget, _forest_trainer, _feature_cache
+    if _job_queue is not None:
+        _job_queue.shutdown(wait=False)
+    if _forest_trainer is not None:
+        _forest_trainer.shutdown(wait=False)
+    if _change_batcher is not None:
+        _change_batcher.close()
+    if isinstance(_event_bus, LoggedEventBus):
+        _event_bus.close()
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+    if _feature_cache is not None:
+        _feature_cache.close()
     _data_store = None
     _result_store = None
     _analysis_engine = None
+    _cpu_budget = None
+    _forest_trainer = None
+    _feature_cache = None
+    _event_log = None
     _event_bus = None
+    _change_batcher = None
+    _job_queue = None
+    _db_executor = None
@@ -0,0 +1,142 @@
+"""Store 層の非同期アダプタ。
+
+SQLite 実装は同期 I/O のため、async def ハンドラから直接呼ぶと
+イベントループがブロックされ、SSE の keepalive や /api/health まで
+止まる。ここでは DataStoreInterface / ResultStoreInterface の呼び出しを
+DB 専用の上限付きスレッドプールに委譲し、ハンドラからは await で扱う。
+"""
+
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import TypeVar
+
+from backend.interfaces.data_store import (
+    CategoryNode,
+    DataStoreInterface,
+    WorkRecord,
+)
+from backend.interfaces.result_store import (
+    AnomalyResult,
+    ModelDefinition,
+    ResultStoreInterface,
+    TrendResult,
+)
+
+T = TypeVar("T")
+
+
+class _AsyncAdapter:
+    """DB 専用 Executor へ同期呼び出しを委譲する共通基底。"""
+
+    def __init__(self, executor: Executor) -> None:
+        self._executor = executor
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """任意の同期処理を DB 用 Executor 上で実行する。
+
+        複数のストア操作を1回のディスパッチにまとめたい場合に使う。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+
+class AsyncDataStore(_AsyncAdapter):
+    """DataStoreInterface の非同期アダプタ。"""
+
+    def __init__(self, store: DataStoreInterface, executor: Executor) -> None:
+        super().__init__(executor)
+        self.sync = store
+
+    async def upsert_records(self, records: list[WorkRecord]) -> int:
+        return await self.run(self.sync.upsert_records, records)
+
+    async def ensure_category_path(self, path: list[str]) -> int:
+        return await self.run(self.sync.ensure_category_path, path)
+
+    async def get_records(
+        self,
+        category_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> list[WorkRecord]:
+        return await self.run(
+            self.sync.get_records, category_id, start=start, end=end
+        )
+
+    async def get_category_tree(
+        self, root_id: int | None = None
+    ) -> list[CategoryNode]:
+        return await self.run(self.sync.get_category_tree, root_id)
+
+    async def get_data_versions(
+        self, category_ids: list[int] | None = None
+    ) -> dict[int, int]:
+        return await self.run(self.sync.get_data_versions, category_ids)
+
+    async def delete_all_data(self) -> None:
+        await self.run(self.sync.delete_all_data)
+
+
+class AsyncResultStore(_AsyncAdapter):
+    """ResultStoreInterface の非同期アダプタ。"""
+
+    def __init__(
+        self, store: ResultStoreInterface, executor: Executor
+    ) -> None:
+        super().__init__(executor)
+        self.sync = store
+
+    async def save_trend_result(self, result: TrendResult) -> None:
+        await self.run(self.sync.save_trend_result, result)
+
+    async def get_trend_result(self, category_id: int) -> TrendResult | None:
+        return await self.run(self.sync.get_trend_result, category_id)
+
+    async def save_anomaly_results(
+        self,
+        results: list[AnomalyResult],
+        model_version: int | None = None,
+    ) -> bool:
+        return await self.run(
+            self.sync.save_anomaly_results, results, model_version
+        )
+
+    async def get_anomaly_results(
+        self, category_id: int
+    ) -> list[AnomalyResult]:
+        return await self.run(self.sync.get_anomaly_results, category_id)
+
+    async def save_model_definition(self, definition: ModelDefinition) -> int:
+        return await self.run(self.sync.save_model_definition, definition)
+
+    async def get_model_definition(
+        self, category_id: int
+    ) -> ModelDefinition | None:
+        return await self.run(self.sync.get_model_definition, category_id)
+
+    async def get_model_version(self, category_id: int) -> int | None:
+        return await self.run(self.sync.get_model_version, category_id)
+
+    async def delete_model_definition(self, category_id: int) -> None:
+        await self.run(self.sync.delete_model_definition, category_id)
+
+    async def delete_anomaly_results(self, category_id: int) -> None:
+        await self.run(self.sync.delete_anomaly_results, category_id)
+
+    async def save_analyzed_version(
+        self, category_id: int, data_version: int
+    ) -> None:
+        await self.run(
+            self.sync.save_analyzed_version, category_id, data_version
+        )
+
+    async def get_analyzed_versions(self) -> dict[int, int]:
+        return await self.run(self.sync.get_analyzed_versions)
+
+    async def delete_all_data(self) -> None:
+        await self.run(self.sync.delete_all_data)
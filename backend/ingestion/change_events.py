@@ -0,0 +1,117 @@
+"""型付き変更イベントとバースト集約。
+
+書き込み経路は変更の種類ごとに以下のイベントを発行する。
+
+- categories-changed: カテゴリツリーにノードが追加された
+- records-appended: 作業記録が追加された（データバージョンが進んだ）
+- results-updated: 分析結果が更新された
+- model-changed: モデル定義が保存・削除された
+- data-cleared: 作業記録・カテゴリが全削除された（category_ids は空）
+
+ペイロードは ``{"category_ids": [...], "versions": {id: data_version}}``。
+クライアントは category_ids に含まれる部分だけを再取得すればよい。
+短い間隔内に届いた同種イベントは ChangeBatcher が1件にまとめる。
+プロセス内でデータの変化に追従したいもの（特徴量キャッシュ等）は
+ChangeBatcher.add_listener() で集約後のイベントを受け取る。
+
+ジョブの終了はジョブ単位の analysis-completed イベントで集約せずに通知する。
+ペイロードは ``{"job_id", "state", "error", "category_ids",
+"failed_category_ids"}``。
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+
+from backend.ingestion.event_bus import EventBus
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES_CHANGED = "categories-changed"
+RECORDS_APPENDED = "records-appended"
+RESULTS_UPDATED = "results-updated"
+MODEL_CHANGED = "model-changed"
+DATA_CLEARED = "data-cleared"
+ANALYSIS_COMPLETED = "analysis-completed"
+
+ChangeListener = Callable[[list[int], dict[int, int]], None]
+"""集約後の (category_ids, versions) を受け取るコールバック。"""
+
+
+class ChangeBatcher:
+    """変更イベントを interval 秒ごとに種類別でまとめて publish する。
+
+    同一ウィンドウ内の同種イベントは category_ids の和集合と、
+    カテゴリごとに最新の versions を持つ1件に集約される。
+    イベント種別の発行順はウィンドウ内で最初に届いた順を保つ。
+    ワーカースレッドからも呼び出せる。
+
+    Args:
+        bus: 配信先の EventBus
+        interval: 集約ウィンドウ（秒）。0 なら即時 publish する
+    """
+
+    def __init__(self, bus: EventBus, interval: float = 0.25) -> None:
+        self._bus = bus
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._pending: dict[str, tuple[set[int], dict[int, int]]] = {}
+        self._timer: threading.Timer | None = None
+        self._listeners: dict[str, list[ChangeListener]] = {}
+
+    def add_listener(self, event: str, listener: ChangeListener) -> None:
+        """event の publish 直前に listener(category_ids, versions) を呼ぶ.
+
+        呼び出しは flush() を実行したスレッド（通常は集約タイマー）で行う。
+        listener の例外はログに残し、配信は続ける。
+        """
+        with self._lock:
+            self._listeners.setdefault(event, []).append(listener)
+
+    def emit(
+        self,
+        event: str,
+        category_ids: list[int],
+        versions: dict[int, int] | None = None,
+    ) -> None:
+        """変更を登録する。ウィンドウ終了時にまとめて publish される。"""
+        with self._lock:
+            ids, merged = self._pending.setdefault(event, (set(), {}))
+            ids.update(category_ids)
+            for category_id, version in (versions or {}).items():
+                merged[category_id] = max(
+                    version, merged.get(category_id, version)
+                )
+            if self._interval > 0 and self._timer is None:
+                self._timer = threading.Timer(self._interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if self._interval <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """保留中のイベントを即座に publish する。"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+            listeners = {e: list(fs) for e, fs in self._listeners.items()}
+        for event, (ids, versions) in pending.items():
+            for listener in listeners.get(event, []):
+                try:
+                    listener(sorted(ids), dict(versions))
+                except Exception:
+                    logger.exception("change listener failed: %s", event)
+            self._bus.publish(
+                event,
+                {
+                    "category_ids": sorted(ids),
+                    "versions": dict(sorted(versions.items())),
+                },
+            )
+
+    def close(self) -> None:
+        """タイマーを止め、保留中のイベントを publish する。"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        self.flush()
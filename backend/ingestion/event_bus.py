@@ -3,30 +3,244 @@
 単一プロセス（uvicorn）前提の軽量 pub/sub。
 API エンドポイントがデータ変更時に publish し、
 SSE エンドポイントが subscribe してフロントへ中継する。
+分析ジョブのワーカースレッドからも publish できる。
+
+subscriber ごとのキューは有界で、未読の同一イベントは1件にまとめる。
+溢れた場合は slow_consumer_policy に従い最古のイベントを捨てるか、
+subscriber を切断する。停止したブラウザタブの SSE 接続が
+メッセージを無制限に溜め込むことはない。
+
+各イベントには単調増加の id を振り、直近のイベントをリングバッファに
+保持する。再接続した subscriber は最後に受け取った id を渡すことで
+取りこぼしたイベントを再送してもらえる。バッファから既に消えている
+場合は、全件再取得を促す resync イベントを1件だけ受け取る。
 """
 
 import asyncio
+import contextlib
+import json
+import threading
+from collections import deque
 from contextlib import asynccontextmanager
+from typing import Literal
+
+SlowConsumerPolicy = Literal["drop_oldest", "disconnect"]
+
+RESYNC_EVENT = "resync"
+"""再送できない欠落があったことを subscriber に伝えるイベント名。"""
+
+
+class SlowConsumerError(Exception):
+    """キュー溢れにより subscriber が切断されたことを示す。"""
+
+
+def _coalesce_key(message: dict) -> str:
+    """同一イベント判定用のキー（event 名 + data の正規化 JSON）。
+
+    id は含めない。まとめた場合は先に積まれた方の id が残るため、
+    再接続時の再送は重複し得ても欠落はしない。
+    """
+    return json.dumps(
+        [message["event"], message["data"]], sort_keys=True, default=str
+    )
+
+
+class Subscription:
+    """1 subscriber 分の有界キュー。
+
+    イベントループのスレッドからのみ操作される。
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        maxsize: int,
+        policy: SlowConsumerPolicy,
+    ) -> None:
+        self.loop = loop
+        self._maxsize = maxsize
+        self._policy = policy
+        self._messages: deque[tuple[str, dict]] = deque()
+        self._pending_keys: set[str] = set()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.coalesced = 0
+        self.dropped = 0
+
+    def qsize(self) -> int:
+        """未読イベント数。"""
+        return len(self._messages)
+
+    def offer(self, message: dict) -> bool:
+        """イベントを積む。切断ポリシーで切断された場合 False を返す。"""
+        if self.closed:
+            return False
+        key = _coalesce_key(message)
+        if key in self._pending_keys:
+            self.coalesced += 1
+            return True
+        if len(self._messages) >= self._maxsize:
+            if self._policy == "disconnect":
+                self.closed = True
+                self._ready.set()
+                return False
+            old_key, _ = self._messages.popleft()
+            self._pending_keys.discard(old_key)
+            self.dropped += 1
+        self._messages.append((key, message))
+        self._pending_keys.add(key)
+        self._ready.set()
+        return True
+
+    async def get(self) -> dict:
+        """次のイベントを待って返す。
+
+        Raises:
+            SlowConsumerError: 切断ポリシーにより切断された場合
+        """
+        while not self._messages:
+            if self.closed:
+                raise SlowConsumerError("subscriber disconnected")
+            self._ready.clear()
+            await self._ready.wait()
+        key, message = self._messages.popleft()
+        self._pending_keys.discard(key)
+        return message
 
 
 class EventBus:
-    """asyncio.Queue ベースのインメモリ pub/sub バス。"""
+    """有界・合流キューを持つインメモリ pub/sub バス。
+
+    Args:
+        max_queue_size: subscriber ごとの未読イベント数の上限
+        slow_consumer_policy: 上限到達時の挙動。
+            "drop_oldest" は最古のイベントを捨て、"disconnect" は
+            subscriber を切断する（SSE 側で再接続させる）。
+        replay_size: 再送用に保持する直近イベント数
+    """
 
-    def __init__(self) -> None:
-        self._subscribers: list[asyncio.Queue[dict]] = []
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        slow_consumer_policy: SlowConsumerPolicy = "drop_oldest",
+        replay_size: int = 1000,
+    ) -> None:
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be >= 1")
+        self._max_queue_size = max_queue_size
+        self._policy = slow_consumer_policy
+        self._subscribers: list[Subscription] = []
+        self._replay: deque[dict] = deque(maxlen=replay_size)
+        self._last_id = 0
+        # id 採番・バッファ追記・購読登録を publish 元スレッド間で直列化する
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._disconnected = 0
 
     def publish(self, event: str, data: dict | None = None) -> None:
-        """全 subscriber にイベントを配信する。"""
-        message = {"event": event, "data": data}
-        for queue in self._subscribers:
-            queue.put_nowait(message)
+        """全 subscriber にイベントを配信する。
+
+        subscriber のイベントループ外（ワーカースレッド等）から
+        呼ばれた場合は call_soon_threadsafe でループに委譲する。
+        """
+        self._broadcast(event, data)
+
+    def _broadcast(
+        self, event: str, data: dict | None, event_id: int | None = None
+    ) -> None:
+        """自プロセスの subscriber へイベントを配信する。
+
+        event_id を省略すると直前の id + 1 を採番する。
+        """
+        with self._lock:
+            self._last_id = self._last_id + 1 if event_id is None else event_id
+            message = {"id": self._last_id, "event": event, "data": data}
+            self._replay.append(message)
+            self._published += 1
+            subscribers = list(self._subscribers)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for sub in subscribers:
+            if sub.loop is running:
+                self._deliver(sub, message)
+                continue
+            # ループ終了済みの subscriber は無視する
+            with contextlib.suppress(RuntimeError):
+                sub.loop.call_soon_threadsafe(self._deliver, sub, message)
+
+    def _deliver(self, sub: Subscription, message: dict) -> None:
+        """subscriber のループ上でイベントを積み、統計を更新する。"""
+        dropped, coalesced = sub.dropped, sub.coalesced
+        accepted = sub.offer(message)
+        self._dropped += sub.dropped - dropped
+        self._coalesced += sub.coalesced - coalesced
+        if not accepted:
+            with self._lock:
+                if sub not in self._subscribers:
+                    return
+                self._subscribers.remove(sub)
+            self._dropped += 1
+            self._disconnected += 1
+
+    def _missed_since(self, last_event_id: int) -> list[dict]:
+        """last_event_id より後のイベントを返す（要ロック）。
+
+        バッファから再送できない場合は resync イベント1件を返す。
+        """
+        if last_event_id == self._last_id:
+            return []
+        oldest = self._replay[0]["id"] if self._replay else None
+        missed = [m for m in self._replay if m["id"] > last_event_id]
+        if (
+            last_event_id > self._last_id  # 再起動前の id
+            or oldest is None
+            or oldest > last_event_id + 1
+            or len(missed) > self._max_queue_size
+        ):
+            return [{"id": self._last_id, "event": RESYNC_EVENT, "data": None}]
+        return missed
+
+    def metrics(self) -> dict:
+        """購読者数・キュー深さ・破棄数などの統計を返す。"""
+        depths = [sub.qsize() for sub in self._subscribers]
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "max_queue_size": self._max_queue_size,
+            "published": self._published,
+            "coalesced": self._coalesced,
+            "dropped": self._dropped,
+            "disconnected": self._disconnected,
+        }
 
     @asynccontextmanager
-    async def subscribe(self):
-        """コンテキスト内で Queue を受け取り、イベントを待ち受ける。"""
-        queue: asyncio.Queue[dict] = asyncio.Queue()
-        self._subscribers.append(queue)
+    async def subscribe(self, last_event_id: int | None = None):
+        """コンテキスト内で Subscription を受け取り、イベントを待ち受ける。
+
+        Args:
+            last_event_id: 再接続時に最後に受け取ったイベント id。
+                指定すると以降のイベント（または resync）を先に積む。
+        """
+        sub = Subscription(
+            asyncio.get_running_loop(), self._max_queue_size, self._policy
+        )
+        with self._lock:
+            self._subscribers.append(sub)
+            missed = (
+                []
+                if last_event_id is None
+                else self._missed_since(last_event_id)
+            )
+        for message in missed:
+            self._deliver(sub, message)
         try:
-            yield queue
+            yield sub
         finally:
-            self._subscribers.remove(queue)
+            with self._lock:
+                if sub in self._subscribers:
+                    self._subscribers.remove(sub)
@@ -0,0 +1,111 @@
+"""変更イベントログを介したプロセス間 EventBus。
+
+publish はイベントを共有ログ（EventLogInterface）に追記するだけで、
+自プロセスの subscriber への配信はポーリングスレッドが担う。
+同一ホスト上の uvicorn ワーカー・スケジューラが同じログを共有すれば、
+どのプロセスが publish したイベントもどのワーカーの /api/events から
+受け取れる。
+
+ポーリングスレッドは最初の subscribe 時に起動するため、
+publish しかしないプロセス（スケジューラ等）ではログを読まない。
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from backend.ingestion.event_bus import EventBus, SlowConsumerPolicy
+from backend.interfaces.event_log import EventLogInterface
+
+logger = logging.getLogger(__name__)
+
+
+class LoggedEventBus(EventBus):
+    """共有イベントログ経由で配信する EventBus。
+
+    Args:
+        log: プロセス間で共有するイベントログ
+        poll_interval: ログをポーリングする間隔（秒）
+        max_queue_size: subscriber ごとの未読イベント数の上限
+        slow_consumer_policy: 上限到達時の挙動
+    """
+
+    def __init__(
+        self,
+        log: EventLogInterface,
+        poll_interval: float = 0.2,
+        max_queue_size: int = 100,
+        slow_consumer_policy: SlowConsumerPolicy = "drop_oldest",
+    ) -> None:
+        super().__init__(max_queue_size, slow_consumer_policy)
+        self._log = log
+        self._poll_interval = poll_interval
+        # 起動前のイベントは配信しない（再送要求には resync で応じる）
+        self._cursor = log.latest_id()
+        self._last_id = self._cursor
+        self._stop = threading.Event()
+        self._poller: threading.Thread | None = None
+        self._poller_lock = threading.Lock()
+        self._cursor_lock = threading.Lock()
+
+    def publish(self, event: str, data: dict | None = None) -> None:
+        """イベントを共有ログに追記する。
+
+        自プロセスの subscriber にもポーリング経由で届く。
+        """
+        self._log.append(event, data)
+
+    def poll_once(self) -> int:
+        """ログの新着イベントを自プロセスの subscriber へ配信する。
+
+        Returns:
+            配信したイベント数
+        """
+        delivered = 0
+        with self._cursor_lock:
+            while True:
+                events = self._log.read_since(self._cursor)
+                for logged in events:
+                    self._broadcast(logged.event, logged.data, logged.id)
+                    self._cursor = logged.id
+                delivered += len(events)
+                if not events:
+                    return delivered
+
+    def close(self) -> None:
+        """ポーリングスレッドを停止する。"""
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+
+    @asynccontextmanager
+    async def subscribe(self, last_event_id: int | None = None):
+        """ポーリングスレッドを起動した上で購読する。
+
+        イベント id はログの id なので、別ワーカーで受け取った id でも
+        再送できる。その場合に備え、再送判定の前にログへ追いつく。
+        """
+        self._ensure_poller()
+        if last_event_id is not None:
+            await asyncio.to_thread(self.poll_once)
+        async with super().subscribe(last_event_id) as sub:
+            yield sub
+
+    def _ensure_poller(self) -> None:
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self._poll_loop,
+                    name="event-log-poller",
+                    daemon=True,
+                )
+                self._poller.start()
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self._poll_interval):
+            try:
+                self.poll_once()
+            except Exception:
+                # 一時的な DB ロック等で配信スレッドを止めない
+                logger.exception("event log polling failed")
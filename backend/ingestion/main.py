@@ -10,18 +10,43 @@ from datetime import datetime
 from typing import Annotated
 
 import pandas as pd
-from fastapi import Depends, FastAPI, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, Header, HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
+from backend.analysis.anomaly import tree_params
+from backend.analysis.detectors import (
+    DETECTOR_REGISTRY,
+    create_detector,
+    detector_name,
+)
 from backend.analysis.engine import AnalysisEngine
+from backend.analysis.feature import (
+    FEATURE_REGISTRY,
+    validate_feature_params,
+)
+from backend.analysis.feature_cache import FeatureCache
+from backend.analysis.jobs import AnalysisJobQueue
 from backend.dependencies import (
     get_analysis_engine,
+    get_change_batcher,
     get_data_store,
+    get_db_executor,
     get_event_bus,
+    get_feature_cache,
+    get_job_queue,
     get_result_store,
 )
-from backend.ingestion.event_bus import EventBus
+from backend.ingestion.async_store import AsyncDataStore, AsyncResultStore
+from backend.ingestion.change_events import (
+    CATEGORIES_CHANGED,
+    DATA_CLEARED,
+    MODEL_CHANGED,
+    RECORDS_APPENDED,
+    RESULTS_UPDATED,
+    ChangeBatcher,
+)
+from backend.ingestion.event_bus import EventBus, SlowConsumerError
 from backend.interfaces.data_store import (
     CategoryNode,
     DataStoreInterface,
@@ -33,10 +58,28 @@ from backend.interfaces.result_store import (
     ResultStoreInterface,
 )
 
-StoreDep = Annotated[DataStoreInterface, Depends(get_data_store)]
-ResultStoreDep = Annotated[ResultStoreInterface, Depends(get_result_store)]
+
+def get_async_data_store(
+    store: Annotated[DataStoreInterface, Depends(get_data_store)],
+) -> AsyncDataStore:
+    """DataStore を DB 専用 Executor 経由の非同期アダプタで包む。"""
+    return AsyncDataStore(store, get_db_executor())
+
+
+def get_async_result_store(
+    result_store: Annotated[ResultStoreInterface, Depends(get_result_store)],
+) -> AsyncResultStore:
+    """ResultStore を DB 専用 Executor 経由の非同期アダプタで包む。"""
+    return AsyncResultStore(result_store, get_db_executor())
+
+
+StoreDep = Annotated[AsyncDataStore, Depends(get_async_data_store)]
+ResultStoreDep = Annotated[AsyncResultStore, Depends(get_async_result_store)]
 EngineDep = Annotated[AnalysisEngine, Depends(get_analysis_engine)]
 EventBusDep = Annotated[EventBus, Depends(get_event_bus)]
+ChangesDep = Annotated[ChangeBatcher, Depends(get_change_batcher)]
+JobQueueDep = Annotated[AnalysisJobQueue, Depends(get_job_queue)]
+FeatureCacheDep = Annotated[FeatureCache, Depends(get_feature_cache)]
 
 app = FastAPI(
     title="設備劣化検知システム API",
@@ -120,6 +163,7 @@ class ModelDefinitionRequest(BaseModel):
     sensitivity: float
     excluded_points: list[datetime] = []
     feature_config: list[FeatureSpecRequest] | None = None
+    anomaly_params: dict | None = None
 
     @field_validator("baseline_start", "baseline_end", mode="after")
     @classmethod
@@ -137,6 +181,35 @@ class ModelDefinitionRequest(BaseModel):
         ]
 
 
+class ContaminationPreviewRequest(ModelDefinitionRequest):
+    """感度プレビューのリクエスト（未保存のモデル定義 + 試算する値）。"""
+
+    contaminations: list[float] = Field(min_length=1, max_length=100)
+
+
+class ContaminationPreviewEntry(BaseModel):
+    """1つの contamination に対する判定。"""
+
+    contamination: float
+    threshold: float = Field(
+        description="この値を超える raw_scores が異常と判定される境界",
+    )
+    flagged_count: int
+    flags: list[bool]
+
+
+class ContaminationPreviewResponse(BaseModel):
+    """感度プレビューのレスポンス。"""
+
+    category_id: int
+    recorded_at: list[datetime]
+    raw_scores: list[float] = Field(
+        description="原論文準拠の異常スコア（-score_samples）。"
+        "contamination に依存しない",
+    )
+    sweep: list[ContaminationPreviewEntry]
+
+
 class ModelDefinitionResponse(BaseModel):
     """モデル定義のレスポンス。"""
 
@@ -146,6 +219,23 @@ class ModelDefinitionResponse(BaseModel):
     sensitivity: float
     excluded_points: list[datetime]
     feature_config: list[FeatureSpecRequest] | None = None
+    anomaly_params: dict | None = None
+    version: int = 0
+
+
+class JobResponse(BaseModel):
+    """分析ジョブの状態レスポンス。"""
+
+    job_id: str
+    lane: str  # "interactive" | "ingest" | "bulk"
+    state: str  # "queued" | "running" | "succeeded" | "failed"
+    category_ids: list[int]
+    completed: int
+    progress: float
+    error: str | None
+    failed_category_ids: list[int]
+    created_at: datetime
+    finished_at: datetime | None
 
 
 class DashboardCategorySummary(BaseModel):
@@ -188,6 +278,69 @@ def _collect_leaves_with_paths(
     return leaves
 
 
+def _store_records(
+    store: DataStoreInterface,
+    rows: list[tuple[list[str], float, datetime]],
+) -> tuple[int, dict[int, int], set[int]]:
+    """(分類パス, 作業時間, 記録日時) の行を保存する（DB Executor 上で実行）。
+
+    Returns:
+        (投入件数, 影響カテゴリID→新データバージョン, 新規カテゴリIDの集合)
+    """
+    category_ids: dict[tuple[str, ...], int] = {}
+    work_records: list[WorkRecord] = []
+    for path, work_time, recorded_at in rows:
+        key = tuple(path)
+        if key not in category_ids:
+            category_ids[key] = store.ensure_category_path(path)
+        work_records.append(
+            WorkRecord(
+                category_id=category_ids[key],
+                work_time=work_time,
+                recorded_at=recorded_at,
+            )
+        )
+    affected = sorted(set(category_ids.values()))
+    # 記録を一度も持たない末端カテゴリは今回ツリーに追加されたもの
+    new_category_ids = set(affected) - set(store.get_data_versions(affected))
+    inserted = store.upsert_records(work_records)
+    return inserted, store.get_data_versions(affected), new_category_ids
+
+
+def _publish_records_changes(
+    changes: ChangeBatcher,
+    versions: dict[int, int],
+    new_category_ids: set[int],
+) -> None:
+    """取り込み結果を categories-changed / records-appended として通知する。"""
+    if new_category_ids:
+        changes.emit(CATEGORIES_CHANGED, sorted(new_category_ids))
+    changes.emit(RECORDS_APPENDED, sorted(versions), versions)
+
+
+def _build_dashboard_summary(
+    store: DataStoreInterface, result_store: ResultStoreInterface
+) -> list[DashboardCategorySummary]:
+    """全末端カテゴリのサマリーを構築する（DB Executor 上で実行）。"""
+    leaves = _collect_leaves_with_paths(store.get_category_tree())
+    summaries = []
+    for cat_id, cat_path in leaves:
+        anomalies = result_store.get_anomaly_results(cat_id)
+        model_def = result_store.get_model_definition(cat_id)
+
+        summaries.append(
+            DashboardCategorySummary(
+                category_id=cat_id,
+                category_path=cat_path,
+                anomaly_count=len(anomalies),
+                baseline_status="configured"
+                if model_def is not None
+                else "unconfigured",
+            )
+        )
+    return summaries
+
+
 # ---------- エンドポイント ----------
 
 
@@ -201,37 +354,29 @@ async def health_check():
 async def post_records(
     body: RecordsBatchRequest,
     store: StoreDep,
-    engine: EngineDep,
-    bus: EventBusDep,
+    jobs: JobQueueDep,
+    changes: ChangesDep,
 ):
-    """作業記録をバッチ投入する。"""
-    work_records: list[WorkRecord] = []
-    affected_category_ids: set[int] = set()
-    for item in body.records:
-        category_id = store.ensure_category_path(item.category_path)
-        affected_category_ids.add(category_id)
-        work_records.append(
-            WorkRecord(
-                category_id=category_id,
-                work_time=item.work_time,
-                recorded_at=item.recorded_at,
-            )
-        )
-    inserted = store.upsert_records(work_records)
-
-    for cid in affected_category_ids:
-        engine.run(cid)
+    """作業記録をバッチ投入し、影響カテゴリの分析ジョブを投入する。"""
+    rows = [
+        (item.category_path, item.work_time, item.recorded_at)
+        for item in body.records
+    ]
+    inserted, versions, new_category_ids = await store.run(
+        _store_records, store.sync, rows
+    )
 
-    bus.publish("dashboard-updated")
-    return {"inserted": inserted}
+    job = jobs.submit(sorted(versions))
+    _publish_records_changes(changes, versions, new_category_ids)
+    return {"inserted": inserted, "job_id": job.id}
 
 
 @app.post("/api/records/csv")
 async def post_records_csv(
     file: UploadFile,
     store: StoreDep,
-    engine: EngineDep,
-    bus: EventBusDep,
+    jobs: JobQueueDep,
+    changes: ChangesDep,
 ):
     """CSVファイルから作業記録をバッチ投入する（デバッグ用）。"""
     content = await file.read()
@@ -251,8 +396,7 @@ async def post_records_csv(
         c for c in df.columns if c not in ("work_time", "recorded_at")
     ]
 
-    work_records: list[WorkRecord] = []
-    affected_category_ids: set[int] = set()
+    rows: list[tuple[list[str], float, datetime]] = []
     skipped = 0
     for _, row in df.iterrows():
         path = [
@@ -263,23 +407,21 @@ async def post_records_csv(
         if not path:
             skipped += 1
             continue
-        category_id = store.ensure_category_path(path)
-        affected_category_ids.add(category_id)
-        work_records.append(
-            WorkRecord(
-                category_id=category_id,
-                work_time=float(row["work_time"]),
-                recorded_at=row["recorded_at"].to_pydatetime(),
+        rows.append(
+            (
+                path,
+                float(row["work_time"]),
+                row["recorded_at"].to_pydatetime(),
             )
         )
 
-    inserted = store.upsert_records(work_records)
-
-    for cid in affected_category_ids:
-        engine.run(cid)
+    inserted, versions, new_category_ids = await store.run(
+        _store_records, store.sync, rows
+    )
 
-    bus.publish("dashboard-updated")
-    return {"inserted": inserted, "skipped": skipped}
+    job = jobs.submit(sorted(versions))
+    _publish_records_changes(changes, versions, new_category_ids)
+    return {"inserted": inserted, "skipped": skipped, "job_id": job.id}
 
 
 @app.get("/api/records")
@@ -290,7 +432,7 @@ async def get_records(
     end: datetime | None = None,
 ):
     """指定カテゴリの作業記録を取得する。"""
-    records = store.get_records(category_id, start=start, end=end)
+    records = await store.get_records(category_id, start=start, end=end)
     return {
         "records": [
             RecordResponse(
@@ -309,7 +451,7 @@ async def get_categories(
     root: int | None = None,
 ):
     """分類ツリーを取得する。"""
-    nodes = store.get_category_tree(root_id=root)
+    nodes = await store.get_category_tree(root_id=root)
     return {"categories": [_to_category_node_response(n) for n in nodes]}
 
 
@@ -319,8 +461,8 @@ async def get_results(
     result_store: ResultStoreDep,
 ):
     """分析結果を取得する。未計算なら null を返す。"""
-    trend = result_store.get_trend_result(category_id)
-    anomalies = result_store.get_anomaly_results(category_id)
+    trend = await result_store.get_trend_result(category_id)
+    anomalies = await result_store.get_anomaly_results(category_id)
     return {
         "trend": TrendResultResponse(
             slope=trend.slope,
@@ -344,7 +486,7 @@ async def get_model_definition(
     result_store: ResultStoreDep,
 ):
     """モデル定義を取得する。未定義なら 404。"""
-    definition = result_store.get_model_definition(category_id)
+    definition = await result_store.get_model_definition(category_id)
     if definition is None:
         raise HTTPException(
             status_code=404, detail="Model definition not found"
@@ -362,6 +504,22 @@ async def get_model_definition(
         sensitivity=definition.sensitivity,
         excluded_points=definition.excluded_points,
         feature_config=fc,
+        anomaly_params=definition.anomaly_params,
+        version=definition.version,
+    )
+
+
+def _to_feature_config(
+    specs: list[FeatureSpecRequest] | None,
+) -> FeatureConfig | None:
+    """リクエストの feature_config を FeatureConfig に変換する。"""
+    if specs is None:
+        return None
+    return FeatureConfig(
+        features=[
+            FeatureSpec(feature_type=f.feature_type, params=f.params)
+            for f in specs
+        ]
     )
 
 
@@ -370,27 +528,37 @@ async def put_model_definition(
     category_id: int,
     body: ModelDefinitionRequest,
     result_store: ResultStoreDep,
-    engine: EngineDep,
-    bus: EventBusDep,
+    jobs: JobQueueDep,
+    changes: ChangesDep,
 ):
-    """モデル定義を保存し、異常検知を実行する."""
-    existing = result_store.get_model_definition(category_id)
-
-    # feature_config を FeatureConfig に変換
-    feature_config = None
-    if body.feature_config is not None:
-        feature_config = FeatureConfig(
-            features=[
-                FeatureSpec(feature_type=f.feature_type, params=f.params)
-                for f in body.feature_config
-            ]
-        )
-
+    """モデル定義を保存し、異常検知ジョブを投入する."""
+    existing = await result_store.get_model_definition(category_id)
+
+    feature_config = _to_feature_config(body.feature_config)
+
+    # 省略時は既存の検知器設定を引き継ぐ（null 明示で既定に戻す）
+    anomaly_params = body.anomaly_params
+    if "anomaly_params" not in body.model_fields_set and existing is not None:
+        anomaly_params = existing.anomaly_params
+    # 特徴量とストリーミング検知器の指定は保存前に検証する
+    try:
+        if feature_config is not None:
+            for spec in feature_config.features:
+                validate_feature_params(spec.feature_type, spec.params)
+        if detector_name(anomaly_params) is not None:
+            create_detector(anomaly_params)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+    # sensitivity と contamination は再学習を伴わない（保存済みの
+    # raw_score の正規化だけをやり直す）
     baseline_changed = existing is None or (
         existing.baseline_start != body.baseline_start
         or existing.baseline_end != body.baseline_end
         or sorted(existing.excluded_points) != sorted(body.excluded_points)
         or existing.feature_config != feature_config
+        or tree_params(existing.anomaly_params or {})
+        != tree_params(anomaly_params or {})
     )
 
     definition = ModelDefinition(
@@ -400,36 +568,107 @@ async def put_model_definition(
         sensitivity=body.sensitivity,
         excluded_points=body.excluded_points,
         feature_config=feature_config,
+        anomaly_params=anomaly_params,
+    )
+    # version 更新により、旧定義で実行中の分析は結果を書かずに中断する
+    model_version = await result_store.save_model_definition(definition)
+    job = jobs.submit([category_id], immediate=True, lane="interactive")
+    changes.emit(MODEL_CHANGED, [category_id])
+    return {
+        "retrained": baseline_changed,
+        "job_id": job.id,
+        "model_version": model_version,
+    }
+
+
+@app.post("/api/models/{category_id}/preview")
+async def preview_model_contamination(
+    category_id: int,
+    body: ContaminationPreviewRequest,
+    engine: EngineDep,
+    result_store: ResultStoreDep,
+    jobs: JobQueueDep,
+):
+    """未保存の定義で、複数の contamination の判定を一度に試算する。
+
+    学習は1回だけで、結果・定義とも保存しない。学習はジョブキューの
+    interactive レーンで実行する（スライダー操作の連打でもワーカー数と
+    CPU 予算を超えない）。anomaly_params の省略時は、PUT と同じく
+    保存済みの設定を引き継ぐ。
+    """
+    anomaly_params = body.anomaly_params
+    if "anomaly_params" not in body.model_fields_set:
+        existing = await result_store.get_model_definition(category_id)
+        if existing is not None:
+            anomaly_params = existing.anomaly_params
+    definition = ModelDefinition(
+        category_id=category_id,
+        baseline_start=body.baseline_start,
+        baseline_end=body.baseline_end,
+        sensitivity=body.sensitivity,
+        excluded_points=body.excluded_points,
+        feature_config=_to_feature_config(body.feature_config),
+        anomaly_params=anomaly_params,
+    )
+    try:
+        preview = await asyncio.wrap_future(
+            jobs.submit_call(
+                lambda: engine.preview_contamination(
+                    definition, body.contaminations
+                ),
+                lane="interactive",
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    if preview is None:
+        raise HTTPException(
+            status_code=422, detail="No records in the baseline period"
+        )
+    records, sweep = preview
+    return ContaminationPreviewResponse(
+        category_id=category_id,
+        recorded_at=[r.recorded_at for r in records],
+        raw_scores=sweep.raw_scores.tolist(),
+        sweep=[
+            ContaminationPreviewEntry(
+                contamination=float(c),
+                threshold=float(t),
+                flagged_count=int(flags.sum()),
+                flags=flags.tolist(),
+            )
+            for c, t, flags in zip(
+                sweep.contaminations,
+                sweep.thresholds,
+                sweep.flags,
+                strict=True,
+            )
+        ],
     )
-    result_store.save_model_definition(definition)
-    engine.run(category_id)
-    bus.publish("dashboard-updated")
-    return {"retrained": baseline_changed}
 
 
 @app.delete("/api/models/{category_id}")
 async def delete_model_definition_endpoint(
     category_id: int,
     result_store: ResultStoreDep,
-    bus: EventBusDep,
+    changes: ChangesDep,
 ):
     """モデル定義を削除する。異常検知結果もカスケード削除。未定義なら404。"""
-    existing = result_store.get_model_definition(category_id)
+    existing = await result_store.get_model_definition(category_id)
     if existing is None:
         raise HTTPException(
             status_code=404, detail="Model definition not found"
         )
-    result_store.delete_anomaly_results(category_id)
-    result_store.delete_model_definition(category_id)
-    bus.publish("dashboard-updated")
+    await result_store.delete_anomaly_results(category_id)
+    await result_store.delete_model_definition(category_id)
+    changes.emit(MODEL_CHANGED, [category_id])
+    changes.emit(RESULTS_UPDATED, [category_id])
     return {"deleted": True}
 
 
 @app.get("/api/features/registry")
 async def get_feature_registry():
     """利用可能な特徴量一覧を返す。"""
-    from backend.analysis.feature import FEATURE_REGISTRY
-
     return {
         "features": [
             {
@@ -443,12 +682,58 @@ async def get_feature_registry():
     }
 
 
+@app.get("/api/features/cache/metrics")
+async def get_feature_cache_metrics(feature_cache: FeatureCacheDep):
+    """特徴量キャッシュのヒット・ミス数と使用量を返す。"""
+    return feature_cache.metrics()
+
+
+@app.get("/api/detectors/registry")
+async def get_detector_registry():
+    """anomaly_params["detector"] で選べるストリーミング検知器一覧を返す。
+
+    ストリーミング検知器はベースライン期間を使わず、系列の先頭から
+    逐次学習する（除外点は学習に使わない）。
+    """
+    return {
+        "detectors": [
+            {
+                "detector": key,
+                "label": entry["label"],
+                "description": entry["description"],
+                "params_schema": entry["params_schema"],
+            }
+            for key, entry in DETECTOR_REGISTRY.items()
+        ]
+    }
+
+
 @app.post("/api/analysis/run")
-async def run_analysis(engine: EngineDep, bus: EventBusDep):
-    """全末端カテゴリに対して分析を手動トリガーする。"""
-    count = engine.run_all()
-    bus.publish("dashboard-updated")
-    return {"processed_categories": count}
+async def run_analysis(store: StoreDep, engine: EngineDep, jobs: JobQueueDep):
+    """全末端カテゴリに対する分析ジョブを手動投入する。"""
+    leaf_ids = await store.run(engine.leaf_category_ids)
+    job = jobs.submit(leaf_ids, immediate=True, lane="bulk")
+    return {"processed_categories": len(leaf_ids), "job_id": job.id}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, jobs: JobQueueDep):
+    """分析ジョブの状態と進捗を取得する。未知のIDなら 404。"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(
+        job_id=job.id,
+        lane=job.lane,
+        state=job.state,
+        category_ids=job.category_ids,
+        completed=job.completed,
+        progress=job.progress,
+        error=job.error,
+        failed_category_ids=job.failed_category_ids,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
 
 
 # ---------- ダッシュボード ----------
@@ -460,25 +745,9 @@ async def get_dashboard_summary(
     result_store: ResultStoreDep,
 ):
     """ダッシュボード用サマリーを一括取得する。"""
-    tree = store.get_category_tree()
-    leaves = _collect_leaves_with_paths(tree)
-
-    summaries = []
-    for cat_id, cat_path in leaves:
-        anomalies = result_store.get_anomaly_results(cat_id)
-        model_def = result_store.get_model_definition(cat_id)
-
-        summaries.append(
-            DashboardCategorySummary(
-                category_id=cat_id,
-                category_path=cat_path,
-                anomaly_count=len(anomalies),
-                baseline_status="configured"
-                if model_def is not None
-                else "unconfigured",
-            )
-        )
-
+    summaries = await store.run(
+        _build_dashboard_summary, store.sync, result_store.sync
+    )
     return {"categories": summaries}
 
 
@@ -486,46 +755,73 @@ async def get_dashboard_summary(
 
 
 @app.get("/api/events")
-async def events(bus: EventBusDep):
-    """Server-Sent Events ストリーム。ダッシュボード更新通知を配信する。"""
+async def events(
+    bus: EventBusDep,
+    last_event_id: Annotated[str | None, Header()] = None,
+):
+    """Server-Sent Events ストリーム。データ変更通知を配信する。
+
+    再接続時にブラウザが送る Last-Event-ID ヘッダーを受け取ると、
+    取りこぼしたイベントを再送する。再送できない場合は resync を送る。
+    """
+    # 数値でない id（他サーバー由来など）は resync 扱いにする
+    resume_from = None
+    if last_event_id is not None:
+        resume_from = int(last_event_id) if last_event_id.isdigit() else -1
 
     async def stream_with_keepalive():
-        async with bus.subscribe() as queue:
+        async with bus.subscribe(resume_from) as queue:
             while True:
                 try:
                     event = await asyncio.wait_for(queue.get(), timeout=30)
                     yield (
+                        f"id: {event['id']}\n"
                         f"event: {event['event']}\n"
                         f"data: {json.dumps(event.get('data') or {})}\n\n"
                     )
                 except TimeoutError:
                     yield ": keepalive\n\n"
+                except SlowConsumerError:
+                    # 受信が追いつかない接続は閉じ、自動再接続に任せる
+                    return
 
     return StreamingResponse(
         stream_with_keepalive(), media_type="text/event-stream"
     )
 
 
+@app.get("/api/events/metrics")
+async def get_event_metrics(bus: EventBusDep):
+    """EventBus の購読者数・キュー深さ・破棄数を返す。"""
+    return bus.metrics()
+
+
 # ---------- デバッグ用エンドポイント ----------
 
 
 @app.delete("/api/debug/data", tags=["debug"])
-async def delete_all_data(store: StoreDep):
+async def delete_all_data(store: StoreDep, changes: ChangesDep):
     """【デバッグ用】作業記録・カテゴリを全削除する。"""
-    store.delete_all_data()
+    await store.delete_all_data()
+    changes.emit(DATA_CLEARED, [])
     return {"deleted": "data"}
 
 
 @app.delete("/api/debug/results", tags=["debug"])
 async def delete_all_results(result_store: ResultStoreDep):
     """【デバッグ用】分析結果・モデル定義を全削除する。"""
-    result_store.delete_all_data()
+    await result_store.delete_all_data()
     return {"deleted": "results"}
 
 
 @app.delete("/api/debug/all", tags=["debug"])
-async def delete_all(store: StoreDep, result_store: ResultStoreDep):
+async def delete_all(
+    store: StoreDep,
+    result_store: ResultStoreDep,
+    changes: ChangesDep,
+):
     """【デバッグ用】全データを一括削除する。"""
-    result_store.delete_all_data()
-    store.delete_all_data()
+    await result_store.delete_all_data()
+    await store.delete_all_data()
+    changes.emit(DATA_CLEARED, [])
     return {"deleted": "all"}
@@ -75,6 +75,18 @@ class DataStoreInterface(ABC):
         """分類ツリーを取得する。root_id省略時はツリー全体。"""
         ...
 
+    @abstractmethod
+    def get_data_versions(
+        self, category_ids: list[int] | None = None
+    ) -> dict[int, int]:
+        """カテゴリごとのデータバージョンを取得する。
+
+        バージョンは作業記録が書き込まれるたびに単調増加する
+        （全データ削除後も巻き戻らない）。記録のないカテゴリは含まない。
+        category_ids省略時は全カテゴリ。
+        """
+        ...
+
     @abstractmethod
     def delete_all_data(self) -> None:
         """全データを削除する（デバッグ用）。"""
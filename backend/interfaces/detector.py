@@ -0,0 +1,50 @@
+"""逐次型異常検知器（ストリーミング検知器）のインターフェース."""
+
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class StreamingDetector(ABC):
+    """1点ずつ O(1) 程度で更新できる異常検知器の抽象基底クラス.
+
+    IsolationForest と異なり一括学習を行わず、到着順に
+    score() → 状態更新を繰り返す。各点はそれ以前の点だけから
+    作った状態に対して採点される。
+
+    スコアは IsolationForest と同じ契約に従う:
+    0〜1、0.5 = 管理限界（検知器固有の閾値）、1 に近いほど異常。
+
+    状態は get_state() / set_state() で JSON 化できる dict として
+    出し入れでき、結果ストアに保存して次回の分析で続きから更新する。
+    """
+
+    def update_many(
+        self, values: Sequence[float], learn: Sequence[bool] | None = None
+    ) -> np.ndarray:
+        """values を順に採点・学習し、スコア配列 (n,) を返す.
+
+        Args:
+            values: 到着順の観測値
+            learn: 各点で状態を更新するか（False の点は採点のみ）。
+                   None なら全点で更新する。
+        """
+        scores = np.empty(len(values))
+        for i, value in enumerate(values):
+            scores[i] = self.update(
+                float(value), learn=True if learn is None else learn[i]
+            )
+        return scores
+
+    @abstractmethod
+    def update(self, value: float, learn: bool = True) -> float:
+        """1点を採点し、learn なら状態を更新してスコアを返す."""
+
+    @abstractmethod
+    def get_state(self) -> dict:
+        """JSON 化できる内部状態を返す."""
+
+    @abstractmethod
+    def set_state(self, state: dict) -> None:
+        """get_state() の出力から内部状態を復元する."""
@@ -0,0 +1,41 @@
+"""変更イベントログの抽象インターフェース。
+
+EventBus を複数プロセス（uvicorn ワーカー・スケジューラ）で共有するための
+追記専用ログ。各プロセスはイベントをログに追記し、
+自プロセスの購読者へはログをポーリングして配信する。
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class LoggedEvent:
+    """ログに記録された1イベント。
+
+    id はログ内で単調増加する。
+    """
+
+    id: int
+    event: str
+    data: dict | None
+
+
+class EventLogInterface(ABC):
+    """プロセス間で共有される変更イベントログ。"""
+
+    @abstractmethod
+    def append(self, event: str, data: dict | None = None) -> int:
+        """イベントを追記し、採番された id を返す。"""
+
+    @abstractmethod
+    def read_since(
+        self, after_id: int, limit: int = 1000
+    ) -> list[LoggedEvent]:
+        """after_id より後のイベントを id 昇順で最大 limit 件返す。"""
+
+    @abstractmethod
+    def latest_id(self) -> int:
+        """最新イベントの id を返す。空なら 0。"""
@@ -1,11 +1,14 @@
 """Isolation Forest 用の特徴量構築インターフェース."""
 
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
+from typing import ClassVar
 
 import numpy as np
+from numpy.typing import ArrayLike
 
 
 @dataclass(frozen=True)
@@ -39,17 +42,29 @@ class FeatureBuilder(ABC):
 
     空の入力に対しては shape (0, d) の2次元配列を返すこと。
     d（特徴量の次元数）は実装依存。
+
+    追記された点だけの特徴量を求める増分構築（build_incremental）は
+    任意。対応するサブクラスは _build_incremental_impl を実装する。
+
+    work_times は float64 の1次元配列に変換してから渡す。呼び出し側が
+    float64 の ndarray を渡した場合はコピーせず、書き込み不可のビューを
+    渡す（出力が入力とメモリを共有することもある）。サブクラスは入力を
+    変更してはならない。check_input_mutation を True にすると、
+    build のたびに入力が変更されていないかを検査する（デバッグ用）。
     """
 
+    check_input_mutation: ClassVar[bool] = False
+    """入力を変更するビルダーを検出するデバッグモード。"""
+
     def build(
         self,
-        work_times: Sequence[float],
+        work_times: ArrayLike,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
         """特徴量行列を構築し、shape を検証して返す.
 
         Args:
-            work_times: 作業時間のシーケンス（長さ n）
+            work_times: 作業時間の配列またはシーケンス（長さ n）
             timestamps: 各レコードの記録日時（長さ n）。
                         時間情報系特徴量で使用。None の場合は未使用。
 
@@ -58,26 +73,110 @@ class FeatureBuilder(ABC):
 
         Raises:
             ValueError: サブクラスが2次元配列を返さなかった場合
+            RuntimeError: check_input_mutation 有効時、入力が変更された場合
         """
-        result = self._build_impl(work_times, timestamps)
+        work_times, timestamps = _read_only(work_times, timestamps)
+        with self._guard_input(work_times, timestamps):
+            result = self._build_impl(work_times, timestamps)
         if result.ndim != 2:
             raise ValueError(
                 f"FeatureBuilder must return 2D array, got {result.ndim}D"
             )
         return result
 
+    def build_incremental(
+        self,
+        work_times: ArrayLike,
+        timestamps: Sequence[datetime] | None = None,
+        state: dict | None = None,
+    ) -> tuple[np.ndarray, dict]:
+        """前回の状態から続けて、追記された点の特徴量行を構築する.
+
+        系列を任意の位置で区切り、先頭から順に（前回の戻り値の状態を
+        渡して）呼んだ結果を連結すると、系列全体の build() と一致する。
+        状態は JSON に変換できる dict で、呼び出し側が永続化する。
+
+        Args:
+            work_times: 追記された点の作業時間（長さ m）
+            timestamps: 追記された点の記録日時（長さ m）
+            state: 直前の呼び出しが返した状態。None なら系列の先頭から
+
+        Returns:
+            (shape (m, d) の2次元配列, 次の呼び出しに渡す状態)
+
+        Raises:
+            NotImplementedError: 増分構築に対応していない場合
+            ValueError: サブクラスが2次元配列を返さなかった場合
+        """
+        work_times, timestamps = _read_only(work_times, timestamps)
+        with self._guard_input(work_times, timestamps):
+            result, new_state = self._build_incremental_impl(
+                work_times, timestamps, state
+            )
+        if result.ndim != 2:
+            raise ValueError(
+                f"FeatureBuilder must return 2D array, got {result.ndim}D"
+            )
+        return result, new_state
+
+    @contextmanager
+    def _guard_input(
+        self, work_times: np.ndarray, timestamps: Sequence[datetime] | None
+    ) -> Iterator[None]:
+        """check_input_mutation 有効時、ブロックの前後で入力を比較する."""
+        if not self.check_input_mutation:
+            yield
+            return
+        values_before = work_times.copy()
+        timestamps_before = None if timestamps is None else list(timestamps)
+        yield
+        timestamps_after = None if timestamps is None else list(timestamps)
+        if (
+            not np.array_equal(work_times, values_before, equal_nan=True)
+            or timestamps_after != timestamps_before
+        ):
+            raise RuntimeError(f"{type(self).__name__} modified its input")
+
+    def _build_incremental_impl(
+        self,
+        work_times: np.ndarray,
+        timestamps: Sequence[datetime] | None,
+        state: dict | None,
+    ) -> tuple[np.ndarray, dict]:
+        """サブクラスが実装する増分構築ロジック（既定は未対応）."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support incremental builds"
+        )
+
     @abstractmethod
     def _build_impl(
         self,
-        work_times: Sequence[float],
+        work_times: np.ndarray,
         timestamps: Sequence[datetime] | None = None,
     ) -> np.ndarray:
         """サブクラスが実装する特徴量構築ロジック.
 
         Args:
-            work_times: 作業時間のシーケンス（長さ n）
+            work_times: 作業時間の float64 の1次元配列（長さ n, 書き込み不可）
             timestamps: 各レコードの記録日時（長さ n, optional）
 
         Returns:
             shape (n, d) の2次元配列
         """
+
+
+def _read_only(
+    work_times: ArrayLike, timestamps: Sequence[datetime] | None
+) -> tuple[np.ndarray, Sequence[datetime] | None]:
+    """入力を書き込み不可のビューにする（float64 配列ならコピーしない）."""
+    values = np.asarray(work_times, dtype=np.float64)
+    if values.ndim != 1:
+        raise ValueError(
+            f"work_times must be 1-dimensional, got {values.ndim}D"
+        )
+    values = values.view()
+    values.flags.writeable = False
+    if isinstance(timestamps, np.ndarray):
+        timestamps = timestamps.view()
+        timestamps.flags.writeable = False
+    return values, timestamps
@@ -13,6 +13,8 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from datetime import datetime
 
+    import numpy as np
+
     from backend.interfaces.feature import FeatureConfig
 
 
@@ -32,11 +34,16 @@ class AnomalyResult:
     anomaly_score は原論文準拠の正規化スコア (0〜1, 1に近いほど異常)。
     scikit-learn の -score_samples() で算出。
     booleanではなくfloat。閾値判定はフロントエンド側で実行する。
+
+    raw_score は正規化前の -score_samples()。contamination だけが
+    変わった場合に、再学習・再スコアリングせず正規化し直すために使う
+    （ストリーミング検知器など、持たない場合は None）。
     """
 
     category_id: int
     recorded_at: datetime
     anomaly_score: float
+    raw_score: float | None = None
 
 
 @dataclass
@@ -47,6 +54,10 @@ class ModelDefinition:
     1. ベースライン期間（baseline_start, baseline_end）
     2. ベースライン内の除外点（excluded_points）
     3. 感度（sensitivity → contamination相当の閾値にマッピング）
+
+    version は保存のたびにストアが採番する単調増加の値。
+    分析実行はどの version に対して開始したかを保持し、
+    古くなった実行の結果が書き込まれるのを防ぐ。
     """
 
     category_id: int
@@ -56,6 +67,25 @@ class ModelDefinition:
     excluded_points: list[datetime] = field(default_factory=list)
     feature_config: FeatureConfig | None = None
     anomaly_params: dict | None = None
+    version: int = 0
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """学習済みモデルの永続化形式（末端ノードごとに1つ保持）。
+
+    arrays は名前付きの数値配列、meta は JSON 化できるスカラー値。
+    中身の解釈は分析層に任せ、ストアはそのまま保存・復元する。
+    読み込んだ arrays は読み取り専用（メモリマップの場合がある）。
+
+    definition_hash は学習入力（ベースライン特徴量・パラメータ）の
+    ハッシュ。一致すれば再学習せずに再利用できる。
+    """
+
+    category_id: int
+    definition_hash: str
+    arrays: dict[str, np.ndarray]
+    meta: dict = field(default_factory=dict)
 
 
 class ResultStoreInterface(ABC):
@@ -72,8 +102,19 @@ class ResultStoreInterface(ABC):
         ...
 
     @abstractmethod
-    def save_anomaly_results(self, results: list[AnomalyResult]) -> None:
-        """異常スコア結果をバッチ保存する（既存は上書き）。"""
+    def save_anomaly_results(
+        self,
+        results: list[AnomalyResult],
+        model_version: int | None = None,
+    ) -> bool:
+        """異常スコア結果をバッチ保存する（既存は上書き）。
+
+        model_version を指定した場合、対象カテゴリの現在のモデル定義
+        version と一致するときだけ保存する（比較と書き込みは不可分）。
+
+        Returns:
+            保存した場合 True。version 不一致で保存しなかった場合 False。
+        """
         ...
 
     @abstractmethod
@@ -82,8 +123,15 @@ class ResultStoreInterface(ABC):
         ...
 
     @abstractmethod
-    def save_model_definition(self, definition: ModelDefinition) -> None:
-        """モデル定義を保存する（上書き）。"""
+    def save_model_definition(self, definition: ModelDefinition) -> int:
+        """モデル定義を保存する（上書き）。
+
+        definition.version は無視され、新しい version が採番される。
+        削除後に再作成しても version は巻き戻らない。
+
+        Returns:
+            採番した version
+        """
         ...
 
     @abstractmethod
@@ -91,16 +139,48 @@ class ResultStoreInterface(ABC):
         """モデル定義を取得する。"""
         ...
 
+    @abstractmethod
+    def get_model_version(self, category_id: int) -> int | None:
+        """モデル定義の現在の version を取得する。未定義なら None。"""
+        ...
+
     @abstractmethod
     def delete_model_definition(self, category_id: int) -> None:
         """指定カテゴリのモデル定義を削除する。存在しない場合もエラーにしない。"""
         ...
 
+    @abstractmethod
+    def save_model_artifact(self, artifact: ModelArtifact) -> None:
+        """学習済みモデルを保存する（上書き）。"""
+        ...
+
+    @abstractmethod
+    def get_model_artifact(self, category_id: int) -> ModelArtifact | None:
+        """学習済みモデルを取得する。未保存なら None。"""
+        ...
+
+    @abstractmethod
+    def delete_model_artifact(self, category_id: int) -> None:
+        """学習済みモデルを削除する。存在しない場合もエラーにしない。"""
+        ...
+
     @abstractmethod
     def delete_anomaly_results(self, category_id: int) -> None:
         """指定カテゴリの全異常スコア結果を削除する。存在しない場合もエラーにしない。"""
         ...
 
+    @abstractmethod
+    def save_analyzed_version(
+        self, category_id: int, data_version: int
+    ) -> None:
+        """分析済みのデータバージョン（ウォーターマーク）を保存する（上書き）。"""
+        ...
+
+    @abstractmethod
+    def get_analyzed_versions(self) -> dict[int, int]:
+        """全カテゴリの分析済みデータバージョンを取得する。"""
+        ...
+
     @abstractmethod
     def delete_all_data(self) -> None:
         """全データを削除する（デバッグ用）。"""
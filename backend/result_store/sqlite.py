@@ -1,12 +1,22 @@
 """結果ストアのSQLite実装。"""
 
+import fcntl
 import json
+import shutil
 import sqlite3
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
+
+import numpy as np
 
 from backend.interfaces.feature import FeatureConfig, FeatureSpec
 from backend.interfaces.result_store import (
     AnomalyResult,
+    ModelArtifact,
     ModelDefinition,
     ResultStoreInterface,
     TrendResult,
@@ -25,6 +35,7 @@ CREATE TABLE IF NOT EXISTS anomaly_results (
     category_id   INTEGER NOT NULL,
     recorded_at   TIMESTAMP NOT NULL,
     anomaly_score REAL NOT NULL,
+    raw_score     REAL DEFAULT NULL,
     UNIQUE(category_id, recorded_at)
 );
 
@@ -39,10 +50,33 @@ CREATE TABLE IF NOT EXISTS model_definitions (
     sensitivity     REAL NOT NULL,
     excluded_points TEXT DEFAULT '[]',
     feature_config  TEXT DEFAULT NULL,
-    anomaly_params  TEXT DEFAULT NULL
+    anomaly_params  TEXT DEFAULT NULL,
+    version         INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS model_version_counter (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO model_version_counter (id, value) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS model_artifacts (
+    category_id     INTEGER PRIMARY KEY,
+    definition_hash TEXT NOT NULL,
+    meta            TEXT NOT NULL DEFAULT '{}',
+    array_names     TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS analyzed_versions (
+    category_id  INTEGER PRIMARY KEY,
+    data_version INTEGER NOT NULL
 );
 """
 
+_STAGING_PREFIX = ".staging-"
+"""書き込み中の成果物ディレクトリの名前の接頭辞。"""
+
 # offset-naive に統一: TZ付きdatetimeが入っても壁時計時刻を保持しTZを除去
 sqlite3.register_adapter(
     datetime, lambda dt: dt.replace(tzinfo=None).isoformat()
@@ -54,9 +88,26 @@ sqlite3.register_converter(
 
 
 class SqliteResultStore(ResultStoreInterface):
-    """SQLiteによる結果ストア実装。"""
+    """SQLiteによる結果ストア実装。
+
+    学習済みモデルの配列は DB には入れず、artifact_dir 以下に
+    ``<category_id>/<definition_hash>/<name>.npy`` として置き、
+    読み込み時はメモリマップする。DB にはハッシュとメタ情報のみ持つ。
 
-    def __init__(self, db_path: str):
+    Args:
+        db_path: DB ファイルパス
+        artifact_dir: モデル配列の保存先（省略時は DB と同じ場所の
+            ``<DB名>_artifacts``。":memory:" なら一時ディレクトリ）
+    """
+
+    def __init__(self, db_path: str, artifact_dir: str | None = None):
+        if artifact_dir is None:
+            if db_path == ":memory:":
+                artifact_dir = tempfile.mkdtemp(prefix="model_artifacts_")
+            else:
+                db = Path(db_path)
+                artifact_dir = str(db.parent / f"{db.stem}_artifacts")
+        self._artifact_dir = Path(artifact_dir)
         self._conn = sqlite3.connect(
             db_path,
             detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
@@ -66,6 +117,10 @@ class SqliteResultStore(ResultStoreInterface):
         self._conn.executescript(SCHEMA_SQL)
         self._conn.commit()
         self._migrate()
+        # 接続はスレッド間で共有され、その上のトランザクションは1つ
+        # だけなので、書き込みはすべてこのロックで直列化する（モデル定義
+        # version の比較と結果の書き込みもこれで不可分になる）
+        self._write_lock = threading.Lock()
 
     def _migrate(self) -> None:
         """既存DBのスキーマをマイグレーションする。"""
@@ -114,8 +169,28 @@ class SqliteResultStore(ResultStoreInterface):
             )
             self._conn.commit()
 
+        # v4→v5: model_definitions に version 列追加
+        if "version" not in md_cols:
+            self._conn.execute(
+                "ALTER TABLE model_definitions"
+                " ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+            )
+            self._conn.commit()
+
+        # v5→v6: anomaly_results に raw_score 列追加
+        ar_cols = [
+            row[1]
+            for row in self._conn.execute("PRAGMA table_info(anomaly_results)")
+        ]
+        if "raw_score" not in ar_cols:
+            self._conn.execute(
+                "ALTER TABLE anomaly_results"
+                " ADD COLUMN raw_score REAL DEFAULT NULL"
+            )
+            self._conn.commit()
+
     def save_trend_result(self, result: TrendResult) -> None:
-        with self._conn:
+        with self._write_lock, self._conn:
             self._conn.execute(
                 """
                 INSERT INTO trend_results
@@ -146,36 +221,57 @@ class SqliteResultStore(ResultStoreInterface):
             intercept=row[2],
         )
 
-    def save_anomaly_results(self, results: list[AnomalyResult]) -> None:
-        with self._conn:
+    def save_anomaly_results(
+        self,
+        results: list[AnomalyResult],
+        model_version: int | None = None,
+    ) -> bool:
+        with self._write_lock, self._conn:
+            if model_version is not None and results:
+                # 別プロセス（API と定期実行）の定義更新が比較と書き込みの
+                # 間に入らないよう、比較の前に書き込みロックを取る
+                self._conn.execute("BEGIN IMMEDIATE")
+                current = self._select_model_version(results[0].category_id)
+                if current != model_version:
+                    return False
             self._conn.executemany(
                 """
                 INSERT INTO anomaly_results
-                    (category_id, recorded_at, anomaly_score)
-                VALUES (?, ?, ?)
+                    (category_id, recorded_at, anomaly_score, raw_score)
+                VALUES (?, ?, ?, ?)
                 ON CONFLICT(category_id, recorded_at)
-                DO UPDATE SET anomaly_score = excluded.anomaly_score
+                DO UPDATE SET anomaly_score = excluded.anomaly_score,
+                              raw_score = excluded.raw_score
                 """,
                 [
-                    (r.category_id, r.recorded_at, r.anomaly_score)
+                    (
+                        r.category_id,
+                        r.recorded_at,
+                        r.anomaly_score,
+                        r.raw_score,
+                    )
                     for r in results
                 ],
             )
+        return True
 
     def get_anomaly_results(self, category_id: int) -> list[AnomalyResult]:
         rows = self._conn.execute(
-            "SELECT category_id, recorded_at, anomaly_score"
+            "SELECT category_id, recorded_at, anomaly_score, raw_score"
             " FROM anomaly_results WHERE category_id = ?",
             (category_id,),
         ).fetchall()
         return [
             AnomalyResult(
-                category_id=r[0], recorded_at=r[1], anomaly_score=r[2]
+                category_id=r[0],
+                recorded_at=r[1],
+                anomaly_score=r[2],
+                raw_score=r[3],
             )
             for r in rows
         ]
 
-    def save_model_definition(self, definition: ModelDefinition) -> None:
+    def save_model_definition(self, definition: ModelDefinition) -> int:
         excluded_json = json.dumps(
             [
                 dt.replace(tzinfo=None).isoformat()
@@ -198,21 +294,29 @@ class SqliteResultStore(ResultStoreInterface):
             if definition.anomaly_params is not None
             else None
         )
-        with self._conn:
+        with self._write_lock, self._conn:
+            self._conn.execute(
+                "UPDATE model_version_counter SET value = value + 1"
+                " WHERE id = 1"
+            )
+            (version,) = self._conn.execute(
+                "SELECT value FROM model_version_counter WHERE id = 1"
+            ).fetchone()
             self._conn.execute(
                 """
                 INSERT INTO model_definitions
                     (category_id, baseline_start, baseline_end,
                      sensitivity, excluded_points, feature_config,
-                     anomaly_params)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                     anomaly_params, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(category_id)
                 DO UPDATE SET baseline_start = excluded.baseline_start,
                               baseline_end = excluded.baseline_end,
                               sensitivity = excluded.sensitivity,
                               excluded_points = excluded.excluded_points,
                               feature_config = excluded.feature_config,
-                              anomaly_params = excluded.anomaly_params
+                              anomaly_params = excluded.anomaly_params,
+                              version = excluded.version
                 """,
                 (
                     definition.category_id,
@@ -222,14 +326,16 @@ class SqliteResultStore(ResultStoreInterface):
                     excluded_json,
                     feature_config_json,
                     anomaly_params_json,
+                    version,
                 ),
             )
+        return version
 
     def get_model_definition(self, category_id: int) -> ModelDefinition | None:
         row = self._conn.execute(
             "SELECT category_id, baseline_start,"
             " baseline_end, sensitivity, excluded_points,"
-            " feature_config, anomaly_params"
+            " feature_config, anomaly_params, version"
             " FROM model_definitions WHERE category_id = ?",
             (category_id,),
         ).fetchone()
@@ -254,24 +360,157 @@ class SqliteResultStore(ResultStoreInterface):
             excluded_points=excluded,
             feature_config=feature_config,
             anomaly_params=anomaly_params,
+            version=row[7],
         )
 
+    def get_model_version(self, category_id: int) -> int | None:
+        return self._select_model_version(category_id)
+
+    def _select_model_version(self, category_id: int) -> int | None:
+        row = self._conn.execute(
+            "SELECT version FROM model_definitions WHERE category_id = ?",
+            (category_id,),
+        ).fetchone()
+        return None if row is None else row[0]
+
     def delete_model_definition(self, category_id: int) -> None:
-        with self._conn:
+        with self._write_lock, self._conn:
             self._conn.execute(
                 "DELETE FROM model_definitions WHERE category_id = ?",
                 (category_id,),
             )
+        self.delete_model_artifact(category_id)
+
+    @contextmanager
+    def _artifact_lock(self, category_id: int) -> Iterator[None]:
+        """カテゴリの成果物ディレクトリを排他する.
+
+        API と定期実行は別プロセスで同じ artifact_dir に書き込むため、
+        プロセス内のロックでは足りない。ロックファイルへの flock は
+        スレッド間（別々に開いたファイル）でも排他になる。
+        ロックファイルはカテゴリのディレクトリの外に置き、削除しない。
+        """
+        self._artifact_dir.mkdir(parents=True, exist_ok=True)
+        path = self._artifact_dir / f"{category_id}.lock"
+        with open(path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def save_model_artifact(self, artifact: ModelArtifact) -> None:
+        category_dir = self._artifact_dir / str(artifact.category_id)
+        target = category_dir / artifact.definition_hash
+        with self._artifact_lock(artifact.category_id):
+            if not target.exists():
+                # 書きかけのディレクトリを読まれないよう、一時名で
+                # 書き終えてから rename する
+                category_dir.mkdir(parents=True, exist_ok=True)
+                staging = Path(
+                    tempfile.mkdtemp(prefix=_STAGING_PREFIX, dir=category_dir)
+                )
+                for name, array in artifact.arrays.items():
+                    np.save(staging / f"{name}.npy", np.asarray(array))
+                try:
+                    staging.rename(target)
+                except OSError:
+                    # 同じハッシュは同じ内容なので、先に書かれていれば成功
+                    shutil.rmtree(staging, ignore_errors=True)
+                    if not target.exists():
+                        raise
+            with self._write_lock, self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO model_artifacts
+                        (category_id, definition_hash, meta, array_names)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(category_id)
+                    DO UPDATE SET definition_hash = excluded.definition_hash,
+                                  meta = excluded.meta,
+                                  array_names = excluded.array_names
+                    """,
+                    (
+                        artifact.category_id,
+                        artifact.definition_hash,
+                        json.dumps(artifact.meta),
+                        json.dumps(sorted(artifact.arrays)),
+                    ),
+                )
+            # 古いハッシュのディレクトリだけを消す（書きかけは残す）。
+            # 読み込み済みのメモリマップは削除後も有効なまま残る
+            for old in category_dir.iterdir():
+                if old != target and not old.name.startswith(_STAGING_PREFIX):
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def get_model_artifact(self, category_id: int) -> ModelArtifact | None:
+        row = self._conn.execute(
+            "SELECT definition_hash, meta, array_names"
+            " FROM model_artifacts WHERE category_id = ?",
+            (category_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        directory = self._artifact_dir / str(category_id) / row[0]
+        try:
+            arrays = {
+                name: np.load(directory / f"{name}.npy", mmap_mode="r")
+                for name in json.loads(row[2])
+            }
+        except FileNotFoundError:
+            # ファイルが失われていれば未保存扱い（再学習される）
+            return None
+        return ModelArtifact(
+            category_id=category_id,
+            definition_hash=row[0],
+            arrays=arrays,
+            meta=json.loads(row[1]),
+        )
+
+    def delete_model_artifact(self, category_id: int) -> None:
+        with self._artifact_lock(category_id):
+            with self._write_lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM model_artifacts WHERE category_id = ?",
+                    (category_id,),
+                )
+            shutil.rmtree(
+                self._artifact_dir / str(category_id), ignore_errors=True
+            )
 
     def delete_anomaly_results(self, category_id: int) -> None:
-        with self._conn:
+        with self._write_lock, self._conn:
             self._conn.execute(
                 "DELETE FROM anomaly_results WHERE category_id = ?",
                 (category_id,),
             )
 
+    def save_analyzed_version(
+        self, category_id: int, data_version: int
+    ) -> None:
+        with self._write_lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO analyzed_versions (category_id, data_version)
+                VALUES (?, ?)
+                ON CONFLICT(category_id)
+                DO UPDATE SET data_version = excluded.data_version
+                """,
+                (category_id, data_version),
+            )
+
+    def get_analyzed_versions(self) -> dict[int, int]:
+        rows = self._conn.execute(
+            "SELECT category_id, data_version FROM analyzed_versions"
+        ).fetchall()
+        return dict(rows)
+
     def delete_all_data(self) -> None:
-        with self._conn:
+        with self._write_lock, self._conn:
             self._conn.execute("DELETE FROM anomaly_results")
             self._conn.execute("DELETE FROM trend_results")
             self._conn.execute("DELETE FROM model_definitions")
+            self._conn.execute("DELETE FROM analyzed_versions")
+            self._conn.execute("DELETE FROM model_artifacts")
+        if self._artifact_dir.exists():
+            for category_dir in self._artifact_dir.iterdir():
+                # ロックファイルは他のプロセスが保持しうるため残す
+                if category_dir.is_dir():
+                    shutil.rmtree(category_dir, ignore_errors=True)
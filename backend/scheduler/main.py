@@ -0,0 +1,94 @@
+"""定期分析スケジューラのエントリポイント。
+
+supervisord から `python -m backend.scheduler.main` として起動される。
+設定はコマンドライン引数または環境変数で与える。
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from backend.dependencies import (
+    get_analysis_engine,
+    get_change_batcher,
+    get_data_store,
+    get_forest_trainer,
+    get_result_store,
+    publish_results_updated,
+)
+from backend.scheduler.periodic import IncrementalScheduler, process_cpu_time
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="変更のあったカテゴリを定期的に再分析する"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=float(os.environ.get("SCHEDULER_INTERVAL_SEC", "300")),
+        help="tick の周期（秒）",
+    )
+    parser.add_argument(
+        "--cpu-share",
+        type=float,
+        default=float(os.environ.get("SCHEDULER_CPU_SHARE", "0.5")),
+        help="使用してよい CPU 時間の割合 (0〜1]",
+    )
+    parser.add_argument(
+        "--nice",
+        type=int,
+        default=int(os.environ.get("SCHEDULER_NICE", "10")),
+        help="プロセスの nice 値の増分（API より低優先度で動かす）",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="1回だけ tick して終了する"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """スケジューラを起動する."""
+    args = _parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    if args.nice > 0:
+        os.nice(args.nice)
+
+    trainer = get_forest_trainer()
+    scheduler = IncrementalScheduler(
+        get_analysis_engine(),
+        get_data_store(),
+        get_result_store(),
+        cpu_share=args.cpu_share,
+        # 学習用のワーカープロセスが使った CPU 時間も上限に含める
+        cpu_clock=(
+            process_cpu_time
+            if trainer is None
+            else lambda: process_cpu_time() + trainer.cpu_time
+        ),
+        # 共有イベントログ経由で API ワーカーの SSE 購読者へ通知する
+        on_analyzed=lambda ids: publish_results_updated(
+            get_change_batcher(), get_result_store(), ids
+        ),
+    )
+    try:
+        if args.once:
+            scheduler.tick()
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        scheduler.serve(args.interval, stop)
+    finally:
+        # 集約待ちのイベントを取りこぼさない
+        get_change_batcher().close()
+
+
+if __name__ == "__main__":
+    main()
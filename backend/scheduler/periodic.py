@@ -0,0 +1,111 @@
+"""増分再分析スケジューラ.
+
+前回の分析以降にデータが変化したカテゴリのみを再分析する。
+データバージョン（DataStore）と分析済みバージョン（ResultStore）の
+差分で対象を決めるため、ウォーターマークは結果ストアに永続化され、
+再起動しても全件再計算は発生しない。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+
+from backend.analysis.engine import AnalysisEngine
+from backend.interfaces.data_store import DataStoreInterface
+from backend.interfaces.result_store import ResultStoreInterface
+
+logger = logging.getLogger(__name__)
+
+
+def process_cpu_time() -> float:
+    """プロセス全体（全スレッドと終了した子プロセス）の CPU 時間（秒）.
+
+    分析は IsolationForest の n_jobs スレッドでも CPU を使うため、
+    呼び出しスレッドだけの thread_time() では使用率を過小評価する。
+    """
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+class IncrementalScheduler:
+    """変更のあったカテゴリを定期的に再分析するスケジューラ.
+
+    cpu_share で CPU 使用率の上限を指定する。各カテゴリの分析に
+    要した CPU 時間に比例した休止を挟むことで、1 CPU 制限の Pod でも
+    API プロセスを飢餓状態にしない（例: 0.5 → 分析と同じ時間だけ休む）。
+
+    Args:
+        engine: 分析エンジン
+        data_store: データバージョンの取得元
+        result_store: 分析済みバージョンの取得元
+        cpu_share: スケジューラが使ってよい CPU 時間の割合 (0〜1]
+        sleep: 休止関数（テスト用に差し替え可能）
+        cpu_clock: CPU 時間の計測関数。既定はプロセス全体の CPU 時間
+            （稼働中のワーカープロセス分を加える場合やテスト用に差し替える）
+        on_analyzed: 1巡で分析に成功したカテゴリIDを受け取るコールバック
+            （変更イベントの publish 用）
+    """
+
+    def __init__(
+        self,
+        engine: AnalysisEngine,
+        data_store: DataStoreInterface,
+        result_store: ResultStoreInterface,
+        cpu_share: float = 0.5,
+        sleep: Callable[[float], None] = time.sleep,
+        cpu_clock: Callable[[], float] = process_cpu_time,
+        on_analyzed: Callable[[list[int]], None] | None = None,
+    ) -> None:
+        if not 0 < cpu_share <= 1:
+            raise ValueError("cpu_share must be in (0, 1]")
+        self._engine = engine
+        self._data_store = data_store
+        self._result_store = result_store
+        self._cpu_share = cpu_share
+        self._sleep = sleep
+        self._cpu_clock = cpu_clock
+        self._on_analyzed = on_analyzed
+
+    def pending_category_ids(self) -> list[int]:
+        """前回の分析以降にデータが変化したカテゴリIDを返す."""
+        versions = self._data_store.get_data_versions()
+        analyzed = self._result_store.get_analyzed_versions()
+        return sorted(
+            cid
+            for cid, version in versions.items()
+            if analyzed.get(cid) != version
+        )
+
+    def tick(self) -> list[int]:
+        """変化したカテゴリを1巡分析する.
+
+        Returns:
+            分析を試みたカテゴリIDのリスト。
+        """
+        pending = self.pending_category_ids()
+        analyzed: list[int] = []
+        for category_id in pending:
+            started = self._cpu_clock()
+            try:
+                self._engine.run(category_id)
+                analyzed.append(category_id)
+            except Exception:
+                # ウォーターマークは更新されないため次回再試行される
+                logger.exception("scheduled analysis failed: %s", category_id)
+            used = self._cpu_clock() - started
+            if self._cpu_share < 1.0 and used > 0:
+                self._sleep(used * (1.0 - self._cpu_share) / self._cpu_share)
+        if analyzed and self._on_analyzed is not None:
+            self._on_analyzed(analyzed)
+        return pending
+
+    def serve(self, interval: float, stop: threading.Event) -> None:
+        """stop がセットされるまで interval 秒周期で tick() を繰り返す."""
+        while not stop.is_set():
+            started = time.monotonic()
+            processed = self.tick()
+            if processed:
+                logger.info("reanalyzed %d categories", len(processed))
+            stop.wait(max(0.0, started + interval - time.monotonic()))
@@ -0,0 +1,84 @@
+"""変更イベントログの SQLite 実装。
+
+同一ホスト上の複数プロセスが同じ DB ファイルを開いて共有する。
+WAL モードにより、追記中でも他プロセスのポーリング（読み取り）は
+ブロックされない。
+"""
+
+import json
+import sqlite3
+import threading
+
+from backend.interfaces.event_log import EventLogInterface, LoggedEvent
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS events (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    event      TEXT NOT NULL,
+    data       TEXT DEFAULT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+PRUNE_EVERY = 1000
+"""この件数の追記ごとに保持上限を超えた古いイベントを削除する。"""
+
+
+class SqliteEventLog(EventLogInterface):
+    """SQLite による変更イベントログ実装。
+
+    Args:
+        db_path: DB ファイルパス（共有するプロセス間で同一にする）
+        retention: 保持するイベント件数の上限
+    """
+
+    def __init__(self, db_path: str, retention: int = 10000):
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, timeout=5.0
+        )
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA_SQL)
+        self._conn.commit()
+        self._retention = retention
+        self._appended = 0
+        # ポーリングスレッドと publish 元スレッドで接続を共有する
+        self._lock = threading.Lock()
+
+    def append(self, event: str, data: dict | None = None) -> int:
+        payload = None if data is None else json.dumps(data)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO events (event, data) VALUES (?, ?)",
+                (event, payload),
+            )
+            event_id = cursor.lastrowid
+            self._appended += 1
+            if self._appended % PRUNE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM events WHERE id <= ?",
+                    (event_id - self._retention,),
+                )
+        return event_id
+
+    def read_since(
+        self, after_id: int, limit: int = 1000
+    ) -> list[LoggedEvent]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event, data FROM events"
+                " WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+        return [
+            LoggedEvent(
+                id=row[0],
+                event=row[1],
+                data=None if row[2] is None else json.loads(row[2]),
+            )
+            for row in rows
+        ]
+
+    def latest_id(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM events").fetchone()
+        return row[0] or 0
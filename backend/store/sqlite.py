@@ -1,6 +1,7 @@
 """Store層のSQLite実装。"""
 
 import sqlite3
+import threading
 from datetime import datetime
 
 from backend.interfaces.data_store import (
@@ -27,6 +28,18 @@ CREATE TABLE IF NOT EXISTS work_records (
 
 CREATE INDEX IF NOT EXISTS idx_work_records_category_time
     ON work_records(category_id, recorded_at);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    category_id INTEGER PRIMARY KEY,
+    version     INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS version_counter (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO version_counter (id, value) VALUES (1, 0);
 """
 
 # datetime adapter/converter をモジュールレベルで一度だけ登録
@@ -52,9 +65,36 @@ class SqliteDataStore(DataStoreInterface):
         self._conn.execute("PRAGMA foreign_keys = ON")
         self._conn.executescript(SCHEMA_SQL)
         self._conn.commit()
+        self._migrate()
+        # 接続は AsyncDataStore の DB スレッドと分析ワーカーで共有される。
+        # 1本の接続上のトランザクションは1つなので、書き込みは直列化する
+        # （他スレッドのコミット・ロールバックに巻き込まれないように）
+        self._write_lock = threading.Lock()
+
+    def _migrate(self) -> None:
+        """既存DBのスキーマをマイグレーションする。"""
+        # v1→v2: data_versions 導入前の記録にバージョンを採番
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO data_versions (category_id, version)
+                SELECT DISTINCT category_id,
+                       (SELECT value + 1 FROM version_counter)
+                FROM work_records
+                WHERE category_id NOT IN
+                    (SELECT category_id FROM data_versions)
+                """
+            )
+            self._conn.execute(
+                "UPDATE version_counter"
+                " SET value = (SELECT MAX(value, COALESCE(MAX(version), 0))"
+                " FROM data_versions)"
+            )
 
     def upsert_records(self, records: list[WorkRecord]) -> int:
-        with self._conn:
+        if not records:
+            return 0
+        with self._write_lock, self._conn:
             self._conn.executemany(
                 """
                 INSERT INTO work_records (category_id, work_time, recorded_at)
@@ -64,13 +104,28 @@ class SqliteDataStore(DataStoreInterface):
                 """,
                 [(r.category_id, r.work_time, r.recorded_at) for r in records],
             )
+            self._bump_versions({r.category_id for r in records})
         return len(records)
 
+    def _bump_versions(self, category_ids: set[int]) -> None:
+        """書き込んだカテゴリに新しいデータバージョンを振る（要トランザクション）。"""
+        self._conn.execute("UPDATE version_counter SET value = value + 1")
+        (version,) = self._conn.execute(
+            "SELECT value FROM version_counter"
+        ).fetchone()
+        self._conn.executemany(
+            """
+            INSERT INTO data_versions (category_id, version) VALUES (?, ?)
+            ON CONFLICT(category_id) DO UPDATE SET version = excluded.version
+            """,
+            [(cid, version) for cid in sorted(category_ids)],
+        )
+
     def ensure_category_path(self, path: list[str]) -> int:
         if not path:
             raise ValueError("path must not be empty")
         parent_id = None
-        with self._conn:
+        with self._write_lock, self._conn:
             for name in path:
                 row = self._conn.execute(
                     "SELECT id FROM categories"
@@ -156,7 +211,22 @@ class SqliteDataStore(DataStoreInterface):
             return [build_node(root_id)] if root_id in node_data else []
         return [build_node(nid) for nid in children_map.get(None, [])]
 
+    def get_data_versions(
+        self, category_ids: list[int] | None = None
+    ) -> dict[int, int]:
+        query = "SELECT category_id, version FROM data_versions"
+        params: list = []
+        if category_ids is not None:
+            if not category_ids:
+                return {}
+            placeholders = ", ".join("?" for _ in category_ids)
+            query += f" WHERE category_id IN ({placeholders})"
+            params = list(category_ids)
+        return dict(self._conn.execute(query, params).fetchall())
+
     def delete_all_data(self) -> None:
-        with self._conn:
+        # version_counter は残し、削除後もバージョンを巻き戻さない
+        with self._write_lock, self._conn:
             self._conn.execute("DELETE FROM work_records")
+            self._conn.execute("DELETE FROM data_versions")
             self._conn.execute("DELETE FROM categories")
@@ -0,0 +1,87 @@
+"""IsolationForest スコアリングのレイテンシ計測.
+
+scikit-learn の decision_function とフラット配列スコアラ
+（ForestArtifact）を 1 / 100 / 1,000,000 点で比較する。
+取り込み時の数点追記は呼び出しごとの固定費、全履歴の再スコアは
+スループットで律速される。
+
+1 コア・jobs=1・baseline=1000（100 木）での計測例（ミリ秒、最短値）:
+
+    features  points     sklearn     flat   speedup
+           1       1       7.04     0.076     92.8x
+           1     100      13.0      0.609     21.4x
+           1     1M     7340      4945         1.5x
+           4       1       7.34     0.061    120.2x
+           4     100       8.19     0.815     10.0x
+           4     1M     6264     10548         0.6x
+
+フラット配列スコアラの効果は呼び出しごとの固定費（入力検証・
+ディスパッチ）の削減で、数点の追記採点では 1〜2 桁速い。全履歴の
+再スコアでは差がほぼなく、特徴量が多いと scikit-learn の方が速い。
+大量の再スコアを速くするものではない。
+
+使い方（リポジトリのルートで）:
+    python -m benchmarks.bench_forest_scoring [--features 1] [--jobs 1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from backend.analysis.anomaly import fit_forest, forest_params
+
+SIZES = (1, 100, 1_000_000)
+
+
+def _best_of(func, x: np.ndarray, repeat: int) -> float:
+    """repeat 回実行した最短時間（ミリ秒）を返す."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(x)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--features", type=int, default=1)
+    parser.add_argument("--baseline", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    baseline = rng.normal(size=(args.baseline, args.features))
+    params = forest_params()
+    model = IsolationForest(
+        n_estimators=params["n_estimators"],
+        max_samples=params["max_samples"],
+        contamination=params["contamination"],
+        n_jobs=args.jobs,
+        random_state=42,
+    ).fit(baseline)
+    forest = fit_forest(baseline, params)
+
+    print(
+        f"features={args.features} trees={len(forest.roots)}"
+        f" nodes={len(forest.threshold)} jobs={args.jobs}"
+    )
+    print(f"{'points':>10} {'sklearn ms':>12} {'flat ms':>10} {'speedup':>8}")
+    for n in SIZES:
+        x = rng.normal(size=(n, args.features))
+        repeat = 3 if n >= 100_000 else 50
+        np.testing.assert_allclose(
+            forest.decision_function(x[:10_000]),
+            model.decision_function(x[:10_000]),
+        )
+        sk = _best_of(model.decision_function, x, repeat)
+        flat = _best_of(
+            lambda v: forest.decision_function(v, args.jobs), x, repeat
+        )
+        print(f"{n:>10} {sk:>12.3f} {flat:>10.3f} {sk / flat:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
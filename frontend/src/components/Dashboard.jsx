@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useCallback, useMemo, useRef } from 'react';
 import { Table, Tag, Button, Space, Modal, Typography, Alert, message } from 'antd';
 import { DeleteOutlined, ThunderboltOutlined, LineChartOutlined } from '@ant-design/icons';
-import { fetchDashboardSummary, fetchResults, fetchBaselineConfig, deleteBaselineConfig, triggerAnalysis } from '../services/api';
+import { fetchDashboardSummary, fetchResults, fetchBaselineConfig, deleteBaselineConfig, triggerAnalysis, waitForJob } from '../services/api';
 
 const { Title } = Typography;
 
@@ -56,35 +56,17 @@ function Dashboard({ active, categories, onNavigateToPlot }) {
     }
   }, [active, categories, loadDashboardData, dashboardData.length]);
 
-  // SSE 接続: バックエンドのデータ変更を監視
-  useEffect(() => {
-    const es = new EventSource('/api/events');
-    let debounceTimer = null;
-
-    const handleUpdate = () => {
-      if (active) {
-        clearTimeout(debounceTimer);
-        debounceTimer = setTimeout(() => loadDashboardData(), SSE_DEBOUNCE_MS);
-      } else {
-        staleRef.current = true;
-      }
-    };
-
-    es.addEventListener('dashboard-updated', handleUpdate);
-
-    return () => {
-      clearTimeout(debounceTimer);
-      es.removeEventListener('dashboard-updated', handleUpdate);
-      es.close();
-    };
-  }, [active, loadDashboardData]);
-
   const handleRunAnalysis = async () => {
     setAnalysisRunning(true);
     try {
       const result = await triggerAnalysis();
-      message.success(`分析完了: ${result.processed_categories} カテゴリ処理しました`);
-      // SSE 経由で dashboard-updated が届くが、分析実行ボタンの
+      const job = await waitForJob(result.job_id);
+      if (job.state === 'failed') {
+        message.error(`分析実行エラー: ${job.error}`);
+      } else {
+        message.success(`分析完了: ${result.processed_categories} カテゴリ処理しました`);
+      }
+      // SSE 経由で results-updated が届くが、分析実行ボタンの
       // ローディング表示と同期するため明示的にも取得する
       await loadDashboardData();
     } catch (err) {
@@ -117,6 +99,62 @@ function Dashboard({ active, categories, onNavigateToPlot }) {
     );
   }, []);
 
+  // SSE 接続: バックエンドの変更イベントを監視
+  // categories-changed / data-cleared は一覧の行構成が変わるため、resync は
+  // 再接続時に取りこぼしを再送できなかったため、いずれも全件再取得する。
+  // results-updated / model-changed は該当行のみ更新する。
+  // records-appended はダッシュボードの表示項目に影響しないため購読しない。
+  useEffect(() => {
+    const es = new EventSource('/api/events');
+    let debounceTimer = null;
+    const pendingIds = new Set();
+
+    const scheduleFlush = () => {
+      clearTimeout(debounceTimer);
+      debounceTimer = setTimeout(() => {
+        const ids = [...pendingIds];
+        pendingIds.clear();
+        ids.forEach((id) => updateSingleRow(id));
+      }, SSE_DEBOUNCE_MS);
+    };
+
+    const handleFullReload = () => {
+      if (active) {
+        clearTimeout(debounceTimer);
+        pendingIds.clear();
+        debounceTimer = setTimeout(() => loadDashboardData(), SSE_DEBOUNCE_MS);
+      } else {
+        staleRef.current = true;
+      }
+    };
+
+    const handleRowsChanged = (e) => {
+      if (!active) {
+        staleRef.current = true;
+        return;
+      }
+      const { category_ids: ids = [] } = JSON.parse(e.data || '{}');
+      ids.forEach((id) => pendingIds.add(id));
+      scheduleFlush();
+    };
+
+    es.addEventListener('categories-changed', handleFullReload);
+    es.addEventListener('data-cleared', handleFullReload);
+    es.addEventListener('resync', handleFullReload);
+    es.addEventListener('results-updated', handleRowsChanged);
+    es.addEventListener('model-changed', handleRowsChanged);
+
+    return () => {
+      clearTimeout(debounceTimer);
+      es.removeEventListener('categories-changed', handleFullReload);
+      es.removeEventListener('data-cleared', handleFullReload);
+      es.removeEventListener('resync', handleFullReload);
+      es.removeEventListener('results-updated', handleRowsChanged);
+      es.removeEventListener('model-changed', handleRowsChanged);
+      es.close();
+    };
+  }, [active, loadDashboardData, updateSingleRow]);
+
   const handleDeleteBaseline = useCallback(
     (categoryId) => {
       Modal.confirm({
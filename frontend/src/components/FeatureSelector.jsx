@@ -1,11 +1,12 @@
 import React, { useCallback, useMemo } from 'react';
-import { Checkbox, InputNumber, Space, Typography } from 'antd';
+import { Checkbox, Input, InputNumber, Space, Typography } from 'antd';
 
 const { Text } = Typography;
 
 const STYLE_DESCRIPTION = { fontSize: 11, display: 'block', marginLeft: 22 };
 const STYLE_PARAM = { marginLeft: 22, marginTop: 2 };
 const STYLE_SECTION_TITLE = { fontSize: 13 };
+const STYLE_TEXT_PARAM = { width: 80 };
 
 /**
  * 特徴量選択コンポーネント。
@@ -109,17 +110,43 @@ function FeatureSelector({
                   {Object.entries(feat.params_schema).map(([key, schema]) => (
                     <Space key={key} size="small">
                       <Text type="secondary">{key}:</Text>
-                      <InputNumber
-                        min={schema.min}
-                        value={
-                          configMap[feat.feature_type]?.[key] ?? schema.default
-                        }
-                        onChange={(v) =>
-                          handleParamChange(feat.feature_type, key, v)
-                        }
-                        disabled={disabled}
-                        size="small"
-                      />
+                      {schema.type === 'string' ? (
+                        // 期間指定（例: 24h, 7d）などの文字列パラメータ
+                        <Input
+                          value={
+                            configMap[feat.feature_type]?.[key] ?? schema.default
+                          }
+                          onChange={(e) =>
+                            handleParamChange(feat.feature_type, key, e.target.value)
+                          }
+                          status={
+                            schema.pattern &&
+                            !new RegExp(schema.pattern).test(
+                              configMap[feat.feature_type]?.[key] ?? schema.default,
+                            )
+                              ? 'error'
+                              : undefined
+                          }
+                          disabled={disabled}
+                          size="small"
+                          style={STYLE_TEXT_PARAM}
+                        />
+                      ) : (
+                        <InputNumber
+                          min={schema.min}
+                          max={schema.max}
+                          step={schema.type === 'number' ? 0.05 : 1}
+                          precision={schema.type === 'integer' ? 0 : undefined}
+                          value={
+                            configMap[feat.feature_type]?.[key] ?? schema.default
+                          }
+                          onChange={(v) =>
+                            handleParamChange(feat.feature_type, key, v)
+                          }
+                          disabled={disabled}
+                          size="small"
+                        />
+                      )}
                     </Space>
                   ))}
                 </div>
@@ -5,6 +5,7 @@ import {
   fetchBaselineConfig,
   saveBaselineConfig,
   deleteBaselineConfig,
+  waitForJob,
 } from '../services/api';
 
 const INITIAL_SENSITIVITY = 0.5;
@@ -233,13 +234,21 @@ export function useBaselineManager(categoryId) {
       const excludedPoints = state.excludedIndices.map(
         (i) => state.records[i].recorded_at,
       );
-      await saveBaselineConfig(categoryId, {
+      const { job_id: jobId } = await saveBaselineConfig(categoryId, {
         baseline_start: state.baselineRange.start,
         baseline_end: state.baselineRange.end,
         sensitivity: state.sensitivity,
         excluded_points: excludedPoints,
         feature_config: state.featureConfig,
       });
+      const job = await waitForJob(jobId);
+      if (job.state === 'failed') {
+        dispatch({
+          type: A.SAVE_ERROR,
+          error: `設定は保存しましたが分析に失敗しました: ${job.error}`,
+        });
+        return;
+      }
       const results = await fetchResults(categoryId);
       dispatch({
         type: A.SAVE_SUCCESS,
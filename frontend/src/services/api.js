@@ -106,7 +106,8 @@ export async function fetchBaselineConfig(categoryId) {
  * @param {string} config.baseline_end
  * @param {number} config.sensitivity
  * @param {string[]} [config.excluded_points]
- * @returns {Promise<{retrained: boolean}>}
+ * @param {Object|null} [config.anomaly_params] - 検知器の指定（例: {detector: 'ewma', alpha: 0.1}）。省略時は既存の設定を維持、null で IsolationForest に戻す。ストリーミング検知器はベースライン期間を使わず系列の先頭から学習する
+ * @returns {Promise<{retrained: boolean, job_id: string, model_version: number}>}
  */
 export async function saveBaselineConfig(categoryId, config) {
   const { data } = await client.put(`/models/${categoryId}`, config);
@@ -134,13 +135,98 @@ export async function fetchDashboardSummary() {
 
 /**
  * POST /api/analysis/run
- * @returns {Promise<{processed_categories: number}>}
+ * @returns {Promise<{processed_categories: number, job_id: string}>}
  */
 export async function triggerAnalysis() {
   const { data } = await client.post('/analysis/run');
   return data;
 }
 
+/**
+ * @typedef {Object} AnalysisJob
+ * @property {string} job_id
+ * @property {string} lane - "interactive" | "ingest" | "bulk"
+ * @property {string} state - "queued" | "running" | "succeeded" | "failed"
+ * @property {number[]} category_ids
+ * @property {number} completed
+ * @property {number} progress - 0〜1
+ * @property {string|null} error
+ * @property {number[]} failed_category_ids - 分析に失敗したカテゴリ
+ */
+
+/**
+ * GET /api/jobs/{job_id}
+ * @param {string} jobId
+ * @returns {Promise<AnalysisJob>}
+ */
+export async function fetchJob(jobId) {
+  const { data } = await client.get(`/jobs/${jobId}`);
+  return data;
+}
+
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_WAIT_TIMEOUT_MS = 5 * 60 * 1000;
+
+/**
+ * 分析ジョブが終了（succeeded / failed）するまで待つ
+ *
+ * SSE の analysis-completed を受けた時点で状態を取り直し、イベントを
+ * 取りこぼした場合に備えて間隔を空けたポーリングも併用する。
+ * ジョブが見つからない（404: 履歴から削除された等）場合と、
+ * timeoutMs を過ぎても終わらない場合は reject する。
+ * @param {string} jobId
+ * @param {Object} [options]
+ * @param {number} [options.timeoutMs] - 待機の上限（ミリ秒）
+ * @returns {Promise<AnalysisJob>}
+ */
+export function waitForJob(jobId, { timeoutMs = JOB_WAIT_TIMEOUT_MS } = {}) {
+  return new Promise((resolve, reject) => {
+    const deadline = Date.now() + timeoutMs;
+    const es = new EventSource('/api/events');
+    let timer = null;
+    let settled = false;
+
+    const settle = (fn, value) => {
+      if (settled) return;
+      settled = true;
+      clearTimeout(timer);
+      es.close();
+      fn(value);
+    };
+
+    const check = async () => {
+      clearTimeout(timer);
+      try {
+        const job = await fetchJob(jobId);
+        if (job.state === 'succeeded' || job.state === 'failed') {
+          settle(resolve, job);
+          return;
+        }
+      } catch (err) {
+        if (err.response && err.response.status === 404) {
+          settle(reject, new Error(`ジョブが見つかりません: ${jobId}`));
+        } else {
+          settle(reject, err);
+        }
+        return;
+      }
+      if (settled) return;
+      const remaining = deadline - Date.now();
+      if (remaining <= 0) {
+        settle(reject, new Error(`ジョブの完了待ちがタイムアウトしました: ${jobId}`));
+        return;
+      }
+      timer = setTimeout(check, Math.min(JOB_POLL_INTERVAL_MS, remaining));
+    };
+
+    es.addEventListener('analysis-completed', (e) => {
+      const { job_id: completedId } = JSON.parse(e.data || '{}');
+      if (completedId === jobId) check();
+    });
+    check();
+  });
+}
+
 /**
  * GET /api/features/registry
  * @returns {Promise<Array<{feature_type: string, label: string, description: string, params_schema: Object}>>}
@@ -153,7 +239,7 @@ export async function fetchFeatureRegistry() {
 /**
  * POST /api/records/csv
  * @param {File} file - CSVファイル
- * @returns {Promise<{inserted: number, skipped: number}>}
+ * @returns {Promise<{inserted: number, skipped: number, job_id: string}>}
  */
 export async function uploadCsv(file) {
   const form = new FormData();
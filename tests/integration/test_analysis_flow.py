@@ -1,17 +1,33 @@
 """統合テスト — データ投入→分析自動実行→結果取得の一連フロー."""
 
 import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
 
 from backend.analysis.engine import AnalysisEngine
+from backend.analysis.feature_cache import FeatureCache
+from backend.analysis.jobs import AnalysisJobQueue
 from backend.dependencies import (
     _reset_all,
     get_analysis_engine,
+    get_change_batcher,
     get_data_store,
     get_event_bus,
+    get_feature_cache,
+    get_job_queue,
     get_result_store,
+    publish_job_completed,
+    watch_data_changes,
+)
+from backend.ingestion.change_events import (
+    DATA_CLEARED,
+    RECORDS_APPENDED,
+    ChangeBatcher,
 )
 from backend.ingestion.event_bus import EventBus
 from backend.ingestion.main import app
@@ -24,13 +40,30 @@ def _override_deps(tmp_path):
     """テスト用に tmp_path の SQLite インスタンスを注入する。"""
     data_store = SqliteDataStore(str(tmp_path / "store.db"))
     result_store = SqliteResultStore(str(tmp_path / "result.db"))
-    engine = AnalysisEngine(data_store, result_store)
+    feature_cache = FeatureCache(max_bytes=2**20)
+    engine = AnalysisEngine(
+        data_store, result_store, feature_cache=feature_cache
+    )
     event_bus = EventBus()
+    # interval=0: 変更イベントを集約せず即時 publish する
+    changes = ChangeBatcher(event_bus, interval=0)
+    watch_data_changes(changes, feature_cache)
+    # max_workers=0: submit() 内で同期実行し、応答後すぐ結果を検証できる
+    job_queue = AnalysisJobQueue(
+        engine,
+        max_workers=0,
+        on_complete=lambda job: publish_job_completed(
+            event_bus, changes, result_store, job
+        ),
+    )
 
     app.dependency_overrides[get_data_store] = lambda: data_store
     app.dependency_overrides[get_result_store] = lambda: result_store
     app.dependency_overrides[get_analysis_engine] = lambda: engine
     app.dependency_overrides[get_event_bus] = lambda: event_bus
+    app.dependency_overrides[get_change_batcher] = lambda: changes
+    app.dependency_overrides[get_job_queue] = lambda: job_queue
+    app.dependency_overrides[get_feature_cache] = lambda: feature_cache
 
     yield
 
@@ -176,6 +209,74 @@ class TestAnalysisRunEndpoint:
         assert resp.json()["processed_categories"] == 0
 
 
+class TestAnalysisJobs:
+    """分析ジョブ — 投入直後にジョブIDを返し、GET /api/jobs で追跡できる。"""
+
+    def test_post_records_returns_job_id(self, client):
+        """レコード投入の応答にジョブIDが含まれ、状態を取得できる。"""
+        resp = client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": ["J", "A"],
+                        "work_time": 10.0,
+                        "recorded_at": "2025-01-01T00:00:00",
+                    },
+                ]
+            },
+        )
+        job_id = resp.json()["job_id"]
+
+        job_resp = client.get(f"/api/jobs/{job_id}")
+        assert job_resp.status_code == 200
+        job = job_resp.json()
+        assert job["state"] == "succeeded"
+        assert job["progress"] == 1.0
+        assert len(job["category_ids"]) == 1
+
+    def test_unknown_job_returns_404(self, client):
+        """未知のジョブID → 404。"""
+        resp = client.get("/api/jobs/unknown")
+        assert resp.status_code == 404
+
+    def test_background_workers_complete_job(self, client):
+        """ワーカープール経由でもジョブが完了し結果が保存される。"""
+        data_store = app.dependency_overrides[get_data_store]()
+        result_store = app.dependency_overrides[get_result_store]()
+        engine = AnalysisEngine(data_store, result_store)
+        job_queue = AnalysisJobQueue(engine, max_workers=1, quiet_period=0.0)
+        app.dependency_overrides[get_job_queue] = lambda: job_queue
+        try:
+            resp = client.post(
+                "/api/records",
+                json={
+                    "records": [
+                        {
+                            "category_path": ["J", "B"],
+                            "work_time": 10.0,
+                            "recorded_at": "2025-01-01T00:00:00",
+                        },
+                        {
+                            "category_path": ["J", "B"],
+                            "work_time": 20.0,
+                            "recorded_at": "2025-02-01T00:00:00",
+                        },
+                    ]
+                },
+            )
+            job_id = resp.json()["job_id"]
+            assert job_queue.wait(job_id, timeout=10)
+
+            job = client.get(f"/api/jobs/{job_id}").json()
+            assert job["state"] == "succeeded"
+            cid = job["category_ids"][0]
+            results = client.get(f"/api/results/{cid}").json()
+            assert results["trend"]["slope"] > 0
+        finally:
+            job_queue.shutdown()
+
+
 class TestDeleteModelClearsAnomalies:
     """DELETE /api/models/{id} → 異常結果がクリアされる。"""
 
@@ -756,3 +857,465 @@ class TestModelDefinitionWithFeatureConfig:
         )
         assert resp.status_code == 200
         assert resp.json()["retrained"] is True
+
+
+class TestStreamingDetectorModel:
+    """PUT/GET /api/models — anomaly_params による検知器の選択."""
+
+    _BASE = {
+        "baseline_start": "2025-01-01T00:00:00",
+        "baseline_end": "2025-12-31T00:00:00",
+        "sensitivity": 0.5,
+        "excluded_points": [],
+    }
+
+    def _leaf(self, client) -> int:
+        client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": ["SD", "E"],
+                        "work_time": 10.0 + (i % 3) * 0.1,
+                        "recorded_at": f"2025-01-{i + 1:02d}T00:00:00",
+                    }
+                    for i in range(20)
+                ]
+            },
+        )
+        tree = client.get("/api/categories")
+        return tree.json()["categories"][0]["children"][0]["id"]
+
+    def test_detector_round_trip_and_scores(self, client):
+        leaf_id = self._leaf(client)
+        params = {"detector": "robust_z", "window": 10}
+        resp = client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": params},
+        )
+        assert resp.status_code == 200
+
+        model = client.get(f"/api/models/{leaf_id}").json()
+        assert model["anomaly_params"] == params
+        anomalies = client.get(f"/api/results/{leaf_id}").json()["anomalies"]
+        assert len(anomalies) == 20
+        assert all(0.0 <= a["anomaly_score"] <= 1.0 for a in anomalies)
+
+    def test_omitted_params_are_kept(self, client):
+        """anomaly_params を省略した保存では既存の検知器を維持する."""
+        leaf_id = self._leaf(client)
+        client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": {"detector": "ewma"}},
+        )
+        resp = client.put(
+            f"/api/models/{leaf_id}", json={**self._BASE, "sensitivity": 0.7}
+        )
+        assert resp.json()["retrained"] is False
+        model = client.get(f"/api/models/{leaf_id}").json()
+        assert model["anomaly_params"] == {"detector": "ewma"}
+
+    def test_contamination_change_does_not_retrain(self, client):
+        leaf_id = self._leaf(client)
+        client.put(f"/api/models/{leaf_id}", json=self._BASE)
+        before = client.get(f"/api/results/{leaf_id}").json()["anomalies"]
+        resp = client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": {"contamination": 0.5}},
+        )
+        assert resp.json()["retrained"] is False
+        after = client.get(f"/api/results/{leaf_id}").json()["anomalies"]
+        assert [a["anomaly_score"] for a in after] != [
+            a["anomaly_score"] for a in before
+        ]
+
+    def test_null_resets_to_isolation_forest(self, client):
+        leaf_id = self._leaf(client)
+        client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": {"detector": "ewma"}},
+        )
+        resp = client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": None},
+        )
+        assert resp.json()["retrained"] is True
+        assert (
+            client.get(f"/api/models/{leaf_id}").json()["anomaly_params"]
+            is None
+        )
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"detector": "nope"},
+            {"detector": "ewma", "alpha": 5},
+            {"detector": "ewma", "alpha": 0},
+        ],
+    )
+    def test_invalid_detector_rejected(self, client, params):
+        leaf_id = self._leaf(client)
+        resp = client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "anomaly_params": params},
+        )
+        assert resp.status_code == 422
+        assert client.get(f"/api/models/{leaf_id}").status_code == 404
+
+    @pytest.mark.parametrize(
+        "spec",
+        [
+            {"feature_type": "nope"},
+            {"feature_type": "moving_avg", "params": {"window": 1}},
+            {"feature_type": "rolling_quantile", "params": {"q": 1.5}},
+            {"feature_type": "window_mean", "params": {"window": "1y"}},
+            {"feature_type": "rolling_median", "params": {"size": 3}},
+        ],
+    )
+    def test_invalid_feature_params_rejected(self, client, spec):
+        """params_schema に合わない特徴量の指定は保存前に 422."""
+        leaf_id = self._leaf(client)
+        resp = client.put(
+            f"/api/models/{leaf_id}",
+            json={**self._BASE, "feature_config": [spec]},
+        )
+        assert resp.status_code == 422
+        assert client.get(f"/api/models/{leaf_id}").status_code == 404
+
+    def test_registry_lists_detectors(self, client):
+        resp = client.get("/api/detectors/registry")
+        assert resp.status_code == 200
+        names = [d["detector"] for d in resp.json()["detectors"]]
+        assert names == ["ewma", "robust_z", "cusum"]
+
+
+class TestContaminationPreview:
+    """POST /api/models/{id}/preview — 感度の一括試算."""
+
+    def _leaf(self, client) -> int:
+        client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": ["PV", "E"],
+                        "work_time": 10.0 + (i % 5) * 0.2,
+                        "recorded_at": f"2025-01-{i + 1:02d}T00:00:00",
+                    }
+                    for i in range(25)
+                ]
+                + [
+                    {
+                        "category_path": ["PV", "E"],
+                        "work_time": 40.0,
+                        "recorded_at": "2025-02-01T00:00:00",
+                    }
+                ]
+            },
+        )
+        tree = client.get("/api/categories")
+        return tree.json()["categories"][0]["children"][0]["id"]
+
+    def _body(self, **overrides):
+        return {
+            "baseline_start": "2025-01-01T00:00:00",
+            "baseline_end": "2025-01-31T00:00:00",
+            "sensitivity": 0.5,
+            "contaminations": [0.01, 0.1, 0.3],
+            **overrides,
+        }
+
+    def test_returns_flags_per_contamination(self, client):
+        leaf_id = self._leaf(client)
+        resp = client.post(f"/api/models/{leaf_id}/preview", json=self._body())
+        assert resp.status_code == 200
+        data = resp.json()
+        assert len(data["recorded_at"]) == len(data["raw_scores"]) == 26
+        assert [e["contamination"] for e in data["sweep"]] == [0.01, 0.1, 0.3]
+        for entry in data["sweep"]:
+            assert len(entry["flags"]) == 26
+            assert entry["flagged_count"] == sum(entry["flags"])
+        counts = [e["flagged_count"] for e in data["sweep"]]
+        assert counts == sorted(counts)
+
+    def test_does_not_save(self, client):
+        leaf_id = self._leaf(client)
+        client.post(f"/api/models/{leaf_id}/preview", json=self._body())
+        assert client.get(f"/api/models/{leaf_id}").status_code == 404
+        results = client.get(f"/api/results/{leaf_id}").json()
+        assert results["anomalies"] == []
+
+    def test_invalid_contamination(self, client):
+        leaf_id = self._leaf(client)
+        resp = client.post(
+            f"/api/models/{leaf_id}/preview",
+            json=self._body(contaminations=[0.9]),
+        )
+        assert resp.status_code == 422
+
+    def test_streaming_detector_rejected(self, client):
+        leaf_id = self._leaf(client)
+        resp = client.post(
+            f"/api/models/{leaf_id}/preview",
+            json=self._body(anomaly_params={"detector": "ewma"}),
+        )
+        assert resp.status_code == 422
+
+    def test_omitted_params_inherit_saved_definition(self, client):
+        """anomaly_params の省略時は PUT と同じく保存済みの設定を使う。"""
+        leaf_id = self._leaf(client)
+        client.put(
+            f"/api/models/{leaf_id}",
+            json=self._body(anomaly_params={"detector": "ewma"}),
+        )
+        inherited = client.post(
+            f"/api/models/{leaf_id}/preview", json=self._body()
+        )
+        assert inherited.status_code == 422
+        reset = client.post(
+            f"/api/models/{leaf_id}/preview",
+            json=self._body(anomaly_params=None),
+        )
+        assert reset.status_code == 200
+
+    def test_empty_baseline(self, client):
+        leaf_id = self._leaf(client)
+        resp = client.post(
+            f"/api/models/{leaf_id}/preview",
+            json=self._body(
+                baseline_start="2024-01-01T00:00:00",
+                baseline_end="2024-02-01T00:00:00",
+            ),
+        )
+        assert resp.status_code == 422
+
+    def test_preview_hits_cache_and_ingest_invalidates(self, client):
+        """分析と同じデータの試算は特徴量キャッシュに当たり、
+        取り込みで破棄される（GET /api/features/cache/metrics）。"""
+        leaf_id = self._leaf(client)
+        body = self._body()
+        client.put(f"/api/models/{leaf_id}", json=body)
+        client.post(f"/api/models/{leaf_id}/preview", json=body)
+        metrics = client.get("/api/features/cache/metrics").json()
+        assert metrics["hits"] == 1
+        assert metrics["entries"] == 1
+
+        client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": ["PV", "E"],
+                        "work_time": 10.0,
+                        "recorded_at": "2025-01-15T12:00:00",
+                    }
+                ]
+            },
+        )
+        metrics = client.get("/api/features/cache/metrics").json()
+        # 取り込み後の再分析で新しいバージョンの行列に置き換わる
+        assert metrics["entries"] == 1
+        assert metrics["misses"] == 2
+
+    def test_records_appended_invalidates_before_reanalysis(self, client):
+        """再分析を待たず、records-appended で古い行列が捨てられる。"""
+        leaf_id = self._leaf(client)
+        body = self._body()
+        client.put(f"/api/models/{leaf_id}", json=body)
+        engine = app.dependency_overrides[get_analysis_engine]()
+        job_queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=60, max_delay=60
+        )
+        app.dependency_overrides[get_job_queue] = lambda: job_queue
+        try:
+            client.post(
+                "/api/records",
+                json={
+                    "records": [
+                        {
+                            "category_path": ["PV", "E"],
+                            "work_time": 10.0,
+                            "recorded_at": "2025-01-15T12:00:00",
+                        }
+                    ]
+                },
+            )
+            metrics = client.get("/api/features/cache/metrics").json()
+            assert metrics["invalidations"] == 1
+            assert metrics["entries"] == 0
+        finally:
+            job_queue.shutdown(wait=False)
+
+    def test_delete_all_data_clears_cache(self, client):
+        leaf_id = self._leaf(client)
+        client.put(f"/api/models/{leaf_id}", json=self._body())
+        client.delete("/api/debug/data")
+        metrics = client.get("/api/features/cache/metrics").json()
+        assert metrics["entries"] == 0
+
+
+class TestEventLoopNotBlocked:
+    """遅い DB 呼び出し中も /api/health が応答する。"""
+
+    def test_health_responds_during_slow_query(self):
+        data_store = app.dependency_overrides[get_data_store]()
+        original = data_store.get_category_tree
+        release = threading.Event()
+
+        def _slow_tree(root_id=None):
+            release.wait(5)
+            return original(root_id)
+
+        data_store.get_category_tree = _slow_tree
+        with TestClient(app) as client:
+            slow = threading.Thread(
+                target=client.get, args=("/api/categories",)
+            )
+            slow.start()
+            try:
+                time.sleep(0.1)
+                started = time.monotonic()
+                resp = client.get("/api/health")
+                elapsed = time.monotonic() - started
+                assert resp.status_code == 200
+                assert elapsed < 1.0
+            finally:
+                release.set()
+                slow.join()
+
+
+class TestEventMetricsEndpoint:
+    """GET /api/events/metrics → EventBus の統計を返す。"""
+
+    def test_metrics_without_subscribers(self, client):
+        client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": ["A"],
+                        "work_time": 1.0,
+                        "recorded_at": "2025-01-01T00:00:00",
+                    }
+                ]
+            },
+        )
+        body = client.get("/api/events/metrics").json()
+        assert body["subscribers"] == 0
+        assert body["queue_depth"] == 0
+        assert body["published"] >= 1
+        assert body["dropped"] == 0
+
+
+class TestChangeEvents:
+    """書き込み経路が型付き変更イベントを発行する。"""
+
+    @pytest.fixture
+    def published(self):
+        bus = MagicMock(spec=EventBus)
+        changes = ChangeBatcher(bus, interval=0)
+        engine = app.dependency_overrides[get_analysis_engine]()
+        result_store = app.dependency_overrides[get_result_store]()
+        job_queue = AnalysisJobQueue(
+            engine,
+            max_workers=0,
+            on_complete=lambda job: publish_job_completed(
+                bus, changes, result_store, job
+            ),
+        )
+        app.dependency_overrides[get_change_batcher] = lambda: changes
+        app.dependency_overrides[get_job_queue] = lambda: job_queue
+        return bus
+
+    def _events(self, bus):
+        return {c.args[0]: c.args[1] for c in bus.publish.call_args_list}
+
+    def _post(self, client, path):
+        return client.post(
+            "/api/records",
+            json={
+                "records": [
+                    {
+                        "category_path": path,
+                        "work_time": 1.0,
+                        "recorded_at": "2025-01-01T00:00:00",
+                    }
+                ]
+            },
+        )
+
+    def test_records_post_publishes_categories_and_records(
+        self, client, published
+    ):
+        self._post(client, ["A", "B"])
+        events = self._events(published)
+        appended = events["records-appended"]
+        (cid,) = appended["category_ids"]
+        assert appended["versions"][cid] >= 1
+        assert events["categories-changed"]["category_ids"] == [cid]
+
+    def test_existing_category_does_not_publish_categories_changed(
+        self, client, published
+    ):
+        self._post(client, ["A", "B"])
+        published.reset_mock()
+        self._post(client, ["A", "B"])
+        assert "categories-changed" not in self._events(published)
+        assert "records-appended" in self._events(published)
+
+    def test_model_put_publishes_model_and_results(self, client, published):
+        self._post(client, ["A"])
+        cid = client.get("/api/categories").json()["categories"][0]["id"]
+        published.reset_mock()
+        client.put(
+            f"/api/models/{cid}",
+            json={
+                "baseline_start": "2025-01-01T00:00:00",
+                "baseline_end": "2025-01-02T00:00:00",
+                "sensitivity": 0.5,
+                "excluded_points": [],
+            },
+        )
+        events = self._events(published)
+        assert events["model-changed"]["category_ids"] == [cid]
+        assert events["results-updated"]["category_ids"] == [cid]
+        assert cid in events["results-updated"]["versions"]
+
+    def test_job_completion_publishes_state(self, client, published):
+        job_id = self._post(client, ["A"]).json()["job_id"]
+        completed = self._events(published)["analysis-completed"]
+        assert completed["job_id"] == job_id
+        assert completed["state"] == "succeeded"
+        assert completed["error"] is None
+
+    def test_failed_category_is_not_reported_as_updated(
+        self, client, published, monkeypatch
+    ):
+        engine = app.dependency_overrides[get_analysis_engine]()
+        monkeypatch.setattr(
+            engine, "run", MagicMock(side_effect=RuntimeError("boom"))
+        )
+        self._post(client, ["A"])
+        events = self._events(published)
+        (cid,) = events["records-appended"]["category_ids"]
+        assert events["analysis-completed"]["state"] == "failed"
+        assert "boom" in events["analysis-completed"]["error"]
+        assert events["analysis-completed"]["failed_category_ids"] == [cid]
+        assert "results-updated" not in events
+
+    def test_cache_invalidation_runs_on_executor(self):
+        """キャッシュの破棄は emit 元ではなく DB Executor で実行される。"""
+        cache = MagicMock(spec=FeatureCache)
+        executor = MagicMock(spec=ThreadPoolExecutor)
+        changes = ChangeBatcher(MagicMock(spec=EventBus), interval=0)
+        watch_data_changes(changes, cache, executor)
+
+        changes.emit(RECORDS_APPENDED, [1], {1: 2})
+        changes.emit(DATA_CLEARED, [])
+
+        assert [c.args for c in executor.submit.call_args_list] == [
+            (cache.invalidate, [1], {1: 2}),
+            (cache.clear,),
+        ]
+        cache.invalidate.assert_not_called()
+        cache.clear.assert_not_called()
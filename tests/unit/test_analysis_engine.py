@@ -3,21 +3,28 @@
 FeatureBuilder + トレンド分析 + オーケストレータ。
 """
 
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock
 
 import numpy as np
 import pytest
 
+from backend.analysis.anomaly import fit_forest
 from backend.analysis.engine import AnalysisEngine
 from backend.analysis.feature import RawWorkTimeFeatureBuilder
+from backend.analysis.forest import ForestArtifact
+from backend.analysis.training import category_seed
 from backend.analysis.trend import compute_trend
 from backend.interfaces.data_store import (
     CategoryNode,
     DataStoreInterface,
     WorkRecord,
 )
-from backend.interfaces.feature import FeatureBuilder
+from backend.interfaces.feature import (
+    FeatureBuilder,
+    FeatureConfig,
+    FeatureSpec,
+)
 from backend.interfaces.result_store import (
     AnomalyResult,
     ModelDefinition,
@@ -96,7 +103,11 @@ def mock_data_store():
 @pytest.fixture
 def mock_result_store():
     """ResultStoreInterface のモック."""
-    return MagicMock(spec=ResultStoreInterface)
+    store = MagicMock(spec=ResultStoreInterface)
+    # モデル定義は実行中に更新されない（version は既定値 0 のまま）
+    store.get_model_version.return_value = 0
+    store.get_model_artifact.return_value = None
+    return store
 
 
 @pytest.fixture
@@ -735,6 +746,8 @@ class TestAnalysisEngineFeatureConfig:
 
         mock_builder = MagicMock(spec=FeatureBuilder)
         mock_builder.build.return_value = np.array([[1.0], [2.0]])
+        # 増分構築に対応しないビルダーでは build() で全体を構築する
+        mock_builder.build_incremental.side_effect = NotImplementedError
 
         engine = AnalysisEngine(
             mock_data_store, mock_result_store, feature_builder=mock_builder
@@ -752,10 +765,10 @@ class TestAnalysisEngineFeatureConfig:
 class TestAnalysisEngineAnomalyParams:
     """AnalysisEngine の anomaly_params 伝搬テスト."""
 
-    def test_anomaly_params_passed_to_train_and_score(
+    def test_anomaly_params_passed_to_fit_forest(
         self, mock_data_store, mock_result_store
     ):
-        """anomaly_params が train_and_score に渡される."""
+        """anomaly_params が fit_forest に渡される."""
         records = [
             WorkRecord(
                 category_id=1,
@@ -826,3 +839,664 @@ class TestAnalysisEngineAnomalyParams:
         engine.run(1)
 
         mock_result_store.save_anomaly_results.assert_called_once()
+
+
+class TestAnalysisEngineCancellation:
+    """モデル定義 version による古い実行の中断."""
+
+    @staticmethod
+    def _setup(mock_data_store, mock_result_store):
+        mock_data_store.get_records.return_value = [
+            WorkRecord(
+                category_id=1,
+                work_time=10.0 + i * 0.1,
+                recorded_at=datetime(2025, 1, 1 + i),
+            )
+            for i in range(5)
+        ]
+        mock_data_store.get_data_versions.return_value = {1: 7}
+        mock_result_store.get_model_definition.return_value = ModelDefinition(
+            category_id=1,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 5),
+            sensitivity=0.5,
+            version=3,
+        )
+
+    def test_saves_with_started_version(
+        self, engine, mock_data_store, mock_result_store
+    ):
+        """開始時点の version を付けて条件付き保存する."""
+        self._setup(mock_data_store, mock_result_store)
+        mock_result_store.get_model_version.return_value = 3
+
+        engine.run(1)
+
+        kwargs = mock_result_store.save_anomaly_results.call_args.kwargs
+        assert kwargs["model_version"] == 3
+        mock_result_store.save_analyzed_version.assert_called_once_with(1, 7)
+
+    def test_superseded_before_training_is_cancelled(
+        self, engine, mock_data_store, mock_result_store
+    ):
+        """段階の合間に version が進んでいれば学習せず中断する."""
+        self._setup(mock_data_store, mock_result_store)
+        mock_result_store.get_model_version.return_value = 4
+
+        engine.run(1)
+
+        mock_result_store.save_anomaly_results.assert_not_called()
+        mock_result_store.save_analyzed_version.assert_not_called()
+
+    def test_rejected_save_skips_watermark(
+        self, engine, mock_data_store, mock_result_store
+    ):
+        """学習中に更新され保存が拒否された場合はウォーターマークを進めない."""
+        self._setup(mock_data_store, mock_result_store)
+        mock_result_store.get_model_version.return_value = 3
+        mock_result_store.save_anomaly_results.return_value = False
+
+        engine.run(1)
+
+        mock_result_store.save_analyzed_version.assert_not_called()
+
+    def test_stale_run_never_overwrites_newer_results(self, tmp_path):
+        """実ストアで、古い version の実行結果が新しい結果を上書きしない."""
+        from backend.result_store.sqlite import SqliteResultStore
+        from backend.store.sqlite import SqliteDataStore
+
+        data_store = SqliteDataStore(str(tmp_path / "s.db"))
+        result_store = SqliteResultStore(str(tmp_path / "r.db"))
+        cid = data_store.ensure_category_path(["A"])
+        data_store.upsert_records(
+            [
+                WorkRecord(cid, 10.0 + i, datetime(2025, 1, 1 + i))
+                for i in range(5)
+            ]
+        )
+        definition = ModelDefinition(
+            category_id=cid,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 5),
+            sensitivity=0.5,
+        )
+        result_store.save_model_definition(definition)
+
+        def superseding_train(*args, **kwargs):
+            # 学習中にユーザーがベースラインを編集した
+            result_store.save_model_definition(definition)
+            return fit_forest(*args, **kwargs)
+
+        engine = AnalysisEngine(data_store, result_store)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("backend.analysis.engine.fit_forest", superseding_train)
+            engine.run(cid)
+
+        assert result_store.get_anomaly_results(cid) == []
+        assert result_store.get_analyzed_versions() == {}
+        assert result_store.get_model_artifact(cid) is None
+
+
+def _sqlite_setup(tmp_path):
+    """10日分の記録と先頭5日をベースラインとするモデル定義を用意する."""
+    from backend.result_store.sqlite import SqliteResultStore
+    from backend.store.sqlite import SqliteDataStore
+
+    data_store = SqliteDataStore(str(tmp_path / "s.db"))
+    result_store = SqliteResultStore(str(tmp_path / "r.db"))
+    cid = data_store.ensure_category_path(["A"])
+    data_store.upsert_records(
+        [
+            WorkRecord(cid, 10.0 + i % 3, datetime(2025, 1, 1 + i))
+            for i in range(10)
+        ]
+    )
+    result_store.save_model_definition(
+        ModelDefinition(
+            category_id=cid,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 5),
+            sensitivity=0.5,
+        )
+    )
+    return data_store, result_store, cid
+
+
+class TestAnalysisEngineModelReuse:
+    """保存済み学習モデルの再利用テスト."""
+
+    def _setup(self, tmp_path):
+        return _sqlite_setup(tmp_path)
+
+    def test_same_baseline_skips_refit(self, tmp_path, monkeypatch):
+        """ベースライン外の追記だけなら再学習せず同じスコアになる."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        first = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        data_store.upsert_records(
+            [WorkRecord(cid, 50.0, datetime(2025, 2, 1))]
+        )
+
+        def fail_fit(*args, **kwargs):
+            raise AssertionError("refit")
+
+        monkeypatch.setattr("backend.analysis.engine.fit_forest", fail_fit)
+        # 再起動後を想定し、新しいストアインスタンスから読み込む
+        from backend.result_store.sqlite import SqliteResultStore
+
+        reopened = SqliteResultStore(str(tmp_path / "r.db"))
+        AnalysisEngine(data_store, reopened).run(cid)
+
+        second = {
+            r.recorded_at: r.anomaly_score
+            for r in reopened.get_anomaly_results(cid)
+        }
+        assert {k: second[k] for k in first} == first
+        assert second[datetime(2025, 2, 1)] > 0.5
+
+    def test_changed_baseline_refits(self, tmp_path):
+        """ベースラインが変われば再学習し、保存済みモデルを置き換える."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        before = result_store.get_model_artifact(cid).definition_hash
+
+        definition = result_store.get_model_definition(cid)
+        definition.baseline_end = datetime(2025, 1, 8)
+        result_store.save_model_definition(definition)
+        AnalysisEngine(data_store, result_store).run(cid)
+
+        assert result_store.get_model_artifact(cid).definition_hash != before
+
+    def test_raw_scores_are_stored(self, tmp_path):
+        """正規化前の -score_samples が結果と一緒に保存される."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+
+        results = sorted(
+            result_store.get_anomaly_results(cid),
+            key=lambda r: r.recorded_at,
+        )
+        values = np.array([[10.0 + i % 3] for i in range(10)])
+        forest = fit_forest(values[:5], random_state=category_seed(cid))
+        np.testing.assert_allclose(
+            [r.raw_score for r in results], -forest.score_samples(values)
+        )
+
+    def test_contamination_change_renormalizes_stored_scores(
+        self, tmp_path, monkeypatch
+    ):
+        """contamination だけの変更は学習も採点もせず正規化し直す."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        definition = result_store.get_model_definition(cid)
+        definition.anomaly_params = {"contamination": 0.2}
+        result_store.save_model_definition(definition)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("refit or rescore")
+
+        monkeypatch.setattr("backend.analysis.engine.fit_forest", fail)
+        monkeypatch.setattr(
+            "backend.analysis.forest.ForestArtifact.score_samples", fail
+        )
+        AnalysisEngine(data_store, result_store).run(cid)
+        monkeypatch.undo()
+
+        values = np.array([[10.0 + i % 3] for i in range(10)])
+        expected = fit_forest(
+            values[:5],
+            {"contamination": 0.2},
+            random_state=category_seed(cid),
+        ).normalized_scores(values)
+        results = sorted(
+            result_store.get_anomaly_results(cid),
+            key=lambda r: r.recorded_at,
+        )
+        np.testing.assert_allclose(
+            [r.anomaly_score for r in results], expected, atol=1e-12
+        )
+
+    def _count_scored_rows(self, monkeypatch) -> list[int]:
+        calls: list[int] = []
+        original = ForestArtifact.score_samples
+
+        def counting(self, x, n_jobs=1):
+            calls.append(len(x))
+            return original(self, x, n_jobs)
+
+        monkeypatch.setattr(
+            "backend.analysis.forest.ForestArtifact.score_samples", counting
+        )
+        return calls
+
+    def test_changed_record_is_rescored_without_refit(
+        self, tmp_path, monkeypatch
+    ):
+        """全期間のデータが変われば、保存済みの raw_score は使わない."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        data_store.upsert_records(
+            [WorkRecord(cid, 50.0, datetime(2025, 1, 8))]
+        )
+        calls = self._count_scored_rows(monkeypatch)
+        AnalysisEngine(data_store, result_store).run(cid)
+
+        assert calls == [10]
+        assert all(
+            r.raw_score is not None
+            for r in result_store.get_anomaly_results(cid)
+        )
+
+    def test_appended_records_are_scored_incrementally(
+        self, tmp_path, monkeypatch
+    ):
+        """末尾への追記は追記分だけを構築・採点し、全体の再計算と一致する."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        definition = result_store.get_model_definition(cid)
+        definition.feature_config = FeatureConfig(
+            [FeatureSpec("raw_work_time"), FeatureSpec("moving_avg")]
+        )
+        result_store.save_model_definition(definition)
+        AnalysisEngine(data_store, result_store).run(cid)
+        appended = [
+            WorkRecord(cid, 50.0, datetime(2025, 2, 1)),
+            WorkRecord(cid, 11.0, datetime(2025, 2, 2)),
+        ]
+        data_store.upsert_records(appended)
+        calls = self._count_scored_rows(monkeypatch)
+        AnalysisEngine(data_store, result_store).run(cid)
+        monkeypatch.undo()
+
+        assert calls == [2]
+        incremental = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        # 保存済みモデルを消して全体を再計算した結果と一致する
+        result_store.delete_model_artifact(cid)
+        AnalysisEngine(data_store, result_store).run(cid)
+        full = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        assert incremental.keys() == full.keys()
+        for key, score in full.items():
+            assert incremental[key] == pytest.approx(score, abs=1e-12)
+
+    def test_sum_preserving_edit_is_not_reused(self, tmp_path, monkeypatch):
+        """合計が変わらない修正（値の入れ替え）でも増分では処理しない."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        data_store.upsert_records(
+            [
+                WorkRecord(cid, 11.0, datetime(2025, 1, 7)),
+                WorkRecord(cid, 10.0, datetime(2025, 1, 8)),
+                WorkRecord(cid, 12.0, datetime(2025, 2, 1)),
+            ]
+        )
+        calls = self._count_scored_rows(monkeypatch)
+        AnalysisEngine(data_store, result_store).run(cid)
+
+        assert calls == [11]
+
+    def test_append_inside_baseline_rebuilds(self, tmp_path, monkeypatch):
+        """ベースライン期間内の点が増えたら増分では処理しない."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        definition = result_store.get_model_definition(cid)
+        definition.baseline_end = datetime(2025, 3, 1)
+        result_store.save_model_definition(definition)
+        AnalysisEngine(data_store, result_store).run(cid)
+        before = result_store.get_model_artifact(cid).definition_hash
+        data_store.upsert_records(
+            [WorkRecord(cid, 11.0, datetime(2025, 2, 1))]
+        )
+        calls = self._count_scored_rows(monkeypatch)
+        AnalysisEngine(data_store, result_store).run(cid)
+
+        assert calls == [11]
+        assert result_store.get_model_artifact(cid).definition_hash != before
+
+    def test_reused_model_is_not_saved_again(
+        self, engine, mock_data_store, mock_result_store
+    ):
+        """ハッシュが一致すれば学習も保存もしない."""
+        records = [
+            WorkRecord(1, 10.0 + i, datetime(2025, 1, 1 + i)) for i in range(4)
+        ]
+        mock_data_store.get_records.return_value = records
+        mock_result_store.get_model_definition.return_value = ModelDefinition(
+            category_id=1,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 4),
+            sensitivity=0.5,
+        )
+        engine.run(1)
+        saved = mock_result_store.save_model_artifact.call_args[0][0]
+        mock_result_store.get_model_artifact.return_value = saved
+        mock_result_store.save_model_artifact.reset_mock()
+
+        engine.run(1)
+
+        mock_result_store.save_model_artifact.assert_not_called()
+
+
+class TestAnalysisEngineTrainer:
+    """学習トレーナーとカテゴリごとのシードのテスト."""
+
+    def _definition(self, category_id):
+        return ModelDefinition(
+            category_id=category_id,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 4),
+            sensitivity=0.5,
+        )
+
+    def test_trainer_receives_category_seed(
+        self, mock_data_store, mock_result_store
+    ):
+        mock_data_store.get_records.return_value = [
+            WorkRecord(5, 10.0 + i, datetime(2025, 1, 1 + i)) for i in range(4)
+        ]
+        mock_result_store.get_model_definition.return_value = self._definition(
+            5
+        )
+        trainer = MagicMock()
+        trainer.fit.side_effect = lambda x, params, n_jobs, seed: fit_forest(
+            x, params, n_jobs, seed
+        )
+        AnalysisEngine(
+            mock_data_store, mock_result_store, trainer=trainer
+        ).run(5)
+
+        trainer.fit.assert_called_once()
+        assert trainer.fit.call_args[0][3] == category_seed(5)
+
+    def test_seed_is_part_of_model_hash(
+        self, mock_data_store, mock_result_store
+    ):
+        """同じデータでもカテゴリが違えば別のモデルとして扱う."""
+        hashes = []
+        for cid in (1, 2):
+            mock_data_store.get_records.return_value = [
+                WorkRecord(cid, 10.0 + i, datetime(2025, 1, 1 + i))
+                for i in range(4)
+            ]
+            mock_result_store.get_model_definition.return_value = (
+                self._definition(cid)
+            )
+            AnalysisEngine(mock_data_store, mock_result_store).run(cid)
+            saved = mock_result_store.save_model_artifact.call_args[0][0]
+            hashes.append(saved.definition_hash)
+        assert hashes[0] != hashes[1]
+
+
+class TestAnalysisEngineCpuBudget:
+    """CPU 予算によるモデル内並列度の決定テスト."""
+
+    def test_fit_uses_leased_threads(
+        self, mock_data_store, mock_result_store, monkeypatch
+    ):
+        from backend.analysis.cpu import CpuBudget
+
+        mock_data_store.get_records.return_value = [
+            WorkRecord(1, 10.0 + i, datetime(2025, 1, 1 + i)) for i in range(4)
+        ]
+        mock_result_store.get_model_definition.return_value = ModelDefinition(
+            category_id=1,
+            baseline_start=datetime(2025, 1, 1),
+            baseline_end=datetime(2025, 1, 4),
+            sensitivity=0.5,
+        )
+        budget = CpuBudget(4)
+        seen: list[tuple[int, int]] = []
+
+        def recording_fit(baseline, params, n_jobs, **kwargs):
+            seen.append((n_jobs, budget.in_use))
+            return fit_forest(baseline, params, **kwargs)
+
+        monkeypatch.setattr(
+            "backend.analysis.engine.fit_forest", recording_fit
+        )
+        engine = AnalysisEngine(
+            mock_data_store, mock_result_store, cpu_budget=budget
+        )
+        with budget.lease(3):
+            # 他のワーカーが3スレッド使用中なら残り1つだけ借りる
+            engine.run(1)
+            assert budget.in_use == 3
+
+        assert seen == [(1, 4)]
+
+
+class TestAnalysisEngineFeatureCache:
+    """特徴量キャッシュの利用テスト."""
+
+    def _setup(self, tmp_path):
+        from backend.analysis.feature_cache import FeatureCache
+
+        data_store, result_store, cid = _sqlite_setup(tmp_path)
+        builder = MagicMock(wraps=RawWorkTimeFeatureBuilder())
+        cache = FeatureCache(max_bytes=2**20)
+        engine = AnalysisEngine(
+            data_store,
+            result_store,
+            feature_builder=builder,
+            feature_cache=cache,
+        )
+        return data_store, result_store, cid, engine, builder, cache
+
+    def test_same_data_version_reuses_features(self, tmp_path):
+        """データが変わらなければ再分析・試算で特徴量を作り直さない."""
+        data_store, result_store, cid, engine, builder, cache = self._setup(
+            tmp_path
+        )
+        engine.run(cid)
+        engine.run(cid)
+        engine.preview_contamination(
+            result_store.get_model_definition(cid), [0.1]
+        )
+
+        assert builder.build_incremental.call_count == 1
+        assert cache.metrics()["hits"] == 2
+
+    def test_written_data_is_rebuilt(self, tmp_path):
+        """書き込みでデータバージョンが進めば作り直す."""
+        data_store, result_store, cid, engine, builder, cache = self._setup(
+            tmp_path
+        )
+        engine.run(cid)
+        data_store.upsert_records(
+            [WorkRecord(cid, 50.0, datetime(2025, 1, 8))]
+        )
+        engine.run(cid)
+
+        assert builder.build_incremental.call_count == 2
+        scores = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        assert scores[datetime(2025, 1, 8)] > 0.5
+        assert cache.metrics()["entries"] == 1
+
+    def test_feature_config_is_part_of_key(self, tmp_path):
+        """feature_config が変われば別のエントリになる."""
+        data_store, result_store, cid, engine, builder, cache = self._setup(
+            tmp_path
+        )
+        engine.run(cid)
+        definition = result_store.get_model_definition(cid)
+        definition.feature_config = FeatureConfig(
+            [FeatureSpec("raw_work_time"), FeatureSpec("diff")]
+        )
+        result_store.save_model_definition(definition)
+        engine.run(cid)
+
+        metrics = cache.metrics()
+        assert metrics["misses"] == 2
+        assert metrics["entries"] == 2
+
+    def test_concurrent_write_is_not_cached(self, tmp_path):
+        """記録の読み取り中にバージョンが進んだら、キャッシュしない."""
+        data_store, result_store, cid, engine, builder, cache = self._setup(
+            tmp_path
+        )
+        original = data_store.get_records
+
+        def get_records_then_write(category_id, *args):
+            records = original(category_id, *args)
+            data_store.upsert_records(
+                [WorkRecord(cid, 11.0, datetime(2025, 1, 20))]
+            )
+            return records
+
+        data_store.get_records = get_records_then_write
+        engine.run(cid)
+
+        assert cache.metrics()["entries"] == 0
+
+
+class TestAnalysisEngineDtype:
+    """特徴量行列の dtype 指定のテスト."""
+
+    def _run(self, tmp_path, dtype, monkeypatch):
+        (tmp_path / str(np.dtype(dtype))).mkdir()
+        data_store, result_store, cid = _sqlite_setup(
+            tmp_path / str(np.dtype(dtype))
+        )
+        definition = result_store.get_model_definition(cid)
+        definition.feature_config = FeatureConfig(
+            [FeatureSpec("raw_work_time"), FeatureSpec("moving_std")]
+        )
+        result_store.save_model_definition(definition)
+        fitted: list[np.ndarray] = []
+
+        def recording_fit(baseline, params, n_jobs, **kwargs):
+            fitted.append(baseline)
+            return fit_forest(baseline, params, n_jobs, **kwargs)
+
+        monkeypatch.setattr(
+            "backend.analysis.engine.fit_forest", recording_fit
+        )
+        AnalysisEngine(data_store, result_store, dtype=dtype).run(cid)
+        scores = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        return fitted[0], scores
+
+    def test_float32_gives_same_scores(self, tmp_path, monkeypatch):
+        """float32 の行列でも学習・採点結果は float64 と同じ."""
+        baseline64, scores64 = self._run(tmp_path, np.float64, monkeypatch)
+        baseline32, scores32 = self._run(tmp_path, np.float32, monkeypatch)
+
+        assert baseline64.dtype == np.float64
+        assert baseline32.dtype == np.float32
+        assert baseline32.flags.c_contiguous
+        assert scores32 == scores64
+
+    def test_invalid_dtype_raises(self, mock_data_store, mock_result_store):
+        with pytest.raises(ValueError, match="float32 or float64"):
+            AnalysisEngine(mock_data_store, mock_result_store, dtype=np.int64)
+
+
+class TestAnalysisEngineStreamingDetector:
+    """ストリーミング検知器による増分採点のテスト."""
+
+    def _setup(self, tmp_path, detector="ewma"):
+        from backend.result_store.sqlite import SqliteResultStore
+        from backend.store.sqlite import SqliteDataStore
+
+        data_store = SqliteDataStore(str(tmp_path / "s.db"))
+        result_store = SqliteResultStore(str(tmp_path / "r.db"))
+        cid = data_store.ensure_category_path(["A"])
+        rng = np.random.default_rng(0)
+        data_store.upsert_records(
+            [
+                WorkRecord(cid, 10.0 + rng.normal(scale=0.5), _day(i))
+                for i in range(30)
+            ]
+        )
+        result_store.save_model_definition(
+            ModelDefinition(
+                category_id=cid,
+                baseline_start=_day(0),
+                baseline_end=_day(5),
+                sensitivity=0.5,
+                anomaly_params={"detector": detector},
+            )
+        )
+        return data_store, result_store, cid
+
+    def test_scores_all_points_on_first_run(self, tmp_path):
+        data_store, result_store, cid = self._setup(tmp_path)
+        AnalysisEngine(data_store, result_store).run(cid)
+        assert len(result_store.get_anomaly_results(cid)) == 30
+
+    def test_appended_points_scored_incrementally(self, tmp_path):
+        """追記分だけを採点し、結果は全件の再計算と一致する."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        engine = AnalysisEngine(data_store, result_store)
+        engine.run(cid)
+        data_store.upsert_records(
+            [WorkRecord(cid, 30.0, _day(30)), WorkRecord(cid, 10.0, _day(31))]
+        )
+
+        saved: list[int] = []
+        original = result_store.save_anomaly_results
+
+        def recording_save(results, model_version=None):
+            saved.append(len(results))
+            return original(results, model_version)
+
+        result_store.save_anomaly_results = recording_save
+        engine.run(cid)
+        assert saved == [2]
+
+        incremental = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        assert incremental[_day(30)] == 1.0
+
+        result_store.delete_model_artifact(cid)
+        engine.run(cid)
+        replayed = {
+            r.recorded_at: r.anomaly_score
+            for r in result_store.get_anomaly_results(cid)
+        }
+        assert replayed == incremental
+
+    def test_backfilled_point_triggers_replay(self, tmp_path):
+        """過去への挿入があれば先頭から再計算する."""
+        data_store, result_store, cid = self._setup(tmp_path)
+        engine = AnalysisEngine(data_store, result_store)
+        engine.run(cid)
+        data_store.upsert_records(
+            [WorkRecord(cid, 10.0, datetime(2025, 1, 1, 12))]
+        )
+        engine.run(cid)
+        assert len(result_store.get_anomaly_results(cid)) == 31
+        artifact = result_store.get_model_artifact(cid)
+        assert artifact.meta["seen"] == 31
+
+    def test_changed_detector_replays(self, tmp_path):
+        data_store, result_store, cid = self._setup(tmp_path)
+        engine = AnalysisEngine(data_store, result_store)
+        engine.run(cid)
+        before = result_store.get_model_artifact(cid).definition_hash
+
+        definition = result_store.get_model_definition(cid)
+        definition.anomaly_params = {"detector": "cusum"}
+        result_store.save_model_definition(definition)
+        engine.run(cid)
+
+        artifact = result_store.get_model_artifact(cid)
+        assert artifact.definition_hash != before
+        assert set(artifact.meta["state"]) >= {"upper", "lower"}
+
+
+def _day(i: int) -> datetime:
+    return datetime(2025, 1, 1) + timedelta(days=i)
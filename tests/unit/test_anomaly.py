@@ -1,8 +1,14 @@
 """IsolationForest 異常検知のユニットテスト."""
 
 import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
 
-from backend.analysis.anomaly import train_and_score
+from backend.analysis.anomaly import (
+    fit_forest,
+    sweep_contamination,
+    train_and_score,
+)
 
 
 class TestTrainAndScore:
@@ -174,3 +180,55 @@ class TestScoreNormalization:
 
         assert scores.shape == (15,)
         assert np.all(np.isfinite(scores))
+
+
+class TestSweepContamination:
+    """sweep_contamination() のテスト."""
+
+    CONTAMINATIONS = [0.01, 0.05, 0.1, 0.3]
+
+    def _data(self):
+        rng = np.random.default_rng(7)
+        baseline = rng.normal(10.0, 0.5, size=(300, 2))
+        all_data = np.vstack([baseline, rng.normal(10.0, 3.0, size=(40, 2))])
+        return baseline, all_data
+
+    def test_matches_individual_fits(self):
+        """各行が contamination ごとに学習し直した結果と一致する."""
+        baseline, all_data = self._data()
+        sweep = sweep_contamination(
+            fit_forest(baseline), all_data, self.CONTAMINATIONS
+        )
+        for i, c in enumerate(self.CONTAMINATIONS):
+            expected = train_and_score(
+                baseline, all_data, anomaly_params={"contamination": c}
+            )
+            np.testing.assert_allclose(sweep.scores[i], expected, atol=1e-12)
+
+    def test_flags_match_sklearn_predict(self):
+        baseline, all_data = self._data()
+        sweep = sweep_contamination(
+            fit_forest(baseline), all_data, self.CONTAMINATIONS
+        )
+        for i, c in enumerate(self.CONTAMINATIONS):
+            model = IsolationForest(contamination=c, random_state=42)
+            model.fit(baseline)
+            np.testing.assert_array_equal(
+                sweep.flags[i], model.predict(all_data) == -1
+            )
+            assert sweep.thresholds[i] == pytest.approx(-model.offset_)
+
+    def test_higher_contamination_flags_superset(self):
+        baseline, all_data = self._data()
+        sweep = sweep_contamination(
+            fit_forest(baseline), all_data, self.CONTAMINATIONS
+        )
+        counts = sweep.flags.sum(axis=1)
+        assert list(counts) == sorted(counts)
+        assert np.all(sweep.flags[:-1] <= sweep.flags[1:])
+
+    @pytest.mark.parametrize("contaminations", [[], [0.0], [0.6]])
+    def test_rejects_invalid_contamination(self, contaminations):
+        baseline, all_data = self._data()
+        with pytest.raises(ValueError):
+            sweep_contamination(fit_forest(baseline), all_data, contaminations)
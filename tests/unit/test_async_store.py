@@ -0,0 +1,110 @@
+"""Store 非同期アダプタのユニットテスト。"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.ingestion.async_store import AsyncDataStore, AsyncResultStore
+from backend.interfaces.data_store import DataStoreInterface, WorkRecord
+from backend.interfaces.result_store import ResultStoreInterface
+
+
+def _run(coro):
+    """async テストを同期的に実行するヘルパー。"""
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="db-test")
+    yield pool
+    pool.shutdown()
+
+
+class TestAsyncDataStore:
+    """AsyncDataStore の委譲と非ブロッキング性。"""
+
+    def test_delegates_to_sync_store(self, executor):
+        """呼び出しが同期ストアに同じ引数で委譲される。"""
+        store = MagicMock(spec=DataStoreInterface)
+        store.get_records.return_value = [
+            WorkRecord(
+                category_id=1, work_time=1.0, recorded_at=datetime(2025, 1, 1)
+            )
+        ]
+        adapter = AsyncDataStore(store, executor)
+
+        records = _run(adapter.get_records(1, start=datetime(2025, 1, 1)))
+
+        assert len(records) == 1
+        store.get_records.assert_called_once_with(
+            1, start=datetime(2025, 1, 1), end=None
+        )
+
+    def test_runs_on_dedicated_executor(self, executor):
+        """同期処理は DB 用 Executor のスレッドで実行される。"""
+        store = MagicMock(spec=DataStoreInterface)
+        thread_names = []
+        store.get_category_tree.side_effect = lambda _root: (
+            thread_names.append(threading.current_thread().name) or []
+        )
+        adapter = AsyncDataStore(store, executor)
+
+        _run(adapter.get_category_tree())
+
+        assert thread_names[0].startswith("db-test")
+
+    def test_slow_query_does_not_block_event_loop(self, executor):
+        """遅いクエリの実行中もイベントループは他の処理を進められる。"""
+        store = MagicMock(spec=DataStoreInterface)
+        store.get_category_tree.side_effect = lambda _root: time.sleep(0.5)
+        adapter = AsyncDataStore(store, executor)
+
+        async def _test():
+            slow = asyncio.create_task(adapter.get_category_tree())
+            started = time.monotonic()
+            await asyncio.sleep(0.01)
+            ticked_after = time.monotonic() - started
+            await slow
+            return ticked_after
+
+        assert _run(_test()) < 0.25
+
+    def test_run_batches_multiple_operations(self, executor):
+        """run() で任意の同期処理を1回のディスパッチで実行できる。"""
+        store = MagicMock(spec=DataStoreInterface)
+        store.ensure_category_path.side_effect = [10, 11]
+        adapter = AsyncDataStore(store, executor)
+
+        def _ensure_both(s):
+            return [
+                s.ensure_category_path(["A"]),
+                s.ensure_category_path(["B"]),
+            ]
+
+        assert _run(adapter.run(_ensure_both, adapter.sync)) == [10, 11]
+
+
+class TestAsyncResultStore:
+    """AsyncResultStore の委譲。"""
+
+    def test_get_model_definition(self, executor):
+        store = MagicMock(spec=ResultStoreInterface)
+        store.get_model_definition.return_value = None
+        adapter = AsyncResultStore(store, executor)
+
+        assert _run(adapter.get_model_definition(3)) is None
+        store.get_model_definition.assert_called_once_with(3)
+
+    def test_delete_all_data(self, executor):
+        store = MagicMock(spec=ResultStoreInterface)
+        adapter = AsyncResultStore(store, executor)
+
+        _run(adapter.delete_all_data())
+
+        store.delete_all_data.assert_called_once_with()
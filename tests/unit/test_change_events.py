@@ -0,0 +1,78 @@
+"""ChangeBatcher のユニットテスト。"""
+
+from unittest.mock import MagicMock
+
+from backend.ingestion.change_events import (
+    CATEGORIES_CHANGED,
+    RECORDS_APPENDED,
+    ChangeBatcher,
+)
+from backend.ingestion.event_bus import EventBus
+
+
+def _published(bus: MagicMock) -> list[tuple[str, dict]]:
+    return [c.args for c in bus.publish.call_args_list]
+
+
+class TestChangeBatcher:
+    """変更イベントの集約を検証する。"""
+
+    def test_interval_zero_publishes_immediately(self):
+        """interval=0 では emit ごとに即時 publish される。"""
+        bus = MagicMock(spec=EventBus)
+        changes = ChangeBatcher(bus, interval=0)
+        changes.emit(RECORDS_APPENDED, [2], {2: 5})
+        assert _published(bus) == [
+            (RECORDS_APPENDED, {"category_ids": [2], "versions": {2: 5}})
+        ]
+
+    def test_burst_is_merged_per_event_type(self):
+        """ウィンドウ内の同種イベントは和集合・最新バージョンにまとまる。"""
+        bus = MagicMock(spec=EventBus)
+        changes = ChangeBatcher(bus, interval=60)
+        changes.emit(CATEGORIES_CHANGED, [3])
+        changes.emit(RECORDS_APPENDED, [1, 2], {1: 4, 2: 4})
+        changes.emit(RECORDS_APPENDED, [2], {2: 6})
+        bus.publish.assert_not_called()
+
+        changes.close()
+        assert _published(bus) == [
+            (CATEGORIES_CHANGED, {"category_ids": [3], "versions": {}}),
+            (
+                RECORDS_APPENDED,
+                {"category_ids": [1, 2], "versions": {1: 4, 2: 6}},
+            ),
+        ]
+
+    def test_timer_flushes_after_interval(self):
+        """interval 経過後にタイマーで publish される。"""
+        bus = MagicMock(spec=EventBus)
+        changes = ChangeBatcher(bus, interval=0.01)
+        changes.emit(RECORDS_APPENDED, [1], {1: 1})
+        changes._timer.join(timeout=1)
+        assert bus.publish.call_count == 1
+
+    def test_flush_without_pending_is_noop(self):
+        """保留がなければ何も publish しない。"""
+        bus = MagicMock(spec=EventBus)
+        ChangeBatcher(bus, interval=60).close()
+        bus.publish.assert_not_called()
+
+    def test_listener_receives_merged_event(self):
+        """listener は集約後の ids / versions を受け取る（例外は無視）。"""
+        bus = MagicMock(spec=EventBus)
+        changes = ChangeBatcher(bus, interval=60)
+        received = []
+        changes.add_listener(RECORDS_APPENDED, MagicMock(side_effect=OSError))
+        changes.add_listener(
+            RECORDS_APPENDED,
+            lambda ids, versions: received.append((ids, versions)),
+        )
+        changes.emit(RECORDS_APPENDED, [2, 1], {1: 4, 2: 4})
+        changes.emit(RECORDS_APPENDED, [2], {2: 6})
+        changes.emit(CATEGORIES_CHANGED, [3])
+        assert received == []
+
+        changes.close()
+        assert received == [([1, 2], {1: 4, 2: 6})]
+        assert bus.publish.call_count == 2
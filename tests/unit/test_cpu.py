@@ -0,0 +1,93 @@
+"""CPU 予算（cgroup クォータの読み取りと貸し出し）のテスト."""
+
+import threading
+
+import pytest
+
+from backend.analysis.cpu import CpuBudget, _cgroup_quota, available_cpus
+
+
+class TestCgroupQuota:
+    """cgroup v1/v2 のクォータ読み取り."""
+
+    def test_v2_quota(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+        assert _cgroup_quota(tmp_path) == 1.5
+
+    def test_v2_unlimited(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        assert _cgroup_quota(tmp_path) is None
+
+    def test_v1_quota(self, tmp_path):
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        assert _cgroup_quota(tmp_path) == 2.0
+
+    def test_v1_unlimited(self, tmp_path):
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        assert _cgroup_quota(tmp_path) is None
+
+    def test_missing_files(self, tmp_path):
+        assert _cgroup_quota(tmp_path) is None
+
+    def test_available_cpus_rounds_quota_up(self, tmp_path):
+        (tmp_path / "cpu.max").write_text("50000 100000\n")
+        assert available_cpus(tmp_path) == 1
+
+
+class TestCpuBudget:
+    """CpuBudget の貸し出し."""
+
+    def test_rejects_non_positive_total(self):
+        with pytest.raises(ValueError):
+            CpuBudget(0)
+
+    def test_first_lease_gets_everything(self):
+        budget = CpuBudget(4)
+        with budget.lease() as n:
+            assert n == 4
+            assert budget.in_use == 4
+        assert budget.in_use == 0
+
+    def test_lease_is_capped_by_want(self):
+        budget = CpuBudget(4)
+        with budget.lease(2) as n:
+            assert n == 2
+
+    def test_concurrent_leases_share_the_budget(self):
+        budget = CpuBudget(4)
+        with budget.lease(3) as first, budget.lease() as second:
+            assert (first, second) == (3, 1)
+
+    def test_exhausted_budget_still_grants_one(self):
+        """呼び出しスレッド分の 1 は必ず貸し、待たせない."""
+        budget = CpuBudget(2)
+        with budget.lease(), budget.lease() as n:
+            assert n == 1
+            assert budget.in_use == 3
+
+    def test_released_on_error(self):
+        budget = CpuBudget(2)
+        with pytest.raises(RuntimeError), budget.lease():
+            raise RuntimeError
+        assert budget.in_use == 0
+
+    def test_thread_safety(self):
+        budget = CpuBudget(8)
+        peak: list[int] = []
+
+        def work():
+            for _ in range(200):
+                with budget.lease(2):
+                    peak.append(budget.in_use)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert budget.in_use == 0
+        assert max(peak) <= 8
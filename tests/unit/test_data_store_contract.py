@@ -9,7 +9,8 @@
   3. 全テストがパスすることを確認
 """
 
-from datetime import UTC, datetime
+import threading
+from datetime import UTC, datetime, timedelta
 
 import pytest
 
@@ -187,3 +188,106 @@ class TestDatetimeNormalization:
         assert len(result) == 1
         assert result[0].recorded_at.tzinfo is None
         assert result[0].recorded_at == datetime(2025, 1, 1)
+
+
+class TestDataVersions:
+    """カテゴリごとのデータバージョンの契約テスト。"""
+
+    def _record(self, category_id: int, day: int) -> WorkRecord:
+        return WorkRecord(
+            category_id=category_id,
+            work_time=10.0,
+            recorded_at=datetime(2025, 1, day),
+        )
+
+    def test_no_records_no_version(self, data_store: DataStoreInterface):
+        """記録のないカテゴリはバージョンを持たない。"""
+        data_store.ensure_category_path(["V", "A"])
+        assert data_store.get_data_versions() == {}
+
+    def test_upsert_increments_version(self, data_store: DataStoreInterface):
+        """書き込みのたびにバージョンが増える。"""
+        cid = data_store.ensure_category_path(["V", "A"])
+        data_store.upsert_records([self._record(cid, 1)])
+        v1 = data_store.get_data_versions()[cid]
+        data_store.upsert_records([self._record(cid, 1)])
+        v2 = data_store.get_data_versions()[cid]
+        assert v2 > v1
+
+    def test_only_written_categories_change(
+        self, data_store: DataStoreInterface
+    ):
+        """書き込みのなかったカテゴリのバージョンは変わらない。"""
+        a = data_store.ensure_category_path(["V", "A"])
+        b = data_store.ensure_category_path(["V", "B"])
+        data_store.upsert_records([self._record(a, 1), self._record(b, 1)])
+        before = data_store.get_data_versions()
+        data_store.upsert_records([self._record(a, 2)])
+        after = data_store.get_data_versions()
+        assert after[a] > before[a]
+        assert after[b] == before[b]
+
+    def test_filter_by_category_ids(self, data_store: DataStoreInterface):
+        """category_ids 指定時はそのカテゴリのみ返す。"""
+        a = data_store.ensure_category_path(["V", "A"])
+        b = data_store.ensure_category_path(["V", "B"])
+        data_store.upsert_records([self._record(a, 1), self._record(b, 1)])
+        assert set(data_store.get_data_versions([a])) == {a}
+        assert data_store.get_data_versions([]) == {}
+
+    def test_version_not_reused_after_delete_all(
+        self, data_store: DataStoreInterface
+    ):
+        """全削除後もバージョンは巻き戻らない。"""
+        cid = data_store.ensure_category_path(["V", "A"])
+        data_store.upsert_records([self._record(cid, 1)])
+        old = data_store.get_data_versions()[cid]
+
+        data_store.delete_all_data()
+        assert data_store.get_data_versions() == {}
+
+        cid = data_store.ensure_category_path(["V", "A"])
+        data_store.upsert_records([self._record(cid, 1)])
+        assert data_store.get_data_versions()[cid] > old
+
+
+class TestConcurrentWrites:
+    """スレッド間で共有したインスタンスへの同時書き込み。"""
+
+    def test_failed_write_does_not_roll_back_others(
+        self, data_store: DataStoreInterface
+    ):
+        """他スレッドの失敗した書き込みが、成功した書き込みを巻き戻さない。"""
+        category_id = data_store.ensure_category_path(["P", "A"])
+        stop = threading.Event()
+        accepted = []
+
+        def fail_repeatedly():
+            # 存在しないカテゴリへの書き込みは外部キー制約で失敗する
+            bad = [WorkRecord(999_999, 1.0, datetime(2025, 1, 1))]
+            while not stop.is_set():
+                try:
+                    data_store.upsert_records(bad)
+                except Exception:
+                    continue
+                accepted.append(bad)
+
+        failing = threading.Thread(target=fail_repeatedly)
+        failing.start()
+        try:
+            for day in range(300):
+                data_store.upsert_records(
+                    [
+                        WorkRecord(
+                            category_id,
+                            float(day),
+                            datetime(2025, 1, 1) + timedelta(days=day),
+                        )
+                    ]
+                )
+        finally:
+            stop.set()
+            failing.join()
+
+        assert accepted == []
+        assert len(data_store.get_records(category_id)) == 300
@@ -0,0 +1,172 @@
+"""ストリーミング検知器のテスト."""
+
+import numpy as np
+import pytest
+
+from backend.analysis.detectors import (
+    DETECTOR_REGISTRY,
+    CusumDetector,
+    EwmaDetector,
+    RobustZDetector,
+    create_detector,
+    detector_name,
+)
+
+
+def _noisy(n: int, seed: int = 0) -> np.ndarray:
+    return 10.0 + np.random.default_rng(seed).normal(scale=0.5, size=n)
+
+
+@pytest.fixture(params=sorted(DETECTOR_REGISTRY))
+def name(request) -> str:
+    return request.param
+
+
+class TestScoreContract:
+    """全検知器に共通のスコア契約."""
+
+    def test_scores_in_unit_interval(self, name):
+        detector = create_detector({"detector": name})
+        values = np.concatenate([_noisy(100), [1000.0, -1000.0]])
+        scores = detector.update_many(values)
+        assert scores.shape == (102,)
+        assert np.all((scores >= 0.0) & (scores <= 1.0))
+
+    def test_warmup_scores_zero(self, name):
+        detector = create_detector({"detector": name})
+        assert detector.update(10.0) == 0.0
+
+    def test_normal_points_below_boundary(self, name):
+        detector = create_detector({"detector": name})
+        scores = detector.update_many(_noisy(200))
+        assert np.median(scores[50:]) < 0.5
+
+    def test_state_round_trip_continues_identically(self, name):
+        """状態を保存・復元して続きを流すと、一括処理と同じになる."""
+        values = np.concatenate([_noisy(80), [14.0, 15.0, 16.0], _noisy(20)])
+        whole = create_detector({"detector": name}).update_many(values)
+
+        first = create_detector({"detector": name})
+        head = first.update_many(values[:50])
+        second = create_detector({"detector": name})
+        second.set_state(first.get_state())
+        tail = second.update_many(values[50:])
+
+        np.testing.assert_array_equal(np.concatenate([head, tail]), whole)
+
+    def test_not_learned_points_leave_state_unchanged(self, name):
+        detector = create_detector({"detector": name})
+        detector.update_many(_noisy(60))
+        before = detector.get_state()
+        detector.update(500.0, learn=False)
+        assert detector.get_state() == before
+
+
+class TestDetectors:
+    """検知器ごとの挙動."""
+
+    def test_ewma_flags_spike(self):
+        detector = EwmaDetector(alpha=0.1, limit=3.0)
+        detector.update_many(_noisy(100))
+        assert detector.update(20.0) == 1.0
+
+    def test_robust_z_ignores_past_outlier(self):
+        """窓内の外れ値1点で基準がぶれない."""
+        detector = RobustZDetector(window=30)
+        values = _noisy(30)
+        values[10] = 1000.0
+        detector.update_many(values)
+        assert detector.update(10.0) < 0.5
+        assert detector.update(20.0) == 1.0
+
+    @pytest.mark.parametrize("window", [3, 4, 25, 200])
+    def test_robust_z_matches_sorted_mad(self, window):
+        """二分探索による MAD が、偏差を並べ替えて求めたものと一致する."""
+        rng = np.random.default_rng(window)
+        # 同値を多く含む系列と連続値の系列
+        values = np.concatenate(
+            [rng.integers(0, 4, 150).astype(float), rng.normal(10, 2, 150)]
+        )
+        detector = RobustZDetector(window=window, warmup=3)
+        scores = detector.update_many(values)
+
+        expected = np.zeros(len(values))
+        for i in range(3, len(values)):
+            recent = values[max(0, i - window) : i]
+            median = np.median(recent)
+            mad = np.median(np.abs(recent - median))
+            if mad > 0:
+                z = abs(values[i] - median) / (1.4826 * mad)
+                expected[i] = min(max(0.5 * z / 3.5, 0.0), 1.0)
+        np.testing.assert_allclose(scores, expected, atol=1e-12)
+
+    def test_robust_z_window_is_bounded(self):
+        detector = RobustZDetector(window=5, warmup=3)
+        detector.update_many(np.arange(20.0))
+        assert detector.get_state()["recent"] == [15.0, 16.0, 17.0, 18.0, 19.0]
+
+    def test_cusum_detects_small_sustained_shift(self):
+        """1σ 程度の持続的なシフトを、単発の点では検知しない大きさでも拾う."""
+        detector = CusumDetector(k=0.5, h=5.0, warmup=50)
+        detector.update_many(_noisy(50))
+        shifted = detector.update_many(_noisy(30, seed=1) + 0.5)
+        assert shifted[0] < 0.5
+        assert shifted.max() > 0.5
+
+    @pytest.mark.parametrize(
+        "cls, kwargs",
+        [
+            (EwmaDetector, {"alpha": 0}),
+            (EwmaDetector, {"limit": 0}),
+            (RobustZDetector, {"window": 2}),
+            (CusumDetector, {"h": 0}),
+        ],
+    )
+    def test_rejects_invalid_params(self, cls, kwargs):
+        with pytest.raises(ValueError):
+            cls(**kwargs)
+
+
+class TestRegistry:
+    """レジストリと anomaly_params からの選択."""
+
+    def test_default_is_isolation_forest(self):
+        assert detector_name(None) is None
+        assert detector_name({"contamination": 0.05}) is None
+        assert detector_name({"detector": "isolation_forest"}) is None
+
+    def test_selects_streaming_detector(self):
+        assert detector_name({"detector": "cusum"}) == "cusum"
+        detector = create_detector({"detector": "ewma", "alpha": 0.3})
+        assert isinstance(detector, EwmaDetector)
+
+    def test_unknown_detector(self):
+        with pytest.raises(ValueError, match="Unknown detector"):
+            detector_name({"detector": "nope"})
+
+    def test_unknown_param(self):
+        with pytest.raises(ValueError, match="Invalid parameters"):
+            create_detector({"detector": "ewma", "window": 3})
+
+    @pytest.mark.parametrize(
+        "params, message",
+        [
+            ({"detector": "ewma", "alpha": 0}, "ewma.alpha must be > 0"),
+            ({"detector": "ewma", "alpha": 1.5}, "ewma.alpha must be <= 1"),
+            ({"detector": "ewma", "warmup": 2.5}, "ewma.warmup must be"),
+            ({"detector": "cusum", "h": 0}, "cusum.h must be > 0"),
+            ({"detector": "robust_z", "window": 2}, "must be >= 3"),
+        ],
+    )
+    def test_params_validated_by_schema(self, params, message):
+        with pytest.raises(ValueError, match=message):
+            create_detector(params)
+
+    def test_registry_entries_have_metadata(self):
+        for entry in DETECTOR_REGISTRY.values():
+            assert {
+                "detector",
+                "label",
+                "description",
+                "params_schema",
+            } <= set(entry)
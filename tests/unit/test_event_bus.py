@@ -1,8 +1,15 @@
 """EventBus のユニットテスト。"""
 
 import asyncio
+import threading
 
-from backend.ingestion.event_bus import EventBus
+import pytest
+
+from backend.ingestion.event_bus import (
+    RESYNC_EVENT,
+    EventBus,
+    SlowConsumerError,
+)
 
 
 def _run(coro):
@@ -85,3 +92,167 @@ class TestEventBus:
                 assert events == ["first", "second", "third"]
 
         _run(_test())
+
+    def test_publish_from_worker_thread(self):
+        """ワーカースレッドからの publish もループ経由で届く。"""
+
+        async def _test():
+            bus = EventBus()
+            async with bus.subscribe() as queue:
+                thread = threading.Thread(
+                    target=bus.publish, args=("from-thread", {"n": 1})
+                )
+                thread.start()
+                thread.join()
+                msg = await asyncio.wait_for(queue.get(), timeout=1)
+                assert msg["event"] == "from-thread"
+
+        _run(_test())
+
+
+class TestBoundedQueue:
+    """subscriber キューの上限・合流・切断を検証する。"""
+
+    def test_identical_pending_events_are_coalesced(self):
+        """未読の同一イベントは1件にまとめられる。"""
+
+        async def _test():
+            bus = EventBus()
+            async with bus.subscribe() as queue:
+                for _ in range(5):
+                    bus.publish("dashboard-updated")
+                bus.publish("dashboard-updated", {"n": 1})
+                assert queue.qsize() == 2
+                assert bus.metrics()["coalesced"] == 4
+                first = await asyncio.wait_for(queue.get(), timeout=1)
+                assert first["data"] is None
+                # 読み出し後は同じイベントを再び受け付ける
+                bus.publish("dashboard-updated")
+                assert queue.qsize() == 2
+
+        _run(_test())
+
+    def test_drop_oldest_when_full(self):
+        """drop_oldest では最古のイベントを捨てて最新を残す。"""
+
+        async def _test():
+            bus = EventBus(max_queue_size=2)
+            async with bus.subscribe() as queue:
+                for n in range(4):
+                    bus.publish("e", {"n": n})
+                assert queue.qsize() == 2
+                got = [(await queue.get())["data"]["n"] for _ in range(2)]
+                assert got == [2, 3]
+                assert bus.metrics()["dropped"] == 2
+
+        _run(_test())
+
+    def test_disconnect_slow_consumer(self):
+        """disconnect では溢れた subscriber を切断する。"""
+
+        async def _test():
+            bus = EventBus(max_queue_size=1, slow_consumer_policy="disconnect")
+            async with bus.subscribe() as slow, bus.subscribe() as fast:
+                bus.publish("e", {"n": 0})
+                await fast.get()
+                bus.publish("e", {"n": 1})
+                assert bus.metrics()["subscribers"] == 1
+                assert bus.metrics()["disconnected"] == 1
+                # 切断前に積まれた分は読み出せ、その後は例外になる
+                assert (await slow.get())["data"] == {"n": 0}
+                with pytest.raises(SlowConsumerError):
+                    await slow.get()
+                assert (await fast.get())["data"] == {"n": 1}
+
+        _run(_test())
+
+    def test_metrics_report_queue_depth(self):
+        """metrics が購読者数とキュー深さを返す。"""
+
+        async def _test():
+            bus = EventBus(max_queue_size=10)
+            async with bus.subscribe(), bus.subscribe() as q2:
+                bus.publish("a")
+                bus.publish("b")
+                await q2.get()
+                metrics = bus.metrics()
+                assert metrics["subscribers"] == 2
+                assert metrics["queue_depth"] == 3
+                assert metrics["max_queue_depth"] == 2
+                assert metrics["published"] == 2
+            assert bus.metrics()["subscribers"] == 0
+
+        _run(_test())
+
+    def test_invalid_max_queue_size(self):
+        """max_queue_size は1以上。"""
+        with pytest.raises(ValueError):
+            EventBus(max_queue_size=0)
+
+
+class TestReplay:
+    """イベント id と Last-Event-ID による再送を検証する。"""
+
+    def test_ids_are_monotonic(self):
+        """publish ごとに増加する id が振られる。"""
+
+        async def _test():
+            bus = EventBus()
+            async with bus.subscribe() as queue:
+                bus.publish("a")
+                bus.publish("b")
+                ids = [(await queue.get())["id"] for _ in range(2)]
+                assert ids == [1, 2]
+
+        _run(_test())
+
+    def test_replays_missed_events(self):
+        """last_event_id 以降のイベントが先に届く。"""
+
+        async def _test():
+            bus = EventBus()
+            for name in ("a", "b", "c"):
+                bus.publish(name)
+            async with bus.subscribe(last_event_id=1) as queue:
+                bus.publish("d")
+                got = [(await queue.get())["event"] for _ in range(3)]
+                assert got == ["b", "c", "d"]
+
+        _run(_test())
+
+    def test_up_to_date_client_gets_nothing(self):
+        """最新 id で再接続した場合は再送しない。"""
+
+        async def _test():
+            bus = EventBus()
+            bus.publish("a")
+            async with bus.subscribe(last_event_id=1) as queue:
+                assert queue.qsize() == 0
+
+        _run(_test())
+
+    def test_resync_when_gap_left_buffer(self):
+        """バッファから消えた欠落は resync 1件で知らせる。"""
+
+        async def _test():
+            bus = EventBus(replay_size=2)
+            for name in ("a", "b", "c", "d"):
+                bus.publish(name)
+            async with bus.subscribe(last_event_id=1) as queue:
+                assert queue.qsize() == 1
+                msg = await queue.get()
+                assert msg["event"] == RESYNC_EVENT
+                assert msg["id"] == 4
+
+        _run(_test())
+
+    def test_resync_for_unknown_future_id(self):
+        """再起動前の（現在より大きい）id には resync で応じる。"""
+
+        async def _test():
+            bus = EventBus()
+            bus.publish("a")
+            async with bus.subscribe(last_event_id=99) as queue:
+                assert (await queue.get())["event"] == RESYNC_EVENT
+
+        _run(_test())
@@ -0,0 +1,75 @@
+"""変更イベントログの契約テスト。
+
+EventLogInterface の契約を検証する。
+"""
+
+import pytest
+
+from backend.interfaces.event_log import EventLogInterface
+
+
+@pytest.fixture
+def event_log(tmp_path):
+    """イベントログの実装インスタンスを返す。"""
+    from backend.store.event_log import SqliteEventLog
+
+    return SqliteEventLog(str(tmp_path / "events.db"))
+
+
+class TestEventLog:
+    """追記と読み出しの契約テスト。"""
+
+    def test_empty_log(self, event_log: EventLogInterface):
+        assert event_log.latest_id() == 0
+        assert event_log.read_since(0) == []
+
+    def test_append_and_read_in_order(self, event_log: EventLogInterface):
+        first = event_log.append("a", {"category_ids": [1]})
+        second = event_log.append("b")
+        assert second > first
+        assert event_log.latest_id() == second
+
+        events = event_log.read_since(0)
+        assert [(e.id, e.event) for e in events] == [
+            (first, "a"),
+            (second, "b"),
+        ]
+        assert events[0].data == {"category_ids": [1]}
+        assert events[1].data is None
+
+    def test_read_since_excludes_seen(self, event_log: EventLogInterface):
+        first = event_log.append("a")
+        event_log.append("b")
+        assert [e.event for e in event_log.read_since(first)] == ["b"]
+
+    def test_read_since_respects_limit(self, event_log: EventLogInterface):
+        for i in range(5):
+            event_log.append(f"e{i}")
+        assert [e.event for e in event_log.read_since(0, limit=2)] == [
+            "e0",
+            "e1",
+        ]
+
+
+class TestSharedAcrossConnections:
+    """同一ファイルを開いた別インスタンス（別プロセス相当）で共有される。"""
+
+    def test_other_instance_sees_appends(self, tmp_path):
+        from backend.store.event_log import SqliteEventLog
+
+        path = str(tmp_path / "events.db")
+        writer = SqliteEventLog(path)
+        reader = SqliteEventLog(path)
+        event_id = writer.append("x", {"n": 1})
+        assert reader.latest_id() == event_id
+        assert reader.read_since(0)[0].data == {"n": 1}
+
+    def test_old_events_pruned_beyond_retention(self, tmp_path):
+        from backend.store import event_log as module
+
+        log = module.SqliteEventLog(str(tmp_path / "e.db"), retention=10)
+        for _ in range(module.PRUNE_EVERY):
+            log.append("e")
+        events = log.read_since(0, limit=module.PRUNE_EVERY)
+        assert len(events) == 10
+        assert events[-1].id == log.latest_id()
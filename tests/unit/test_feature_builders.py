@@ -1,6 +1,7 @@
 """特徴量ビルダーのユニットテスト."""
 
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock
 
 import numpy as np
@@ -9,11 +10,26 @@ import pytest
 from backend.analysis.feature import (
     FEATURE_REGISTRY,
     CompositeFeatureBuilder,
+    DayOfWeekFeatureBuilder,
     DiffFeatureBuilder,
+    ElapsedTimeFeatureBuilder,
+    EwmaLevelFeatureBuilder,
+    EwmaVarianceFeatureBuilder,
+    InterArrivalFeatureBuilder,
     MovingAvgFeatureBuilder,
     MovingStdFeatureBuilder,
     RawWorkTimeFeatureBuilder,
+    RollingIQRFeatureBuilder,
+    RollingMedianFeatureBuilder,
+    RollingQuantileFeatureBuilder,
+    TimeOfDayFeatureBuilder,
+    TimeWindowCountFeatureBuilder,
+    TimeWindowMaxFeatureBuilder,
+    TimeWindowMeanFeatureBuilder,
+    TimeWindowMinFeatureBuilder,
+    TimeWindowStdFeatureBuilder,
     create_feature_builder,
+    validate_feature_params,
 )
 from backend.interfaces.feature import (
     FeatureBuilder,
@@ -64,7 +80,25 @@ class TestCompositeFeatureBuilder:
         ts = [datetime(2025, 1, 1), datetime(2025, 2, 1)]
         composite.build([10.0, 20.0], timestamps=ts)
 
-        mock_builder.build.assert_called_once_with([10.0, 20.0], ts)
+        mock_builder.build.assert_called_once()
+        work_times, timestamps = mock_builder.build.call_args[0]
+        np.testing.assert_array_equal(work_times, [10.0, 20.0])
+        assert timestamps == ts
+
+    def test_float32_output_is_rounded_float64(self):
+        """float32 指定 → 各特徴量を float64 で計算して丸めた C 連続配列."""
+        values = [10.1 + 0.37 * i for i in range(20)]
+        builders = [RawWorkTimeFeatureBuilder(), MovingStdFeatureBuilder(3)]
+        expected = CompositeFeatureBuilder(builders).build(values)
+        result = CompositeFeatureBuilder(builders, np.float32).build(values)
+        assert result.dtype == np.float32
+        assert result.flags.c_contiguous
+        np.testing.assert_array_equal(result, expected.astype(np.float32))
+
+        rows, _ = CompositeFeatureBuilder(
+            builders, np.float32
+        ).build_incremental(values)
+        assert rows.dtype == np.float32
 
 
 class TestDiffFeatureBuilder:
@@ -169,6 +203,183 @@ class TestMovingStdFeatureBuilder:
         assert result.shape == (0, 1)
 
 
+class TestRollingQuantileFeatureBuilders:
+    """移動中央値・分位点・四分位範囲のユニットテスト."""
+
+    def _expected(self, values, window, q):
+        result = np.zeros(len(values))
+        for i in range(window - 1, len(values)):
+            result[i] = np.quantile(values[i - window + 1 : i + 1], q)
+        return result
+
+    @pytest.mark.parametrize("window", [1, 2, 5, 12])
+    @pytest.mark.parametrize("q", [0.0, 0.1, 0.25, 0.5, 0.9, 1.0])
+    def test_matches_numpy_quantile(self, window, q):
+        """np.quantile（linear 補間）と一致する。同値を多く含む場合も."""
+        rng = np.random.default_rng(window)
+        for values in (
+            rng.normal(10.0, 2.0, 80),
+            rng.integers(0, 4, 80).astype(float),
+        ):
+            result = RollingQuantileFeatureBuilder(window, q).build(values)
+            np.testing.assert_allclose(
+                result[:, 0], self._expected(values, window, q), atol=1e-12
+            )
+
+    def test_median_ignores_single_outlier(self):
+        """単発の外れ値は移動中央値を動かさない."""
+        values = [10.0, 11.0, 10.0, 500.0, 11.0, 10.0]
+        result = RollingMedianFeatureBuilder(window=3).build(values)
+        np.testing.assert_array_equal(
+            result[:, 0], [0.0, 0.0, 10.0, 11.0, 11.0, 11.0]
+        )
+
+    def test_iqr(self):
+        values = np.arange(1.0, 11.0)
+        result = RollingIQRFeatureBuilder(window=5).build(values)
+        assert result.shape == (10, 1)
+        np.testing.assert_array_equal(result[:4, 0], 0.0)
+        # 連続する5値の p75 - p25 は常に 2
+        np.testing.assert_allclose(result[4:, 0], 2.0)
+
+    def test_shorter_than_window(self):
+        result = RollingMedianFeatureBuilder(window=5).build([1.0, 2.0])
+        np.testing.assert_array_equal(result, [[0.0], [0.0]])
+        assert RollingIQRFeatureBuilder().build([]).shape == (0, 1)
+
+    def test_invalid_q_raises(self):
+        with pytest.raises(ValueError, match="q must be"):
+            RollingQuantileFeatureBuilder(q=1.5)
+
+
+class TestEwmaFeatureBuilders:
+    """指数加重移動平均・分散のユニットテスト."""
+
+    def _expected(self, values, alphas):
+        """1件ずつ更新する素朴な実装."""
+        levels, variances = [], []
+        level = var = None
+        for x, alpha in zip(values, alphas, strict=True):
+            if level is None:
+                level, var = x, 0.0
+            else:
+                diff = x - level
+                level += alpha * diff
+                var = (1 - alpha) * (var + alpha * diff**2)
+            levels.append(level)
+            variances.append(var)
+        return np.array(levels), np.array(variances)
+
+    def test_record_half_life_matches_loop(self):
+        values = np.random.default_rng(0).normal(10.0, 2.0, 3000)
+        level, var = self._expected(values, [1 - 0.5 ** (1 / 7)] * 3000)
+        np.testing.assert_allclose(
+            EwmaLevelFeatureBuilder("7").build(values)[:, 0], level, atol=1e-9
+        )
+        np.testing.assert_allclose(
+            EwmaVarianceFeatureBuilder("7").build(values)[:, 0],
+            var,
+            atol=1e-9,
+        )
+
+    def test_time_half_life_matches_loop(self):
+        """不規則な間隔・同時刻・非常に長い空白を含む場合も一致する."""
+        rng = np.random.default_rng(1)
+        values = rng.normal(10.0, 2.0, 3000)
+        seconds = np.cumsum(rng.choice([0, 60, 3600, 400 * 86400], 3000))
+        ts = [
+            datetime(2020, 1, 1) + timedelta(seconds=int(s)) for s in seconds
+        ]
+        gaps = np.diff(seconds, prepend=seconds[0])
+        level, var = self._expected(values, 1 - 0.5 ** (gaps / 3600))
+        np.testing.assert_allclose(
+            EwmaLevelFeatureBuilder("1h").build(values, ts)[:, 0],
+            level,
+            atol=1e-9,
+        )
+        np.testing.assert_allclose(
+            EwmaVarianceFeatureBuilder("1h").build(values, ts)[:, 0],
+            var,
+            atol=1e-9,
+        )
+
+    def test_half_life_far_shorter_than_gap(self):
+        """前の値の重みが float64 で 0 になる半減期でも正しく解ける."""
+        values = np.random.default_rng(3).normal(10.0, 2.0, 5000)
+        ts = np.datetime64("2025-01-01", "us") + np.arange(
+            5000
+        ) * np.timedelta64(1, "h")
+        level = EwmaLevelFeatureBuilder("1s").build(values, ts)
+        var = EwmaVarianceFeatureBuilder("1s").build(values, ts)
+        np.testing.assert_allclose(level[:, 0], values, atol=1e-12)
+        np.testing.assert_allclose(var[:, 0], 0.0, atol=1e-12)
+
+    def test_half_life_weight(self):
+        """半減期ぶん経過すると、前の水準の重みは半分になる."""
+        ts = [datetime(2025, 1, 1), datetime(2025, 1, 2)]
+        by_time = EwmaLevelFeatureBuilder("1d").build([0.0, 10.0], ts)
+        by_records = EwmaLevelFeatureBuilder("1").build([0.0, 10.0])
+        np.testing.assert_allclose(by_time[:, 0], [0.0, 5.0])
+        np.testing.assert_allclose(by_records[:, 0], [0.0, 5.0])
+
+    def test_incremental_time_half_life_matches_batch(self):
+        values = np.random.default_rng(2).normal(10.0, 2.0, 40)
+        ts = [datetime(2025, 1, 1) + timedelta(hours=3 * i) for i in range(40)]
+        builder = EwmaVarianceFeatureBuilder("1d")
+        head, state = builder.build_incremental(values[:25], ts[:25])
+        tail, _ = builder.build_incremental(values[25:], ts[25:], state)
+        np.testing.assert_allclose(
+            np.vstack([head, tail]), builder.build(values, ts), atol=1e-12
+        )
+
+    def test_empty_and_errors(self):
+        assert EwmaLevelFeatureBuilder().build([]).shape == (0, 1)
+        with pytest.raises(ValueError, match="half_life"):
+            EwmaLevelFeatureBuilder("0")
+        with pytest.raises(ValueError, match="sorted"):
+            EwmaLevelFeatureBuilder("1h").build(
+                [1.0, 2.0], [datetime(2025, 1, 2), datetime(2025, 1, 1)]
+            )
+        with pytest.raises(ValueError, match="timestamps"):
+            EwmaLevelFeatureBuilder("1h").build([1.0, 2.0])
+
+
+class TestValidateFeatureParams:
+    """params_schema によるパラメータ検証のユニットテスト."""
+
+    def test_valid_params(self):
+        validate_feature_params("rolling_quantile", {"window": 9, "q": 0.9})
+        validate_feature_params("rolling_quantile", {"q": 1})
+        validate_feature_params("window_mean", {"window": "7d"})
+        validate_feature_params("raw_work_time", {})
+        validate_feature_params("ewma_var", {"half_life": "24h"})
+
+    @pytest.mark.parametrize(
+        ("feature_type", "params", "message"),
+        [
+            ("nope", {}, "Unknown feature type"),
+            ("moving_avg", {"size": 3}, "Unknown parameter"),
+            ("moving_avg", {"window": 2.5}, "must be integer"),
+            ("moving_avg", {"window": True}, "must be integer"),
+            ("moving_avg", {"window": "5"}, "must be integer"),
+            ("moving_avg", {"window": 1}, ">= 2"),
+            ("rolling_quantile", {"q": -0.1}, ">= 0"),
+            ("rolling_quantile", {"q": 1.5}, "<= 1"),
+            ("window_max", {"window": "3 days"}, "must match"),
+            ("window_mean", {"window": "0h"}, "must match"),
+            ("ewma_level", {"half_life": "0"}, "must match"),
+        ],
+    )
+    def test_invalid_params(self, feature_type, params, message):
+        with pytest.raises(ValueError, match=message):
+            validate_feature_params(feature_type, params)
+
+    def test_factory_validates(self):
+        config = FeatureConfig([FeatureSpec("rolling_median", {"window": 0})])
+        with pytest.raises(ValueError, match="rolling_median.window"):
+            create_feature_builder(config)
+
+
 class TestFeatureRegistry:
     """FEATURE_REGISTRY の検証."""
 
@@ -235,6 +446,14 @@ class TestCreateFeatureBuilder:
         result = builder.build([10.0, 20.0])
         assert result.shape == (2, 2)
 
+    def test_dtype_is_passed_to_composite(self):
+        """dtype 指定 → 結合した行列がその dtype になる."""
+        config = FeatureConfig(
+            features=[FeatureSpec("raw_work_time"), FeatureSpec("diff")]
+        )
+        builder = create_feature_builder(config, np.float32)
+        assert builder.build([10.0, 20.0]).dtype == np.float32
+
     def test_unknown_feature_type_raises(self):
         """未知の feature_type → ValueError."""
         config = FeatureConfig(
@@ -295,3 +514,300 @@ class TestFeatureSpecDataclass:
         config = FeatureConfig()
         with pytest.raises(AttributeError):
             config.features = []
+
+
+class TestTimestampFeatureBuilders:
+    """記録日時を使う特徴量ビルダーのユニットテスト."""
+
+    TS = [
+        datetime(2025, 1, 6, 0, 0),  # 月曜
+        datetime(2025, 1, 6, 6, 0),
+        datetime(2025, 1, 8, 12, 0),  # 水曜
+        datetime(2025, 1, 12, 18, 0),  # 日曜
+    ]
+
+    def test_inter_arrival_hours(self):
+        result = InterArrivalFeatureBuilder().build([1.0] * 4, self.TS)
+        np.testing.assert_allclose(result[:, 0], [0.0, 6.0, 54.0, 102.0])
+
+    def test_time_of_day_is_cyclic(self):
+        result = TimeOfDayFeatureBuilder().build([1.0] * 4, self.TS)
+        assert result.shape == (4, 2)
+        # 0時 → 角度 0, 6時 → π/2, 12時 → π, 18時 → 3π/2
+        np.testing.assert_allclose(
+            result, [[0, 1], [1, 0], [0, -1], [-1, 0]], atol=1e-12
+        )
+
+    def test_day_of_week_matches_weekday(self):
+        result = DayOfWeekFeatureBuilder().build([1.0] * 4, self.TS)
+        week = np.array([(t.weekday() + t.hour / 24) / 7 for t in self.TS])
+        expected = np.column_stack(
+            [np.sin(2 * np.pi * week), np.cos(2 * np.pi * week)]
+        )
+        np.testing.assert_allclose(result, expected, atol=1e-12)
+
+    def test_elapsed_days(self):
+        result = ElapsedTimeFeatureBuilder().build([1.0] * 4, self.TS)
+        np.testing.assert_allclose(result[:, 0], [0.0, 0.25, 2.5, 6.75])
+
+    def test_accepts_datetime64_array(self):
+        ts = np.array(self.TS, dtype="datetime64[s]")
+        np.testing.assert_allclose(
+            ElapsedTimeFeatureBuilder().build([1.0] * 4, ts),
+            ElapsedTimeFeatureBuilder().build([1.0] * 4, self.TS),
+        )
+
+    @pytest.mark.parametrize(
+        "builder, d",
+        [
+            (InterArrivalFeatureBuilder(), 1),
+            (TimeOfDayFeatureBuilder(), 2),
+            (DayOfWeekFeatureBuilder(), 2),
+            (ElapsedTimeFeatureBuilder(), 1),
+        ],
+    )
+    def test_empty_input(self, builder, d):
+        assert builder.build([], []).shape == (0, d)
+
+    def test_requires_timestamps(self):
+        with pytest.raises(ValueError, match="timestamps"):
+            TimeOfDayFeatureBuilder().build([1.0, 2.0])
+
+    def test_rejects_length_mismatch(self):
+        with pytest.raises(ValueError, match="timestamps"):
+            ElapsedTimeFeatureBuilder().build([1.0, 2.0], self.TS)
+
+    def test_registered(self):
+        for key in ["inter_arrival", "time_of_day", "day_of_week", "elapsed"]:
+            assert key in FEATURE_REGISTRY
+
+
+class TestTimeWindowFeatureBuilders:
+    """時間幅の窓で集計する特徴量ビルダーのユニットテスト."""
+
+    def _series(self, n=300, seed=0):
+        rng = np.random.default_rng(seed)
+        # 数分〜数日の不規則な間隔（同時刻の記録も含む）
+        gaps = rng.choice([0, 5, 60, 600, 3000, 2 * 86400], size=n)
+        seconds = np.cumsum(gaps)
+        ts = [
+            datetime(2025, 1, 1) + timedelta(seconds=int(s)) for s in seconds
+        ]
+        return rng.normal(10.0, 2.0, size=n), ts
+
+    @staticmethod
+    def _brute(values, ts, window, fn):
+        # 同時刻の記録は自分より前に並ぶものだけを含む
+        return np.array(
+            [
+                fn([values[j] for j in range(i + 1) if ts[i] - window < ts[j]])
+                for i in range(len(ts))
+            ]
+        )
+
+    @pytest.mark.parametrize(
+        "builder_cls, fn",
+        [
+            (TimeWindowMeanFeatureBuilder, np.mean),
+            (TimeWindowStdFeatureBuilder, np.std),
+            (TimeWindowMinFeatureBuilder, np.min),
+            (TimeWindowMaxFeatureBuilder, np.max),
+            (TimeWindowCountFeatureBuilder, len),
+        ],
+    )
+    @pytest.mark.parametrize("window", ["1h", "24h", "7d"])
+    def test_matches_brute_force(self, builder_cls, fn, window):
+        values, ts = self._series()
+        result = builder_cls(window=window).build(values, ts)
+        span = {"1h": timedelta(hours=1), "24h": timedelta(days=1)}.get(
+            window, timedelta(days=7)
+        )
+        np.testing.assert_allclose(
+            result[:, 0], self._brute(values, ts, span, fn), atol=1e-9
+        )
+
+    def test_window_is_time_based_not_count_based(self):
+        ts = [
+            datetime(2025, 1, 1, 0),
+            datetime(2025, 1, 1, 1),
+            datetime(2025, 1, 3, 0),
+        ]
+        result = TimeWindowCountFeatureBuilder(window="24h").build(
+            [1.0, 2.0, 3.0], ts
+        )
+        np.testing.assert_array_equal(result[:, 0], [1, 2, 1])
+
+    @pytest.mark.parametrize("window", ["", "24", "0h", "3y", "h"])
+    def test_invalid_window(self, window):
+        with pytest.raises(ValueError, match="Invalid window"):
+            TimeWindowMeanFeatureBuilder(window=window)
+
+    def test_unsorted_timestamps_rejected(self):
+        ts = [datetime(2025, 1, 2), datetime(2025, 1, 1)]
+        with pytest.raises(ValueError, match="sorted"):
+            TimeWindowMaxFeatureBuilder().build([1.0, 2.0], ts)
+
+    def test_empty_input(self):
+        assert TimeWindowMinFeatureBuilder().build([], []).shape == (0, 1)
+
+    def test_registered_with_string_window(self):
+        for key in [
+            "window_mean",
+            "window_std",
+            "window_min",
+            "window_max",
+            "window_count",
+        ]:
+            schema = FEATURE_REGISTRY[key]["params_schema"]["window"]
+            assert schema["type"] == "string"
+            FEATURE_REGISTRY[key]["builder"](window=schema["default"])
+
+
+class TestIncrementalBuild:
+    """build_incremental を分割して呼んだ結果が build() と一致すること."""
+
+    def _series(self, n=60):
+        rng = np.random.default_rng(3)
+        seconds = np.cumsum(rng.choice([0, 600, 3600, 86400, 4 * 86400], n))
+        ts = [
+            datetime(2025, 1, 1) + timedelta(seconds=int(s)) for s in seconds
+        ]
+        return rng.normal(10.0, 2.0, size=n).tolist(), ts
+
+    def _incremental(self, builder, values, ts, cuts):
+        rows, state = [], None
+        bounds = [0, *cuts, len(values)]
+        for lo, hi in zip(bounds[:-1], bounds[1:], strict=True):
+            part, state = builder.build_incremental(
+                values[lo:hi], ts[lo:hi], state
+            )
+            rows.append(part)
+            # 永続化を想定し JSON を往復させる
+            state = json.loads(json.dumps(state))
+        return np.vstack(rows)
+
+    @pytest.mark.parametrize("feature_type", sorted(FEATURE_REGISTRY))
+    @pytest.mark.parametrize(
+        "cuts", [[], [1], [3, 4, 5], [10, 10, 30], list(range(1, 60))]
+    )
+    def test_matches_batch(self, feature_type, cuts):
+        builder = create_feature_builder(
+            FeatureConfig(features=[FeatureSpec(feature_type=feature_type)])
+        )
+        values, ts = self._series()
+        np.testing.assert_allclose(
+            self._incremental(builder, values, ts, cuts),
+            builder.build(values, ts),
+            rtol=1e-12,
+            atol=1e-9,
+        )
+
+    def test_composite_matches_batch(self):
+        builder = create_feature_builder(
+            FeatureConfig(
+                features=[
+                    FeatureSpec("diff"),
+                    FeatureSpec("moving_std", {"window": 3}),
+                    FeatureSpec("window_max", {"window": "2d"}),
+                    FeatureSpec("inter_arrival"),
+                ]
+            )
+        )
+        values, ts = self._series()
+        np.testing.assert_allclose(
+            self._incremental(builder, values, ts, [7, 20, 21]),
+            builder.build(values, ts),
+            atol=1e-9,
+        )
+
+    def test_empty_batch_keeps_state(self):
+        builder = DiffFeatureBuilder()
+        _, state = builder.build_incremental([1.0, 4.0])
+        rows, same = builder.build_incremental([], [], state)
+        assert rows.shape == (0, 1)
+        assert same == state
+
+    def test_unsupported_builder_raises(self):
+        class NoIncremental(FeatureBuilder):
+            def _build_impl(self, work_times, timestamps=None):
+                return np.zeros((len(work_times), 1))
+
+        with pytest.raises(NotImplementedError):
+            NoIncremental().build_incremental([1.0])
+
+
+class TestBuildInput:
+    """build() に渡す入力の扱い（コピーしない・書き込み不可）."""
+
+    def test_raw_returns_view_of_float64_input(self):
+        """float64 の ndarray → コピーせず入力のビューを返す."""
+        values = np.array([10.0, 20.0, 30.0])
+        result = RawWorkTimeFeatureBuilder().build(values)
+        assert np.shares_memory(result, values)
+        assert not result.flags.writeable
+        # 呼び出し側の配列は書き込み可能なまま
+        assert values.flags.writeable
+
+    def test_other_inputs_are_converted(self):
+        """リストや整数配列 → float64 に変換する."""
+        builder = RawWorkTimeFeatureBuilder()
+        for values in ([1, 2], np.array([1, 2]), (1.0, 2.0)):
+            result = builder.build(values)
+            assert result.dtype == np.float64
+            np.testing.assert_array_equal(result, [[1.0], [2.0]])
+
+    def test_two_dimensional_input_raises(self):
+        with pytest.raises(ValueError, match="1-dimensional"):
+            RawWorkTimeFeatureBuilder().build(np.zeros((2, 2)))
+
+    def test_builder_gets_read_only_input(self):
+        """入力への書き込みは ValueError になる."""
+
+        class InPlace(FeatureBuilder):
+            def _build_impl(self, work_times, timestamps=None):
+                work_times -= work_times.mean()
+                return work_times.reshape(-1, 1)
+
+        values = np.array([1.0, 2.0, 3.0])
+        with pytest.raises(ValueError, match="read-only"):
+            InPlace().build(values)
+        np.testing.assert_array_equal(values, [1.0, 2.0, 3.0])
+
+
+class TestInputMutationCheck:
+    """check_input_mutation（入力を変更するビルダーの検出）."""
+
+    @pytest.fixture(autouse=True)
+    def _enabled(self, monkeypatch):
+        monkeypatch.setattr(FeatureBuilder, "check_input_mutation", True)
+
+    def test_detects_mutation(self):
+        class Sneaky(FeatureBuilder):
+            def _build_impl(self, work_times, timestamps=None):
+                work_times.base[0] = 0.0
+                return np.zeros((len(work_times), 1))
+
+        with pytest.raises(RuntimeError, match="Sneaky modified its input"):
+            Sneaky().build(np.array([1.0, 2.0]))
+        with pytest.raises(RuntimeError, match="Sneaky"):
+            Sneaky().build_incremental(np.array([1.0, 2.0]))
+
+    def test_detects_timestamp_mutation(self):
+        class Reorders(FeatureBuilder):
+            def _build_impl(self, work_times, timestamps=None):
+                timestamps.reverse()
+                return np.zeros((len(work_times), 1))
+
+        ts = [datetime(2025, 1, 1), datetime(2025, 1, 2)]
+        with pytest.raises(RuntimeError, match="Reorders"):
+            Reorders().build([1.0, 2.0], ts)
+
+    @pytest.mark.parametrize("feature_type", sorted(FEATURE_REGISTRY))
+    def test_registered_builders_do_not_mutate(self, feature_type):
+        builder = create_feature_builder(
+            FeatureConfig(features=[FeatureSpec(feature_type=feature_type)])
+        )
+        values = np.linspace(5.0, 15.0, 40)
+        ts = [datetime(2025, 1, 1) + timedelta(hours=7 * i) for i in range(40)]
+        builder.build(values, ts)
+        builder.build_incremental(values, ts)
@@ -0,0 +1,206 @@
+"""FeatureCache のテスト."""
+
+import numpy as np
+import pytest
+
+from backend.analysis.feature_cache import FeatureCache, feature_config_hash
+from backend.interfaces.feature import FeatureConfig, FeatureSpec
+
+
+def _matrix(n: int, value: float = 1.0) -> np.ndarray:
+    """n 行 1 列（n * 8 バイト）の行列."""
+    return np.full((n, 1), value)
+
+
+class TestFeatureConfigHash:
+    def test_param_order_does_not_matter(self):
+        a = FeatureConfig(
+            [FeatureSpec("moving_std", {"window": 3, "ddof": 1})]
+        )
+        b = FeatureConfig(
+            [FeatureSpec("moving_std", {"ddof": 1, "window": 3})]
+        )
+        assert feature_config_hash(a) == feature_config_hash(b)
+
+    def test_differs_by_params_and_order(self):
+        a = FeatureConfig([FeatureSpec("moving_avg", {"window": 3})])
+        b = FeatureConfig([FeatureSpec("moving_avg", {"window": 4})])
+        c = FeatureConfig([FeatureSpec("raw_work_time"), FeatureSpec("diff")])
+        d = FeatureConfig([FeatureSpec("diff"), FeatureSpec("raw_work_time")])
+        assert feature_config_hash(a) != feature_config_hash(b)
+        assert feature_config_hash(c) != feature_config_hash(d)
+        assert feature_config_hash(None) != feature_config_hash(a)
+
+
+class TestFeatureCache:
+    def test_hit_and_miss_are_counted(self):
+        cache = FeatureCache(max_bytes=1024)
+        assert cache.get(1, 1, "h") is None
+        cache.put(1, 1, "h", _matrix(4), {"last": 1.0})
+
+        matrix, state = cache.get(1, 1, "h")
+        np.testing.assert_array_equal(matrix, _matrix(4))
+        assert state == {"last": 1.0}
+        assert cache.get(1, 2, "h") is None
+        assert cache.get(1, 1, "other") is None
+
+        metrics = cache.metrics()
+        assert metrics["hits"] == 1
+        assert metrics["misses"] == 3
+        assert metrics["hit_ratio"] == pytest.approx(0.25)
+        assert metrics["entries"] == 1
+        assert metrics["bytes"] == 32
+
+    def test_cached_matrix_is_read_only(self):
+        cache = FeatureCache(max_bytes=1024)
+        cache.put(1, 1, "h", _matrix(2))
+        matrix, _ = cache.get(1, 1, "h")
+        with pytest.raises(ValueError):
+            matrix[0, 0] = 5.0
+
+    def test_newer_version_replaces_older(self):
+        cache = FeatureCache(max_bytes=1024)
+        cache.put(1, 1, "a", _matrix(2))
+        cache.put(1, 1, "b", _matrix(2))
+        cache.put(2, 1, "a", _matrix(2))
+        cache.put(1, 2, "a", _matrix(3))
+
+        assert cache.get(1, 1, "a") is None
+        assert cache.get(1, 1, "b") is None
+        assert cache.get(2, 1, "a") is not None
+        assert cache.metrics()["entries"] == 2
+
+    def test_least_recently_used_is_evicted(self):
+        cache = FeatureCache(max_bytes=64)
+        cache.put(1, 1, "h", _matrix(4))
+        cache.put(2, 1, "h", _matrix(4))
+        cache.get(1, 1, "h")
+        cache.put(3, 1, "h", _matrix(4))
+
+        assert cache.get(2, 1, "h") is None
+        assert cache.get(1, 1, "h") is not None
+        assert cache.get(3, 1, "h") is not None
+        metrics = cache.metrics()
+        assert metrics["evictions"] == 1
+        assert metrics["bytes"] == 64
+
+    def test_oversized_entry_does_not_evict_others(self):
+        cache = FeatureCache(max_bytes=64)
+        cache.put(1, 1, "h", _matrix(4))
+        cache.put(2, 1, "h", _matrix(4))
+        cache.put(3, 1, "h", _matrix(20))
+
+        assert cache.get(3, 1, "h") is None
+        assert cache.get(1, 1, "h") is not None
+        assert cache.get(2, 1, "h") is not None
+        metrics = cache.metrics()
+        assert metrics["evictions"] == 0
+        assert metrics["entries"] == 2
+
+    def test_invalidate_and_clear(self):
+        cache = FeatureCache(max_bytes=1024)
+        cache.put(1, 1, "h", _matrix(2))
+        cache.put(2, 1, "h", _matrix(2))
+        cache.put(3, 1, "h", _matrix(2))
+
+        cache.invalidate([1, 2])
+        assert cache.get(1, 1, "h") is None
+        assert cache.get(3, 1, "h") is not None
+        cache.clear()
+        assert cache.get(3, 1, "h") is None
+        metrics = cache.metrics()
+        assert metrics["invalidations"] == 3
+        assert metrics["bytes"] == 0
+
+    def test_invalidate_keeps_newer_versions(self):
+        """versions を渡すとそれより古いバージョンだけを捨てる."""
+        cache = FeatureCache(max_bytes=1024)
+        cache.put(1, 3, "h", _matrix(2))
+        cache.put(2, 1, "h", _matrix(2))
+
+        cache.invalidate([1, 2], {1: 3, 2: 2})
+        assert cache.get(1, 3, "h") is not None
+        assert cache.get(2, 1, "h") is None
+        assert cache.metrics()["invalidations"] == 1
+
+
+class TestFeatureCacheSpill:
+    def test_evicted_entry_is_read_back_from_disk(self, tmp_path):
+        cache = FeatureCache(max_bytes=64, spill_dir=str(tmp_path))
+        cache.put(1, 1, "h", _matrix(4, 1.0), {"seen": 4})
+        cache.put(2, 1, "h", _matrix(4, 2.0))
+        cache.put(3, 1, "h", _matrix(4, 3.0))
+        assert len(list(tmp_path.rglob("*.npy"))) == 1
+
+        matrix, state = cache.get(1, 1, "h")
+        np.testing.assert_array_equal(matrix, _matrix(4, 1.0))
+        assert state == {"seen": 4}
+        assert not matrix.flags.writeable
+        metrics = cache.metrics()
+        assert metrics["spill_hits"] == 1
+        # 読み戻したぶん、メモリから 2 が書き出される
+        assert metrics["spill_entries"] == 1
+        assert cache.get(2, 1, "h") is not None
+
+    def test_oversized_entry_is_served_from_disk(self, tmp_path):
+        cache = FeatureCache(max_bytes=64, spill_dir=str(tmp_path))
+        cache.put(1, 1, "h", _matrix(4))
+        cache.put(2, 1, "h", _matrix(20, 2.0))
+
+        for _ in range(2):
+            matrix, _ = cache.get(2, 1, "h")
+            np.testing.assert_array_equal(matrix, _matrix(20, 2.0))
+        metrics = cache.metrics()
+        assert metrics["spill_hits"] == 2
+        assert metrics["evictions"] == 0
+        assert metrics["entries"] == 1
+        assert cache.get(1, 1, "h") is not None
+
+    def test_spill_is_bounded(self, tmp_path):
+        cache = FeatureCache(
+            max_bytes=32, spill_dir=str(tmp_path), max_spill_bytes=64
+        )
+        for cid in range(1, 5):
+            cache.put(cid, 1, "h", _matrix(4))
+
+        metrics = cache.metrics()
+        assert metrics["spill_entries"] == 2
+        assert metrics["spill_bytes"] == 64
+        assert len(list(tmp_path.rglob("*.npy"))) == 2
+        assert cache.get(1, 1, "h") is None
+
+    def test_invalidate_removes_spilled_files(self, tmp_path):
+        cache = FeatureCache(max_bytes=32, spill_dir=str(tmp_path))
+        cache.put(1, 1, "h", _matrix(4))
+        cache.put(2, 1, "h", _matrix(4))
+        cache.invalidate([1])
+
+        assert list(tmp_path.rglob("*.npy")) == []
+        assert cache.metrics()["spill_entries"] == 0
+
+    def test_instances_do_not_share_files(self, tmp_path):
+        """同じ spill_dir を指定した別プロセス（インスタンス）と干渉しない."""
+        first = FeatureCache(max_bytes=32, spill_dir=str(tmp_path))
+        first.put(1, 1, "h", _matrix(4, 1.0))
+        first.put(2, 1, "h", _matrix(4))
+
+        second = FeatureCache(max_bytes=32, spill_dir=str(tmp_path))
+        second.put(1, 1, "h", _matrix(4, 5.0))
+        second.put(2, 1, "h", _matrix(4))
+        assert len(list(tmp_path.rglob("*.npy"))) == 2
+
+        matrix, _ = first.get(1, 1, "h")
+        np.testing.assert_array_equal(matrix, _matrix(4, 1.0))
+
+    def test_close_removes_own_directory(self, tmp_path):
+        cache = FeatureCache(max_bytes=32, spill_dir=str(tmp_path))
+        other = FeatureCache(max_bytes=32, spill_dir=str(tmp_path))
+        cache.put(1, 1, "h", _matrix(4))
+        cache.put(2, 1, "h", _matrix(4))
+        other.put(1, 1, "h", _matrix(4))
+        other.put(2, 1, "h", _matrix(4))
+
+        cache.close()
+        assert len(list(tmp_path.rglob("*.npy"))) == 1
+        assert len(list((tmp_path / "feature_cache").iterdir())) == 1
+        assert cache.get(1, 1, "h") is None
@@ -0,0 +1,187 @@
+"""ForestArtifact（IsolationForest のフラット配列表現）のテスト."""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+
+from backend.analysis.anomaly import fit_forest, train_and_score
+from backend.analysis.forest import (
+    CHUNK_CELLS,
+    ForestArtifact,
+    definition_hash,
+)
+
+
+def _fitted(x: np.ndarray, **params) -> IsolationForest:
+    return IsolationForest(random_state=42, **params).fit(x)
+
+
+class TestSklearnEquivalence:
+    """scikit-learn と同じスコアを返すこと."""
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {},
+            {"n_estimators": 10, "max_samples": 16},
+            {"max_features": 0.5, "contamination": 0.1},
+        ],
+    )
+    def test_matches_score_samples(self, params):
+        rng = np.random.default_rng(0)
+        x = rng.normal(size=(300, 3))
+        model = _fitted(x, **params)
+        forest = ForestArtifact.from_sklearn(model, model.score_samples(x))
+
+        test = np.vstack([x, rng.normal(scale=4.0, size=(50, 3))])
+        np.testing.assert_allclose(
+            forest.score_samples(test), model.score_samples(test)
+        )
+        np.testing.assert_allclose(
+            forest.decision_function(test), model.decision_function(test)
+        )
+
+    def test_float32_rounding_matches(self):
+        """閾値付近の値も sklearn と同じく float32 に丸めて比較する."""
+        x = np.linspace(0.0, 1.0, 64).reshape(-1, 1) + 1e-9
+        model = _fitted(x, n_estimators=5)
+        forest = ForestArtifact.from_sklearn(model, model.score_samples(x))
+        np.testing.assert_allclose(
+            forest.score_samples(x), model.score_samples(x)
+        )
+
+    def test_matches_across_chunks(self):
+        """行の分割境界をまたいでも sklearn と一致する."""
+        rng = np.random.default_rng(4)
+        x = rng.normal(size=(500, 2))
+        model = _fitted(x, n_estimators=50)
+        forest = ForestArtifact.from_sklearn(model, model.score_samples(x))
+        test = rng.normal(size=(2 * CHUNK_CELLS // 50 + 7, 2))
+        np.testing.assert_allclose(
+            forest.score_samples(test), model.score_samples(test)
+        )
+
+    def test_missing_values_follow_sklearn(self):
+        """NaN はノードごとに学習された向きへ進む."""
+        rng = np.random.default_rng(5)
+        x = rng.normal(size=(200, 3))
+        model = _fitted(x, n_estimators=20)
+        forest = ForestArtifact.from_sklearn(model, model.score_samples(x))
+        test = rng.normal(size=(30, 3))
+        test[::3, 0] = np.nan
+        test[1::4, 2] = np.nan
+        np.testing.assert_allclose(
+            forest.score_samples(test), model.score_samples(test)
+        )
+
+    def test_single_training_sample(self):
+        x = np.array([[1.0]])
+        model = _fitted(x, n_estimators=3)
+        forest = ForestArtifact.from_sklearn(model, model.score_samples(x))
+        np.testing.assert_allclose(
+            forest.score_samples(x), model.score_samples(x)
+        )
+
+    def test_rejects_wrong_width(self):
+        forest = fit_forest(np.zeros((10, 2)))
+        with pytest.raises(ValueError, match="features"):
+            forest.score_samples(np.zeros((3, 1)))
+
+
+class TestWithContamination:
+    """with_contamination() は再学習した結果と一致すること."""
+
+    @pytest.mark.parametrize("contamination", [0.01, 0.2, "auto"])
+    def test_matches_refit(self, contamination):
+        rng = np.random.default_rng(6)
+        baseline = rng.normal(size=(200, 2))
+        test = rng.normal(scale=3.0, size=(40, 2))
+        model = _fitted(baseline, contamination=contamination)
+        expected = fit_forest(baseline, {"contamination": contamination})
+
+        forest = fit_forest(baseline).with_contamination(contamination)
+        assert forest.offset == pytest.approx(model.offset_)
+        np.testing.assert_allclose(
+            forest.decision_function(test), model.decision_function(test)
+        )
+        np.testing.assert_array_equal(
+            forest.normalized_scores(test), expected.normalized_scores(test)
+        )
+
+    def test_normalize_matches_scoring(self):
+        rng = np.random.default_rng(8)
+        baseline = rng.normal(size=(100, 1))
+        forest = fit_forest(baseline, {"contamination": 0.05})
+        raw = -forest.score_samples(baseline)
+        np.testing.assert_array_equal(
+            forest.normalize(raw), forest.normalized_scores(baseline)
+        )
+
+
+class TestRoundTrip:
+    """to_arrays / from_arrays の往復."""
+
+    def test_scores_survive_round_trip(self):
+        rng = np.random.default_rng(1)
+        baseline = rng.normal(size=(100, 2))
+        forest = fit_forest(baseline)
+        arrays, meta = forest.to_arrays()
+        restored = ForestArtifact.from_arrays(arrays, meta)
+        np.testing.assert_array_equal(
+            restored.normalized_scores(baseline),
+            train_and_score(baseline, baseline),
+        )
+
+    def test_rejects_unknown_format(self):
+        arrays, meta = fit_forest(np.zeros((10, 1))).to_arrays()
+        with pytest.raises(ValueError, match="format"):
+            ForestArtifact.from_arrays(arrays, {**meta, "format": 999})
+
+
+class TestDefinitionHash:
+    """definition_hash のテスト."""
+
+    def test_stable_for_same_input(self):
+        x = np.arange(6.0).reshape(3, 2)
+        assert definition_hash(x, {"a": 1}) == definition_hash(
+            x.copy(), {"a": 1}
+        )
+
+    def test_changes_with_data_params_and_shape(self):
+        x = np.arange(6.0).reshape(3, 2)
+        base = definition_hash(x, {"a": 1})
+        assert definition_hash(x + 1, {"a": 1}) != base
+        assert definition_hash(x, {"a": 2}) != base
+        assert definition_hash(x.reshape(2, 3), {"a": 1}) != base
+
+    def test_float32_is_a_distinct_input(self):
+        """float32 はそのままハッシュし、float64 とは別の入力になる."""
+        x = np.arange(6.0).reshape(3, 2)
+        x32 = x.astype(np.float32)
+        assert definition_hash(x32, {"a": 1}) == definition_hash(
+            x32.copy(), {"a": 1}
+        )
+        assert definition_hash(x32, {"a": 1}) != definition_hash(x, {"a": 1})
+        # float64 以外の型は従来どおり float64 として扱う
+        assert definition_hash(x.astype(int), {"a": 1}) == definition_hash(
+            x, {"a": 1}
+        )
+
+
+class TestParallelScoring:
+    """行分割による並列スコアリング."""
+
+    def test_parallel_matches_serial(self):
+        rng = np.random.default_rng(2)
+        forest = fit_forest(rng.normal(size=(200, 2)), n_jobs=2)
+        x = rng.normal(size=(3 * CHUNK_CELLS // 100 + 1, 2))
+        np.testing.assert_array_equal(
+            forest.score_samples(x, n_jobs=3), forest.score_samples(x)
+        )
+
+    def test_n_jobs_does_not_change_fit(self):
+        baseline = np.random.default_rng(3).normal(size=(300, 2))
+        np.testing.assert_array_equal(
+            train_and_score(baseline, baseline, n_jobs=2),
+            train_and_score(baseline, baseline),
+        )
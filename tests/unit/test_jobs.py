@@ -0,0 +1,365 @@
+"""分析ジョブキューのユニットテスト."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.analysis.engine import AnalysisEngine
+from backend.analysis.jobs import LANES, AnalysisJobQueue
+
+
+def _mock_engine():
+    return MagicMock(spec=AnalysisEngine)
+
+
+def _raise_value_error():
+    raise ValueError("boom")
+
+
+class TestInlineQueue:
+    """max_workers=0（同期実行）モードのテスト."""
+
+    def test_runs_each_category(self):
+        """投入した全カテゴリに engine.run() が呼ばれる."""
+        engine = _mock_engine()
+        queue = AnalysisJobQueue(engine, max_workers=0)
+
+        queue.submit([1, 2, 3])
+
+        assert [c.args[0] for c in engine.run.call_args_list] == [1, 2, 3]
+
+    def test_job_succeeds_with_full_progress(self):
+        """完了後は succeeded / progress 1.0."""
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=0)
+
+        job = queue.submit([1, 2])
+        done = queue.get(job.id)
+
+        assert done.state == "succeeded"
+        assert done.completed == 2
+        assert done.progress == 1.0
+        assert done.finished_at is not None
+
+    def test_failure_does_not_stop_other_categories(self):
+        """1カテゴリの例外 → 残りも実行され、ジョブは failed."""
+        engine = _mock_engine()
+        engine.run.side_effect = [RuntimeError("boom"), None]
+        queue = AnalysisJobQueue(engine, max_workers=0)
+
+        job = queue.submit([1, 2])
+        done = queue.get(job.id)
+
+        assert engine.run.call_count == 2
+        assert done.state == "failed"
+        assert "boom" in done.error
+        assert done.failed_category_ids == [1]
+
+    def test_on_complete_called_with_finished_job(self):
+        """完了コールバックに終了済みジョブが渡される."""
+        completed = []
+        queue = AnalysisJobQueue(
+            _mock_engine(), max_workers=0, on_complete=completed.append
+        )
+
+        job = queue.submit([1])
+
+        assert len(completed) == 1
+        assert completed[0].id == job.id
+        assert completed[0].state == "succeeded"
+
+    def test_empty_job_progress_is_complete(self):
+        """対象カテゴリなし → progress 1.0."""
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=0)
+        job = queue.submit([])
+        assert queue.get(job.id).progress == 1.0
+
+    def test_unknown_job_returns_none(self):
+        """未知のID → None."""
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=0)
+        assert queue.get("missing") is None
+
+    def test_history_is_bounded(self):
+        """履歴上限を超えた終了済みジョブは古い順に削除される."""
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=0, max_history=2)
+        first = queue.submit([1])
+        queue.submit([2])
+        queue.submit([3])
+        queue.submit([4])
+        assert queue.get(first.id) is None
+
+
+class TestWorkerPool:
+    """ワーカープールモードのテスト."""
+
+    def test_submit_returns_before_run_finishes(self):
+        """submit() は分析完了を待たずにジョブIDを返す."""
+        release = threading.Event()
+        engine = _mock_engine()
+        engine.run.side_effect = lambda _cid: release.wait(5)
+        queue = AnalysisJobQueue(engine, max_workers=1, quiet_period=0.0)
+        try:
+            job = queue.submit([1])
+            assert job.state == "queued"
+            assert not queue.get(job.id).done
+
+            release.set()
+            assert queue.wait(job.id, timeout=5)
+            assert queue.get(job.id).state == "succeeded"
+        finally:
+            release.set()
+            queue.shutdown()
+
+
+class TestCoalescing:
+    """カテゴリ単位のデバウンス・合流のテスト."""
+
+    def test_burst_within_quiet_period_runs_once(self):
+        """静穏期間内の連続要求 → 1回の実行にまとまり、全ジョブが完了."""
+        engine = _mock_engine()
+        queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=0.2, max_delay=5.0
+        )
+        try:
+            jobs = [queue.submit([1]) for _ in range(5)]
+            for job in jobs:
+                assert queue.wait(job.id, timeout=5)
+            assert engine.run.call_count == 1
+            assert all(queue.get(j.id).state == "succeeded" for j in jobs)
+        finally:
+            queue.shutdown()
+
+    def test_requests_during_run_collapse_into_one_rerun(self):
+        """実行中に届いた要求は1回の再実行にまとめられる."""
+        started = threading.Event()
+        release = threading.Event()
+        engine = _mock_engine()
+
+        def _run(_cid):
+            started.set()
+            release.wait(5)
+
+        engine.run.side_effect = _run
+        queue = AnalysisJobQueue(
+            engine, max_workers=2, quiet_period=0.0, max_delay=0.0
+        )
+        try:
+            first = queue.submit([1])
+            assert started.wait(5)
+            later = [queue.submit([1]) for _ in range(5)]
+            time.sleep(0.1)
+            # 同一カテゴリの同時実行は起きない
+            assert engine.run.call_count == 1
+
+            release.set()
+            for job in [first, *later]:
+                assert queue.wait(job.id, timeout=5)
+            assert engine.run.call_count == 2
+        finally:
+            release.set()
+            queue.shutdown()
+
+    def test_max_delay_bounds_sustained_requests(self):
+        """要求が途切れなくても max_delay 経過で実行される."""
+        engine = _mock_engine()
+        queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=0.2, max_delay=0.3
+        )
+        try:
+            deadline = time.monotonic() + 1.0
+            while time.monotonic() < deadline:
+                queue.submit([1])
+                time.sleep(0.05)
+                if engine.run.call_count:
+                    break
+            assert engine.run.call_count >= 1
+        finally:
+            queue.shutdown()
+
+    def test_immediate_skips_quiet_period(self):
+        """immediate=True → 静穏期間を待たずに実行."""
+        engine = _mock_engine()
+        queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=30.0, max_delay=60.0
+        )
+        try:
+            job = queue.submit([1], immediate=True)
+            assert queue.wait(job.id, timeout=5)
+        finally:
+            queue.shutdown()
+
+    def test_distinct_categories_run_separately(self):
+        """異なるカテゴリはそれぞれ実行される."""
+        engine = _mock_engine()
+        queue = AnalysisJobQueue(engine, max_workers=0)
+
+        job = queue.submit([1, 2, 1])
+
+        assert sorted(c.args[0] for c in engine.run.call_args_list) == [1, 2]
+        assert queue.get(job.id).category_ids == [1, 2]
+
+    def test_max_delay_shorter_than_quiet_period_rejected(self):
+        """max_delay < quiet_period → ValueError."""
+        with pytest.raises(ValueError, match="max_delay"):
+            AnalysisJobQueue(_mock_engine(), quiet_period=2.0, max_delay=1.0)
+
+
+class TestPriorityLanes:
+    """優先度レーンと interactive 予約ワーカーのテスト."""
+
+    def test_interactive_not_starved_by_bulk(self):
+        """bulk で共有ワーカーが埋まっていても interactive は予約枠で走る."""
+        release = threading.Event()
+        ran_interactive = threading.Event()
+        engine = _mock_engine()
+
+        def _run(cid):
+            if cid == 99:
+                ran_interactive.set()
+            else:
+                release.wait(5)
+
+        engine.run.side_effect = _run
+        queue = AnalysisJobQueue(engine, max_workers=2, quiet_period=0.0)
+        try:
+            queue.submit(list(range(1, 50)), immediate=True, lane="bulk")
+            job = queue.submit([99], immediate=True, lane="interactive")
+            assert ran_interactive.wait(5)
+            assert queue.wait(job.id, timeout=5)
+            assert queue.get(job.id).lane == "interactive"
+        finally:
+            release.set()
+            queue.shutdown()
+
+    def test_higher_lane_runs_first_on_shared_worker(self):
+        """共有ワーカーは interactive > ingest > bulk の順に取り出す."""
+        gate = threading.Event()
+        order = []
+        engine = _mock_engine()
+
+        def _run(cid):
+            if cid == 0:
+                gate.wait(5)
+            order.append(cid)
+
+        engine.run.side_effect = _run
+        queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=0.0, max_delay=0.0
+        )
+        try:
+            jobs = [queue.submit([0], lane="bulk")]
+            time.sleep(0.1)  # 唯一のワーカーを塞ぐ
+            jobs.append(queue.submit([1, 2], lane="bulk"))
+            jobs.append(queue.submit([3], lane="ingest"))
+            jobs.append(queue.submit([4], lane="interactive"))
+            time.sleep(0.1)
+            gate.set()
+            for job in jobs:
+                assert queue.wait(job.id, timeout=5)
+            assert order == [0, 4, 3, 1, 2]
+        finally:
+            gate.set()
+            queue.shutdown()
+
+    def test_pending_category_promoted_to_higher_lane(self):
+        """bulk で待機中のカテゴリに interactive 要求が来たら繰り上がる."""
+        gate = threading.Event()
+        order = []
+        engine = _mock_engine()
+
+        def _run(cid):
+            if cid == 0:
+                gate.wait(5)
+            order.append(cid)
+
+        engine.run.side_effect = _run
+        queue = AnalysisJobQueue(
+            engine, max_workers=1, quiet_period=0.0, max_delay=0.0
+        )
+        try:
+            queue.submit([0], lane="bulk")
+            time.sleep(0.1)
+            bulk = queue.submit([1, 2, 3], lane="bulk")
+            time.sleep(0.1)
+            queue.submit([3], lane="interactive")
+            assert queue.lane_depths()["interactive"] == 1
+            gate.set()
+            assert queue.wait(bulk.id, timeout=5)
+            assert order == [0, 3, 1, 2]
+            assert engine.run.call_count == 4
+        finally:
+            gate.set()
+            queue.shutdown()
+
+    def test_call_runs_on_interactive_reserve(self):
+        """submit_call() は bulk で埋まった共有ワーカーを待たない."""
+        release = threading.Event()
+        engine = _mock_engine()
+        engine.run.side_effect = lambda cid: release.wait(5)
+        queue = AnalysisJobQueue(engine, max_workers=2, quiet_period=0.0)
+        try:
+            queue.submit(list(range(1, 50)), immediate=True, lane="bulk")
+            future = queue.submit_call(lambda: 42)
+            assert future.result(timeout=5) == 42
+        finally:
+            release.set()
+            queue.shutdown()
+
+    def test_call_runs_at_most_worker_count_at_once(self):
+        """試算を連打しても同時実行はワーカー数まで."""
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def _call():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=2)
+        try:
+            futures = [queue.submit_call(_call) for _ in range(10)]
+            for future in futures:
+                future.result(timeout=5)
+            assert peak[0] <= 2
+        finally:
+            queue.shutdown()
+
+    def test_call_error_and_inline_mode(self):
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=0)
+        assert queue.submit_call(lambda: "done").result() == "done"
+        with pytest.raises(ValueError, match="boom"):
+            queue.submit_call(_raise_value_error).result()
+
+    def test_shutdown_cancels_queued_calls(self):
+        gate = threading.Event()
+        queue = AnalysisJobQueue(
+            _mock_engine(), max_workers=1, interactive_reserve=0
+        )
+        running = queue.submit_call(lambda: gate.wait(5))
+        time.sleep(0.1)
+        waiting = queue.submit_call(lambda: None)
+        assert queue.lane_depths()["interactive"] == 1
+        queue.shutdown(wait=False)
+        gate.set()
+        assert waiting.cancelled()
+        assert running.result(timeout=5) is True
+        with pytest.raises(RuntimeError, match="shut down"):
+            queue.submit_call(lambda: None)
+
+    def test_submit_after_shutdown_rejected(self):
+        """shutdown() 後の submit() は queued のまま残さず RuntimeError."""
+        queue = AnalysisJobQueue(_mock_engine(), max_workers=1)
+        queue.shutdown()
+        with pytest.raises(RuntimeError, match="shut down"):
+            queue.submit([1])
+        assert queue.lane_depths() == dict.fromkeys(LANES, 0)
+
+    def test_negative_reserve_rejected(self):
+        """interactive_reserve < 0 → ValueError."""
+        with pytest.raises(ValueError, match="interactive_reserve"):
+            AnalysisJobQueue(_mock_engine(), interactive_reserve=-1)
@@ -0,0 +1,79 @@
+"""LoggedEventBus のユニットテスト。"""
+
+import asyncio
+
+from backend.ingestion.logged_event_bus import LoggedEventBus
+from backend.store.event_log import SqliteEventLog
+
+
+def _run(coro):
+    """async テストを同期的に実行するヘルパー。"""
+    return asyncio.run(coro)
+
+
+class TestLoggedEventBus:
+    """共有ログを介した配信を検証する。"""
+
+    def test_event_from_other_process_is_delivered(self, tmp_path):
+        """別インスタンス（別プロセス相当）の publish が購読者に届く。"""
+        path = str(tmp_path / "events.db")
+        api = LoggedEventBus(SqliteEventLog(path), poll_interval=0.01)
+        scheduler = LoggedEventBus(SqliteEventLog(path))
+
+        async def _test():
+            async with api.subscribe() as queue:
+                scheduler.publish("results-updated", {"category_ids": [3]})
+                msg = await asyncio.wait_for(queue.get(), timeout=2)
+                assert msg["event"] == "results-updated"
+                assert msg["data"] == {"category_ids": [3]}
+
+        try:
+            _run(_test())
+        finally:
+            api.close()
+
+    def test_events_before_start_are_not_replayed(self, tmp_path):
+        """起動前に記録されたイベントは配信しない。"""
+        log = SqliteEventLog(str(tmp_path / "events.db"))
+        log.append("old")
+        bus = LoggedEventBus(log, poll_interval=60)
+        bus.publish("new")
+
+        async def _test():
+            async with bus.subscribe() as queue:
+                assert bus.poll_once() == 1
+                msg = await asyncio.wait_for(queue.get(), timeout=1)
+                assert msg["event"] == "new"
+
+        try:
+            _run(_test())
+        finally:
+            bus.close()
+
+    def test_publish_only_process_does_not_poll(self, tmp_path):
+        """subscribe しないプロセスではポーリングスレッドを起動しない。"""
+        bus = LoggedEventBus(SqliteEventLog(str(tmp_path / "events.db")))
+        bus.publish("e")
+        assert bus._poller is None
+        bus.close()
+
+    def test_replay_uses_log_ids_across_processes(self, tmp_path):
+        """別ワーカーで受け取った id からも再送できる。"""
+        path = str(tmp_path / "events.db")
+        worker_a = LoggedEventBus(SqliteEventLog(path), poll_interval=60)
+        worker_b = LoggedEventBus(SqliteEventLog(path), poll_interval=60)
+        worker_a.publish("first")
+        worker_a.publish("second")
+        first_id = SqliteEventLog(path).read_since(0)[0].id
+
+        async def _test():
+            async with worker_b.subscribe(last_event_id=first_id) as queue:
+                msg = await asyncio.wait_for(queue.get(), timeout=1)
+                assert msg["event"] == "second"
+                assert msg["id"] == first_id + 1
+
+        try:
+            _run(_test())
+        finally:
+            worker_a.close()
+            worker_b.close()
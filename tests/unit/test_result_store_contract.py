@@ -3,12 +3,15 @@
 ResultStoreInterface の契約を検証する。
 """
 
+import threading
 from datetime import UTC, datetime
 
+import numpy as np
 import pytest
 
 from backend.interfaces.result_store import (
     AnomalyResult,
+    ModelArtifact,
     ModelDefinition,
     ResultStoreInterface,
     TrendResult,
@@ -82,6 +85,18 @@ class TestAnomalyResults:
     ):
         assert result_store.get_anomaly_results(999) == []
 
+    def test_raw_score_round_trip(self, result_store: ResultStoreInterface):
+        result_store.save_anomaly_results(
+            [
+                AnomalyResult(1, datetime(2025, 1, 1), 0.3, raw_score=0.42),
+                AnomalyResult(1, datetime(2025, 1, 2), 0.8),
+            ]
+        )
+        loaded = sorted(
+            result_store.get_anomaly_results(1), key=lambda r: r.recorded_at
+        )
+        assert [r.raw_score for r in loaded] == [0.42, None]
+
     def test_delete_anomaly_results(self, result_store: ResultStoreInterface):
         results = [
             AnomalyResult(
@@ -261,3 +276,235 @@ class TestDatetimeNormalization:
         assert loaded.baseline_start.tzinfo is None
         assert loaded.baseline_end.tzinfo is None
         assert all(ep.tzinfo is None for ep in loaded.excluded_points)
+
+
+class TestAnalyzedVersions:
+    """分析済みデータバージョン（ウォーターマーク）の契約テスト。"""
+
+    def test_empty_by_default(self, result_store: ResultStoreInterface):
+        assert result_store.get_analyzed_versions() == {}
+
+    def test_save_and_overwrite(self, result_store: ResultStoreInterface):
+        result_store.save_analyzed_version(1, 3)
+        result_store.save_analyzed_version(2, 5)
+        result_store.save_analyzed_version(1, 7)
+        assert result_store.get_analyzed_versions() == {1: 7, 2: 5}
+
+    def test_persists_across_instances(self, tmp_path):
+        """再オープン後もウォーターマークが残る。"""
+        from backend.result_store.sqlite import SqliteResultStore
+
+        path = str(tmp_path / "wm.db")
+        SqliteResultStore(path).save_analyzed_version(1, 4)
+        assert SqliteResultStore(path).get_analyzed_versions() == {1: 4}
+
+
+def _definition(category_id: int = 1) -> ModelDefinition:
+    return ModelDefinition(
+        category_id=category_id,
+        baseline_start=datetime(2025, 1, 1),
+        baseline_end=datetime(2025, 6, 1),
+        sensitivity=0.5,
+    )
+
+
+class TestModelDefinitionVersion:
+    """モデル定義 version と条件付き保存の契約テスト。"""
+
+    def test_save_assigns_increasing_version(
+        self, result_store: ResultStoreInterface
+    ):
+        v1 = result_store.save_model_definition(_definition())
+        v2 = result_store.save_model_definition(_definition())
+        assert v2 > v1
+        assert result_store.get_model_version(1) == v2
+        assert result_store.get_model_definition(1).version == v2
+
+    def test_version_not_reused_after_delete(
+        self, result_store: ResultStoreInterface
+    ):
+        v1 = result_store.save_model_definition(_definition())
+        result_store.delete_model_definition(1)
+        assert result_store.get_model_version(1) is None
+        assert result_store.save_model_definition(_definition()) > v1
+
+    def test_conditional_save_matches_current_version(
+        self, result_store: ResultStoreInterface
+    ):
+        version = result_store.save_model_definition(_definition())
+        results = [AnomalyResult(1, datetime(2025, 1, 1), 0.4)]
+        assert result_store.save_anomaly_results(results, version) is True
+        assert len(result_store.get_anomaly_results(1)) == 1
+
+    def test_conditional_save_rejects_stale_version(
+        self, result_store: ResultStoreInterface
+    ):
+        stale = result_store.save_model_definition(_definition())
+        result_store.save_model_definition(_definition())
+        results = [AnomalyResult(1, datetime(2025, 1, 1), 0.4)]
+        assert result_store.save_anomaly_results(results, stale) is False
+        assert result_store.get_anomaly_results(1) == []
+
+    def test_conditional_save_rejects_deleted_definition(
+        self, result_store: ResultStoreInterface
+    ):
+        version = result_store.save_model_definition(_definition())
+        result_store.delete_model_definition(1)
+        results = [AnomalyResult(1, datetime(2025, 1, 1), 0.4)]
+        assert result_store.save_anomaly_results(results, version) is False
+
+    def test_unconditional_save_still_writes(
+        self, result_store: ResultStoreInterface
+    ):
+        results = [AnomalyResult(1, datetime(2025, 1, 1), 0.4)]
+        assert result_store.save_anomaly_results(results) is True
+
+    def test_conditional_save_is_atomic_across_processes(
+        self, tmp_path, monkeypatch
+    ):
+        """比較と書き込みの間に、別プロセスの定義更新が割り込めない。"""
+        from backend.result_store.sqlite import SqliteResultStore
+
+        path = str(tmp_path / "results.db")
+        worker = SqliteResultStore(path)
+        api = SqliteResultStore(path)
+        version = api.save_model_definition(_definition())
+        original = worker._select_model_version
+        bump = threading.Thread(
+            target=api.save_model_definition, args=(_definition(),)
+        )
+        interleaved = []
+
+        def select_then_bump(category_id):
+            current = original(category_id)
+            # 比較の直後に別接続から定義を更新させる
+            bump.start()
+            bump.join(timeout=0.3)
+            interleaved.append(not bump.is_alive())
+            return current
+
+        monkeypatch.setattr(worker, "_select_model_version", select_then_bump)
+        results = [AnomalyResult(1, datetime(2025, 1, 1), 0.4)]
+        assert worker.save_anomaly_results(results, version) is True
+        bump.join(timeout=5)
+
+        # 更新は結果の書き込みが確定するまで待たされる
+        assert interleaved == [False]
+        assert api.get_model_version(1) > version
+
+
+def _artifact(category_id: int = 1, digest: str = "h1") -> ModelArtifact:
+    return ModelArtifact(
+        category_id=category_id,
+        definition_hash=digest,
+        arrays={
+            "threshold": np.array([0.5, -1.25]),
+            "roots": np.array([0, 1], dtype=np.int64),
+        },
+        meta={"offset": -0.5},
+    )
+
+
+class TestModelArtifacts:
+    """学習済みモデル保存の契約テスト。"""
+
+    def test_missing_returns_none(self, result_store: ResultStoreInterface):
+        assert result_store.get_model_artifact(1) is None
+
+    def test_round_trip(self, result_store: ResultStoreInterface):
+        result_store.save_model_artifact(_artifact())
+        loaded = result_store.get_model_artifact(1)
+        assert loaded is not None
+        assert loaded.definition_hash == "h1"
+        assert loaded.meta == {"offset": -0.5}
+        np.testing.assert_array_equal(loaded.arrays["threshold"], [0.5, -1.25])
+        assert loaded.arrays["roots"].dtype == np.int64
+
+    def test_loaded_arrays_are_read_only(
+        self, result_store: ResultStoreInterface
+    ):
+        result_store.save_model_artifact(_artifact())
+        loaded = result_store.get_model_artifact(1)
+        assert not loaded.arrays["threshold"].flags.writeable
+
+    def test_overwrite_replaces_hash(self, result_store: ResultStoreInterface):
+        result_store.save_model_artifact(_artifact(digest="h1"))
+        result_store.save_model_artifact(_artifact(digest="h2"))
+        assert result_store.get_model_artifact(1).definition_hash == "h2"
+
+    def test_delete(self, result_store: ResultStoreInterface):
+        result_store.save_model_artifact(_artifact(1))
+        result_store.save_model_artifact(_artifact(2))
+        result_store.delete_model_artifact(1)
+        result_store.delete_model_artifact(99)
+        assert result_store.get_model_artifact(1) is None
+        assert result_store.get_model_artifact(2) is not None
+
+    def test_deleting_definition_drops_artifact(
+        self, result_store: ResultStoreInterface
+    ):
+        result_store.save_model_definition(_definition(1))
+        result_store.save_model_artifact(_artifact(1))
+        result_store.delete_model_definition(1)
+        assert result_store.get_model_artifact(1) is None
+
+    def test_delete_all_data(self, result_store: ResultStoreInterface):
+        result_store.save_model_artifact(_artifact())
+        result_store.delete_all_data()
+        assert result_store.get_model_artifact(1) is None
+
+    def test_persists_across_instances(self, tmp_path):
+        """再オープン後も学習済みモデルを読み込める。"""
+        from backend.result_store.sqlite import SqliteResultStore
+
+        path = str(tmp_path / "artifacts.db")
+        SqliteResultStore(path).save_model_artifact(_artifact())
+        loaded = SqliteResultStore(path).get_model_artifact(1)
+        assert loaded is not None
+        assert isinstance(loaded.arrays["threshold"], np.memmap)
+
+    def test_concurrent_saves_from_separate_processes(self, tmp_path):
+        """別プロセス（別接続）からの同時保存が衝突しない。"""
+        from backend.result_store.sqlite import SqliteResultStore
+
+        path = str(tmp_path / "artifacts.db")
+        stores = [SqliteResultStore(path) for _ in range(3)]
+        errors = []
+
+        def save(store, digest):
+            try:
+                for _ in range(50):
+                    store.save_model_artifact(_artifact(digest=digest))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=save, args=(store, digest))
+            for store in stores
+            for digest in ("h1", "h2")
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        loaded = stores[0].get_model_artifact(1)
+        assert loaded is not None
+        category_dir = tmp_path / "artifacts_artifacts" / "1"
+        assert [p.name for p in category_dir.iterdir()] == [
+            loaded.definition_hash
+        ]
+
+    def test_save_keeps_staging_of_other_writers(self, tmp_path):
+        from backend.result_store.sqlite import SqliteResultStore
+
+        store = SqliteResultStore(
+            str(tmp_path / "r.db"), artifact_dir=str(tmp_path / "a")
+        )
+        store.save_model_artifact(_artifact(digest="h1"))
+        staging = tmp_path / "a" / "1" / ".staging-other"
+        staging.mkdir()
+        store.save_model_artifact(_artifact(digest="h2"))
+        assert staging.exists()
+        assert not (tmp_path / "a" / "1" / "h1").exists()
@@ -0,0 +1,198 @@
+"""増分再分析スケジューラのユニットテスト."""
+
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.analysis.engine import AnalysisEngine
+from backend.interfaces.data_store import WorkRecord
+from backend.result_store.sqlite import SqliteResultStore
+from backend.scheduler.periodic import IncrementalScheduler, process_cpu_time
+from backend.store.sqlite import SqliteDataStore
+
+
+@pytest.fixture
+def stores(tmp_path):
+    data_store = SqliteDataStore(str(tmp_path / "store.db"))
+    result_store = SqliteResultStore(str(tmp_path / "result.db"))
+    return data_store, result_store
+
+
+def _add_record(data_store, path, day):
+    cid = data_store.ensure_category_path(path)
+    data_store.upsert_records(
+        [
+            WorkRecord(
+                category_id=cid,
+                work_time=10.0 + day,
+                recorded_at=datetime(2025, 1, day),
+            )
+        ]
+    )
+    return cid
+
+
+def _scheduler(data_store, result_store, **kwargs):
+    engine = AnalysisEngine(data_store, result_store)
+    return IncrementalScheduler(engine, data_store, result_store, **kwargs)
+
+
+class TestIncrementalScheduler:
+    """変更カテゴリのみの再分析."""
+
+    def test_first_tick_processes_all_changed(self, stores):
+        """未分析カテゴリは全て処理され、トレンドが保存される."""
+        data_store, result_store = stores
+        a = _add_record(data_store, ["P", "A"], 1)
+        b = _add_record(data_store, ["P", "B"], 1)
+
+        processed = _scheduler(data_store, result_store).tick()
+
+        assert processed == sorted([a, b])
+        assert result_store.get_trend_result(a) is not None
+
+    def test_second_tick_is_noop(self, stores):
+        """変化がなければ何も処理しない."""
+        data_store, result_store = stores
+        _add_record(data_store, ["P", "A"], 1)
+        scheduler = _scheduler(data_store, result_store)
+        scheduler.tick()
+
+        assert scheduler.tick() == []
+
+    def test_only_changed_category_processed(self, stores):
+        """追記のあったカテゴリのみ再分析する."""
+        data_store, result_store = stores
+        a = _add_record(data_store, ["P", "A"], 1)
+        _add_record(data_store, ["P", "B"], 1)
+        scheduler = _scheduler(data_store, result_store)
+        scheduler.tick()
+
+        _add_record(data_store, ["P", "A"], 2)
+
+        assert scheduler.tick() == [a]
+
+    def test_restart_does_not_recompute(self, stores):
+        """ウォーターマークは永続化され、再起動後は再計算しない."""
+        data_store, result_store = stores
+        _add_record(data_store, ["P", "A"], 1)
+        _scheduler(data_store, result_store).tick()
+
+        restarted = _scheduler(data_store, result_store)
+
+        assert restarted.tick() == []
+
+    def test_failure_retried_next_tick(self, stores):
+        """分析失敗 → ウォーターマーク未更新で次回再試行."""
+        data_store, result_store = stores
+        a = _add_record(data_store, ["P", "A"], 1)
+        engine = MagicMock(spec=AnalysisEngine)
+        engine.run.side_effect = RuntimeError("boom")
+        scheduler = IncrementalScheduler(engine, data_store, result_store)
+
+        assert scheduler.tick() == [a]
+        assert scheduler.tick() == [a]
+
+    def test_on_analyzed_receives_succeeded_only(self, stores):
+        """on_analyzed には分析に成功したカテゴリのみ渡される."""
+        data_store, result_store = stores
+        a = _add_record(data_store, ["P", "A"], 1)
+        b = _add_record(data_store, ["P", "B"], 1)
+
+        def run(category_id):
+            if category_id == b:
+                raise RuntimeError("boom")
+
+        engine = MagicMock(spec=AnalysisEngine)
+        engine.run.side_effect = run
+        notified = []
+        scheduler = IncrementalScheduler(
+            engine, data_store, result_store, on_analyzed=notified.append
+        )
+
+        assert scheduler.tick() == sorted([a, b])
+        assert notified == [[a]]
+
+
+class TestCpuThrottling:
+    """CPU 使用率の上限."""
+
+    def test_sleeps_in_proportion_to_cpu_used(self, stores):
+        """cpu_share=0.25 → 使用 CPU 時間の3倍休止する."""
+        data_store, result_store = stores
+        _add_record(data_store, ["P", "A"], 1)
+        clock = iter([0.0, 2.0])
+        sleeps = []
+        scheduler = _scheduler(
+            data_store,
+            result_store,
+            cpu_share=0.25,
+            sleep=sleeps.append,
+            cpu_clock=lambda: next(clock),
+        )
+
+        scheduler.tick()
+
+        assert sleeps == [pytest.approx(6.0)]
+
+    def test_counts_cpu_used_by_other_threads(self, stores):
+        """n_jobs スレッドのように別スレッドで使った CPU も計上する."""
+        data_store, result_store = stores
+        _add_record(data_store, ["P", "A"], 1)
+        engine = MagicMock()
+
+        def busy(category_id):
+            def spin():
+                deadline = process_cpu_time() + 0.2
+                while process_cpu_time() < deadline:
+                    pass
+
+            worker = threading.Thread(target=spin)
+            worker.start()
+            worker.join()
+
+        engine.run.side_effect = busy
+        sleeps = []
+        scheduler = IncrementalScheduler(
+            engine,
+            data_store,
+            result_store,
+            cpu_share=0.5,
+            sleep=sleeps.append,
+        )
+
+        scheduler.tick()
+
+        assert sleeps[0] >= 0.2
+
+    def test_full_share_never_sleeps(self, stores):
+        """cpu_share=1.0 → 休止しない."""
+        data_store, result_store = stores
+        _add_record(data_store, ["P", "A"], 1)
+        sleeps = []
+        scheduler = _scheduler(
+            data_store, result_store, cpu_share=1.0, sleep=sleeps.append
+        )
+
+        scheduler.tick()
+
+        assert sleeps == []
+
+    def test_invalid_share_rejected(self, stores):
+        """cpu_share が範囲外 → ValueError."""
+        data_store, result_store = stores
+        with pytest.raises(ValueError, match="cpu_share"):
+            _scheduler(data_store, result_store, cpu_share=0.0)
+
+
+class TestServe:
+    """serve() の停止."""
+
+    def test_stops_when_event_set(self, stores):
+        """stop がセット済みなら即座に戻る."""
+        data_store, result_store = stores
+        stop = threading.Event()
+        stop.set()
+        _scheduler(data_store, result_store).serve(60.0, stop)
@@ -0,0 +1,72 @@
+"""学習トレーナーのテスト."""
+
+import numpy as np
+import pytest
+
+from backend import dependencies
+from backend.analysis.anomaly import fit_forest
+from backend.analysis.cpu import CpuBudget
+from backend.analysis.training import ProcessForestTrainer, category_seed
+
+
+class TestCategorySeed:
+    def test_deterministic(self):
+        assert category_seed(3) == category_seed(3)
+
+    def test_differs_between_categories(self):
+        assert len({category_seed(i) for i in range(100)}) == 100
+
+    def test_valid_for_sklearn(self):
+        assert all(0 <= category_seed(i) < 2**32 for i in range(10))
+
+
+class TestProcessForestTrainer:
+    def test_matches_in_process_fit(self, tmp_path):
+        """ワーカープロセスでも同じシードなら同じモデルになる."""
+        rng = np.random.default_rng(0)
+        baseline = rng.normal(size=(200, 3))
+        test = rng.normal(scale=3.0, size=(50, 3))
+        params = {"n_estimators": 20, "contamination": 0.05}
+        trainer = ProcessForestTrainer(1, scratch_dir=str(tmp_path))
+        try:
+            forest = trainer.fit(baseline, params, random_state=7)
+        finally:
+            trainer.shutdown()
+
+        expected = fit_forest(baseline, params, random_state=7)
+        np.testing.assert_array_equal(
+            forest.normalized_scores(test), expected.normalized_scores(test)
+        )
+        # 受け渡し用のスクラッチファイルは残らない
+        assert list(tmp_path.iterdir()) == []
+        # ワーカーの CPU 時間を累計する
+        assert trainer.cpu_time > 0
+
+    def test_rejects_empty_pool(self):
+        with pytest.raises(ValueError):
+            ProcessForestTrainer(0)
+
+
+class TestDefaultTrainer:
+    """get_forest_trainer() の既定（CPU 予算に応じて有効化）."""
+
+    @pytest.fixture(autouse=True)
+    def _reset(self, monkeypatch):
+        monkeypatch.delenv("FOREST_TRAINER_PROCESSES", raising=False)
+        yield
+        dependencies._reset_all()
+
+    def test_single_core_trains_in_thread(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "_cpu_budget", CpuBudget(1))
+        assert dependencies.get_forest_trainer() is None
+
+    def test_enabled_with_multiple_cores(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "_cpu_budget", CpuBudget(2))
+        assert isinstance(
+            dependencies.get_forest_trainer(), ProcessForestTrainer
+        )
+
+    def test_zero_disables(self, monkeypatch):
+        monkeypatch.setenv("FOREST_TRAINER_PROCESSES", "0")
+        monkeypatch.setattr(dependencies, "_cpu_budget", CpuBudget(4))
+        assert dependencies.get_forest_trainer() is None